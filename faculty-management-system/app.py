@@ -1,523 +1,216 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, jsonify
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask, Request, current_app, url_for
+from flask.cli import with_appcontext
+from importlib import import_module
+import hashlib
 import os
-from datetime import datetime, date, timedelta
-from werkzeug.utils import secure_filename
-import json
+import click
+import storage
+import search
+import assets
+import migrations
+from database import (database_uri, engine_options, init_database, init_lock,
+                      SQLITE_PRAGMAS)
+from metrics import init_metrics
+from models import db, Assignment, DashboardStats, Note
+from extensions import jobs, page_cache
+from sample_data import add_sample_data
+from shards import current_shard, init_shards, use_department
+from stats import init_read_caches, rebuild_stats
+
+# Blueprint modules, imported and registered by create_app()
+BLUEPRINTS = ['views.dashboard', 'views.calendar', 'views.attendance', 'views.files',
+              'views.syllabus', 'views.students', 'views.jobs']
+
+
+class UploadRequest(Request):
+    # Multipart file parts are streamed straight into the blob store's temp
+    # folder and hashed on the way in.
+    def _get_file_stream(self, total_content_length, content_type,
+                         filename=None, content_length=None):
+        return storage.HashingFile(current_app.config['BLOB_FOLDER'])
+
+
+def create_app(config=None):
+    # Builds an app without touching the database, so workers start fast and
+    # tests or benchmarks can run isolated instances side by side. Run
+    # `flask init-db` (or init_db()) once to create the schema.
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'faculty-management-enhanced-system'
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(
+        os.environ.get('DATABASE_URL'))
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    # WAL, tuned pragmas and write-lock-first transactions for SQLite
+    app.config['SQLITE_TUNING'] = os.environ.get('SQLITE_TUNING', '1') != '0'
+    app.config['SQLITE_PRAGMAS'] = SQLITE_PRAGMAS
+    # ?profile=1 cProfile output and /metrics for X-Admin-Token holders
+    # (local requests when no ADMIN_TOKEN is set)
+    app.config['PROFILER_ENABLED'] = os.environ.get('PROFILER_ENABLED') == '1'
+    app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['UPLOAD_FOLDER'] = 'static/uploads'
+    app.config['BLOB_FOLDER'] = os.path.join(app.instance_path, 'blobs')
+    # Hand blob bytes to a front proxy: None, 'x-sendfile' (Apache/lighttpd) or
+    # 'x-accel' (nginx, with BLOB_FOLDER exposed as an internal location at
+    # X_ACCEL_PREFIX)
+    app.config['DOWNLOAD_OFFLOAD'] = os.environ.get('DOWNLOAD_OFFLOAD') or None
+    app.config['X_ACCEL_PREFIX'] = os.environ.get('X_ACCEL_PREFIX', '/_blobs/')
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    # Background job threads in the web process; set 0 and run `flask worker`
+    # to process jobs in a separate process instead
+    app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+    app.config['EXPORT_FOLDER'] = os.path.join(app.instance_path, 'exports')
+    # Event reminders go to 'log', 'jsonl' (appended to REMINDER_FILE) or any
+    # callable taking the reminder dict
+    app.config['REMINDER_SINK'] = os.environ.get('REMINDER_SINK', 'log')
+    app.config['REMINDER_FILE'] = os.path.join(app.instance_path, 'reminders.jsonl')
+    app.config['REMINDER_LEAD_HOURS'] = int(os.environ.get('REMINDER_LEAD_HOURS', 24))
+    # Rendered page cache: 'disk' (shared by every worker through
+    # RESPONSE_CACHE_DIR), 'memory' (per process; only safe with a single
+    # process, like the dev server below) or 'off'
+    app.config['RESPONSE_CACHE'] = os.environ.get('RESPONSE_CACHE', 'disk')
+    app.config['RESPONSE_CACHE_MAX_BYTES'] = int(
+        os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    # Short-lived in-process caches of hot aggregates (see stats.py)
+    app.config['READ_CACHES'] = os.environ.get('READ_CACHES', '1') != '0'
+    # Department partitioning (see shards.py): comma-separated department
+    # keys, each with its own database from SHARD_DATABASE_URI
+    app.config['DEPARTMENTS'] = [key for key in os.environ.get('DEPARTMENTS', '').split(',') if key]
+    app.config['DEFAULT_DEPARTMENT'] = os.environ.get('DEFAULT_DEPARTMENT')
+    app.config['SHARD_DATABASE_URI'] = database_uri(os.environ.get('SHARD_DATABASE_URI') or (
+        'sqlite:///' + os.path.join(app.instance_path, 'departments', '{department}.db')))
+    app.config['SHARD_MAX_ENGINES'] = int(os.environ.get('SHARD_MAX_ENGINES', 16))
+    app.config['SHARD_POOL_SIZE'] = int(os.environ.get('SHARD_POOL_SIZE', 5))
+    app.config['SHARD_FANOUT_THREADS'] = int(os.environ.get('SHARD_FANOUT_THREADS', 8))
+    # Drop a module to serve without its pages, jobs and commands
+    app.config['BLUEPRINTS'] = BLUEPRINTS
+
+    app.config.update(config or {})
+    # One cache directory per database, so apps on different databases never
+    # serve each other's pages
+    app.config.setdefault('RESPONSE_CACHE_DIR', os.path.join(
+        app.instance_path, 'response_cache', hashlib.sha256(
+            app.config['SQLALCHEMY_DATABASE_URI'].encode()).hexdigest()[:12]))
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'],
+        pool_size=app.config['DB_POOL_SIZE'],
+        max_overflow=app.config['DB_MAX_OVERFLOW']))
+    app.config['USE_X_SENDFILE'] = app.config['DOWNLOAD_OFFLOAD'] == 'x-sendfile'
+
+    app.request_class = UploadRequest
+    db.init_app(app)
+    # Before init_database(), whose write lock depends on the department
+    init_shards(app)
+    init_database(app, db)
+    init_metrics(app, db)
+    init_read_caches(app)
+    page_cache.init_app(app)
+    jobs.init_app(app)
+
+    # Bundles built by `flask build-assets`; see assets.py
+    app.extensions['assets'] = assets.Assets(app.static_folder)
+
+    @app.template_global()
+    def asset_urls(bundle):
+        # The fingerprinted bundle once built, its source files until then
+        return [path if '://' in path else url_for('static', filename=path)
+                for path in app.extensions['assets'].paths(bundle)]
+
+    @app.route('/static/dist/<path:filename>')
+    def dist_asset(filename):
+        return assets.send_asset(os.path.join(app.static_folder, assets.DIST), filename)
+
+    for name in app.config['BLUEPRINTS']:
+        app.register_blueprint(import_module(name).bp)
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(build_assets_command)
+    return app
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'faculty-management-enhanced-system'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///faculty.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# Initialize database
-db = SQLAlchemy(app)
-
-# Database Models
-
-
-class Attendance(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.String(20), nullable=False)
-    year = db.Column(db.String(10), nullable=False)
-    subject = db.Column(db.String(100), nullable=False)
-    student_name = db.Column(db.String(100), nullable=False)
-    status = db.Column(db.String(10), nullable=False)
-
-
-class Assignment(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    year = db.Column(db.String(10), nullable=False)
-    subject = db.Column(db.String(100), nullable=False)
-    filename = db.Column(db.String(200), nullable=False)
-    upload_date = db.Column(db.String(20), nullable=False)
-    description = db.Column(db.Text)
-
-
-class Note(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    year = db.Column(db.String(10), nullable=False)
-    subject = db.Column(db.String(100), nullable=False)
-    filename = db.Column(db.String(200), nullable=False)
-    upload_date = db.Column(db.String(20), nullable=False)
-    description = db.Column(db.Text)
-
-
-class Syllabus(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    year = db.Column(db.String(10), nullable=False)
-    subject = db.Column(db.String(100), nullable=False)
-    topic = db.Column(db.String(300), nullable=False)
-    completed = db.Column(db.Boolean, default=False)
-    completion_date = db.Column(db.String(20))
-
-
-class Event(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    date = db.Column(db.String(20), nullable=False)
-    time = db.Column(db.String(10), nullable=False)
-    type = db.Column(db.String(20), nullable=False)
-    description = db.Column(db.String(300))
-    notified = db.Column(db.Boolean, default=False)
-
-
-class Student(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    roll_number = db.Column(db.String(20), nullable=False)
-    year = db.Column(db.String(10), nullable=False)
-    email = db.Column(db.String(100))
-    phone = db.Column(db.String(15))
-    marks = db.Column(db.Text)
-
-
-# Sample data
-SE_STUDENTS = [
-    {"name": "Alice Johnson", "roll": "SE001",
-        "email": "alice@college.edu", "phone": "1234567890"},
-    {"name": "Bob Smith", "roll": "SE002",
-        "email": "bob@college.edu", "phone": "1234567891"},
-    {"name": "Carol Davis", "roll": "SE003",
-        "email": "carol@college.edu", "phone": "1234567892"},
-    {"name": "David Wilson", "roll": "SE004",
-        "email": "david@college.edu", "phone": "1234567893"},
-    {"name": "Eva Brown", "roll": "SE005",
-        "email": "eva@college.edu", "phone": "1234567894"}
-]
-
-TE_STUDENTS = [
-    {"name": "Ivy Chen", "roll": "TE001",
-        "email": "ivy@college.edu", "phone": "1234567895"},
-    {"name": "Jack Anderson", "roll": "TE002",
-        "email": "jack@college.edu", "phone": "1234567896"},
-    {"name": "Karen White", "roll": "TE003",
-        "email": "karen@college.edu", "phone": "1234567897"},
-    {"name": "Leo Martin", "roll": "TE004",
-        "email": "leo@college.edu", "phone": "1234567898"},
-    {"name": "Mia Garcia", "roll": "TE005",
-        "email": "mia@college.edu", "phone": "1234567899"}
-]
-
-SAMPLE_SYLLABUS = {
-    'SE': {
-        'Software Engineering': ['Introduction to SE', 'SDLC', 'Requirements'],
-        'Data Structures': ['Arrays', 'Linked Lists', 'Stacks']
-    },
-    'TE': {
-        'Database Systems': ['DB Concepts', 'SQL', 'Normalization'],
-        'Computer Networks': ['Network Basics', 'TCP/IP', 'Security']
-    }
-}
-
-ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'ppt', 'pptx'}
-
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-# ========== ROUTES ==========
-
-
-@app.route('/')
-def dashboard():
-    today = date.today().strftime('%Y-%m-%d')
-
-    today_lectures = Event.query.filter_by(
-        date=today, type='lecture').count() or 2
-    total_attendance = Attendance.query.count() or 1
-    present_count = Attendance.query.filter_by(status='Present').count()
-    attendance_percentage = round((present_count / total_attendance * 100), 1)
-    assignments_count = Assignment.query.count()
-    total_syllabus = Syllabus.query.count() or 1
-    completed_syllabus = Syllabus.query.filter_by(completed=True).count()
-    syllabus_percentage = round((completed_syllabus / total_syllabus * 100), 1)
-    total_students = Student.query.count()
-    upcoming_events = Event.query.filter(Event.date >= today).order_by(
-        Event.date, Event.time).limit(5).all()
-
-    return render_template('dashboard.html',
-                           today_lectures=today_lectures,
-                           attendance_percentage=attendance_percentage,
-                           assignments_count=assignments_count,
-                           syllabus_percentage=syllabus_percentage,
-                           total_students=total_students,
-                           upcoming_events=upcoming_events)
-
-
-@app.route('/get_attendance_chart_data')
-def get_attendance_chart_data():
-    present_count = Attendance.query.filter_by(status='Present').count() or 8
-    absent_count = Attendance.query.filter_by(status='Absent').count() or 2
-    return jsonify({'present': present_count, 'absent': absent_count})
-
-
-@app.route('/syllabus_progress')
-def syllabus_progress():
-    total = Syllabus.query.count() or 1
-    completed = Syllabus.query.filter_by(completed=True).count()
-    return jsonify({
-        'completed': completed,
-        'total': total,
-        'percentage': round((completed / total * 100), 1)
-    })
-
-# ========== CALENDAR ROUTES ==========
-
-
-@app.route('/calendar')
-def calendar():
-    events = Event.query.order_by(Event.date, Event.time).all()
-    return render_template('calendar.html', events=events)
-
-
-@app.route('/add_event', methods=['POST'])
-def add_event():
-    title = request.form['title']
-    event_date = request.form['date']
-    time = request.form['time']
-    event_type = request.form['type']
-    description = request.form['description']
-
-    new_event = Event(title=title, date=event_date, time=time,
-                      type=event_type, description=description)
-    db.session.add(new_event)
-    db.session.commit()
-    flash('Event added successfully!', 'success')
-    return redirect(url_for('calendar'))
-
-
-@app.route('/edit_event/<int:event_id>', methods=['GET', 'POST'])
-def edit_event(event_id):
-    event = Event.query.get_or_404(event_id)
-    if request.method == 'POST':
-        event.title = request.form['title']
-        event.date = request.form['date']
-        event.time = request.form['time']
-        event.type = request.form['type']
-        event.description = request.form['description']
-        db.session.commit()
-        flash('Event updated successfully!', 'success')
-        return redirect(url_for('calendar'))
-    return render_template('edit_event.html', event=event)
-
-
-@app.route('/delete_event/<int:event_id>')
-def delete_event(event_id):
-    event = Event.query.get_or_404(event_id)
-    db.session.delete(event)
-    db.session.commit()
-    flash('Event deleted successfully!', 'success')
-    return redirect(url_for('calendar'))
-
-# ========== ATTENDANCE ROUTES ==========
-
-
-@app.route('/attendance', methods=['GET', 'POST'])
-def attendance():
-    if request.method == 'POST':
-        year = request.form['year']
-        subject = request.form['subject']
-        attendance_date = request.form['date']
-
-        students = SE_STUDENTS if year == 'SE' else TE_STUDENTS
-        for student_data in students:
-            status = request.form.get(
-                f"status_{student_data['name']}", 'Absent')
-            attendance_record = Attendance(
-                date=attendance_date,
-                year=year,
-                subject=subject,
-                student_name=student_data['name'],
-                status=status
-            )
-            db.session.add(attendance_record)
-
-        db.session.commit()
-        flash('Attendance saved successfully!', 'success')
-        return redirect(url_for('attendance'))
-
-    return render_template('attendance.html')
-
-
-@app.route('/attendance_records')
-def attendance_records():
-    records = Attendance.query.order_by(Attendance.date.desc()).all()
-    return render_template('attendance_records.html', records=records)
-
-
-@app.route('/attendance_stats')
-def attendance_stats():
-    return render_template('attendance_stats.html')
-
-# ========== ASSIGNMENT ROUTES ==========
-
-
-@app.route('/assignments', methods=['GET', 'POST'])
-def assignments():
-    if request.method == 'POST':
-        title = request.form['title']
-        year = request.form['year']
-        subject = request.form['subject']
-        description = request.form['description']
-        file = request.files['file']
-
-        if file and file.filename != '':
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-
-            new_assignment = Assignment(
-                title=title, year=year, subject=subject,
-                filename=filename, upload_date=date.today().strftime('%Y-%m-%d'),
-                description=description
-            )
-            db.session.add(new_assignment)
-            db.session.commit()
-            flash('Assignment uploaded successfully!', 'success')
-        else:
-            flash('Please select a file to upload', 'error')
-
-    assignments = Assignment.query.order_by(
-        Assignment.upload_date.desc()).all()
-    return render_template('assignments.html', assignments=assignments)
-
-
-@app.route('/delete_assignment/<int:assignment_id>')
-def delete_assignment(assignment_id):
-    assignment = Assignment.query.get_or_404(assignment_id)
-    try:
-        os.remove(os.path.join(
-            app.config['UPLOAD_FOLDER'], assignment.filename))
-    except:
-        pass
-    db.session.delete(assignment)
-    db.session.commit()
-    flash('Assignment deleted successfully!', 'success')
-    return redirect(url_for('assignments'))
-
-# ========== NOTES ROUTES ==========
-
-
-@app.route('/notes', methods=['GET', 'POST'])
-def notes():
-    if request.method == 'POST':
-        title = request.form['title']
-        year = request.form['year']
-        subject = request.form['subject']
-        description = request.form['description']
-        file = request.files['file']
-
-        if file and file.filename != '':
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-
-            new_note = Note(
-                title=title, year=year, subject=subject,
-                filename=filename, upload_date=date.today().strftime('%Y-%m-%d'),
-                description=description
-            )
-            db.session.add(new_note)
-            db.session.commit()
-            flash('Notes uploaded successfully!', 'success')
-        else:
-            flash('Please select a file to upload', 'error')
-
-    notes = Note.query.order_by(Note.upload_date.desc()).all()
-    return render_template('notes.html', notes=notes)
-
-
-@app.route('/delete_note/<int:note_id>')
-def delete_note(note_id):
-    note = Note.query.get_or_404(note_id)
-    try:
-        os.remove(os.path.join(app.config['UPLOAD_FOLDER'], note.filename))
-    except:
-        pass
-    db.session.delete(note)
-    db.session.commit()
-    flash('Note deleted successfully!', 'success')
-    return redirect(url_for('notes'))
-
-# ========== SYLLABUS ROUTES ==========
-
-
-@app.route('/syllabus_tracker')
-def syllabus_tracker():
-    syllabus_data = Syllabus.query.all()
-    progress_data = {}
-    for topic in syllabus_data:
-        key = f"{topic.year} - {topic.subject}"
-        if key not in progress_data:
-            progress_data[key] = {'total': 0, 'completed': 0}
-        progress_data[key]['total'] += 1
-        if topic.completed:
-            progress_data[key]['completed'] += 1
-
-    return render_template('syllabus_tracker.html', syllabus_data=syllabus_data, progress_data=progress_data)
-
-
-@app.route('/update_syllabus', methods=['POST'])
-def update_syllabus():
-    topic_id = request.form['topic_id']
-    completed = request.form.get('completed') == 'true'
-    topic = Syllabus.query.get(topic_id)
-    if topic:
-        topic.completed = completed
-        topic.completion_date = date.today().strftime('%Y-%m-%d') if completed else None
-        db.session.commit()
-    return jsonify({'status': 'success'})
-
-
-@app.route('/init_syllabus')
-def init_syllabus():
-    Syllabus.query.delete()
-    for year, subjects in SAMPLE_SYLLABUS.items():
-        for subject, topics in subjects.items():
-            for topic in topics:
-                new_topic = Syllabus(
-                    year=year, subject=subject, topic=topic, completed=False)
-                db.session.add(new_topic)
-    db.session.commit()
-    flash('Syllabus initialized with sample data!', 'success')
-    return redirect(url_for('syllabus_tracker'))
-
-# ========== STUDENT ROUTES ==========
-
-
-@app.route('/students')
-def students():
-    students = Student.query.all()
-    return render_template('students.html', students=students)
-
-
-@app.route('/add_student', methods=['POST'])
-def add_student():
-    name = request.form['name']
-    roll_number = request.form['roll_number']
-    year = request.form['year']
-    email = request.form['email']
-    phone = request.form['phone']
-
-    existing = Student.query.filter_by(roll_number=roll_number).first()
-    if existing:
-        flash('Student with this roll number already exists!', 'error')
-        return redirect(url_for('students'))
-
-    new_student = Student(name=name, roll_number=roll_number,
-                          year=year, email=email, phone=phone, marks='{}')
-    db.session.add(new_student)
-    db.session.commit()
-    flash('Student added successfully!', 'success')
-    return redirect(url_for('students'))
-
-
-@app.route('/edit_student/<int:student_id>', methods=['POST'])
-def edit_student(student_id):
-    student = Student.query.get_or_404(student_id)
-    student.name = request.form['name']
-    student.roll_number = request.form['roll_number']
-    student.year = request.form['year']
-    student.email = request.form['email']
-    student.phone = request.form['phone']
-    db.session.commit()
-    flash('Student updated successfully!', 'success')
-    return redirect(url_for('students'))
-
-
-@app.route('/delete_student/<int:student_id>')
-def delete_student(student_id):
-    student = Student.query.get_or_404(student_id)
-    db.session.delete(student)
-    db.session.commit()
-    flash('Student deleted successfully!', 'success')
-    return redirect(url_for('students'))
-
-
-@app.route('/student_marks/<int:student_id>')
-def student_marks(student_id):
-    student = Student.query.get_or_404(student_id)
-    marks = json.loads(student.marks) if student.marks else {}
-    return render_template('student_marks.html', student=student, marks=marks)
-
-
-@app.route('/update_marks/<int:student_id>', methods=['POST'])
-def update_marks(student_id):
-    student = Student.query.get_or_404(student_id)
-    subject = request.form['subject']
-    marks = request.form['marks']
-    current_marks = json.loads(student.marks) if student.marks else {}
-    current_marks[subject] = marks
-    student.marks = json.dumps(current_marks)
-    db.session.commit()
-    flash('Marks updated successfully!', 'success')
-    return redirect(url_for('student_marks', student_id=student_id))
-
-# ========== FILE DOWNLOAD ==========
-
-
-@app.route('/download/<filename>')
-def download_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
 # ========== DATABASE INITIALIZATION ==========
 
 
-def init_db():
-    with app.app_context():
+def init_db(app, sample_data=True):
+    # Safe to run again and from several processes at once: each step checks
+    # what is already there, under a lock held across the whole run
+    for folder in ('BLOB_FOLDER', 'EXPORT_FOLDER', 'UPLOAD_FOLDER'):
+        os.makedirs(app.config[folder], exist_ok=True)
+    os.makedirs(os.path.join(app.instance_path, 'departments'), exist_ok=True)
+    with app.app_context(), init_lock(app, db.engine):
+        upgrade_database(db.engine)
         db.create_all()
-
-        # Add sample events
-        if Event.query.count() == 0:
-            sample_events = [
-                Event(title='SE Lecture - Software Engineering',
-                      date=date.today().strftime('%Y-%m-%d'), time='09:00', type='lecture'),
-                Event(title='TE Lecture - Database Systems',
-                      date=date.today().strftime('%Y-%m-%d'), time='11:00', type='lecture'),
-                Event(title='Department Meeting', date=date.today().strftime(
-                    '%Y-%m-%d'), time='14:00', type='meeting')
-            ]
-            for event in sample_events:
-                db.session.add(event)
-
-        # Add sample students
-        if Student.query.count() == 0:
-            for student_data in SE_STUDENTS:
-                student = Student(
-                    name=student_data['name'],
-                    roll_number=student_data['roll'],
-                    year='SE',
-                    email=student_data['email'],
-                    phone=student_data['phone'],
-                    marks='{}'
-                )
-                db.session.add(student)
-
-            for student_data in TE_STUDENTS:
-                student = Student(
-                    name=student_data['name'],
-                    roll_number=student_data['roll'],
-                    year='TE',
-                    email=student_data['email'],
-                    phone=student_data['phone'],
-                    marks='{}'
-                )
-                db.session.add(student)
-
+        seed_database(db.engine, sample_data)
+        # Pages cached from an earlier database in the same file are stale
+        if app.extensions.get('response_cache') is not None:
+            app.extensions['response_cache'].clear()
+        router = app.extensions['shards']
+        for department in router.departments:
+            with use_department(department):
+                engine = current_shard()[1]
+                router.create_schema(engine, department)
+                seed_database(engine, sample_data)
+
+
+def upgrade_database(engine):
+    # Brings a SQLite file from an older release (like the committed
+    # instance/faculty.db) to the current schema before anything queries it
+    path = engine.url.database
+    if engine.dialect.name != 'sqlite' or not path or path == ':memory:' or not os.path.exists(path):
+        return
+    if migrations.needed(path):
+        engine.dispose()
+        migrations.upgrade(path)
+
+
+def seed_database(engine, sample_data):
+    if sample_data:
+        add_sample_data()
+
+    if DashboardStats.query.first() is None:
+        rebuild_stats()
+
+    if search.enabled(engine) and not db.inspect(engine).has_table('search_index'):
+        search.create_index(db.session.connection())
         db.session.commit()
+        if 'search_reindex' in jobs.handlers and (
+                Note.query.first() or Assignment.query.first()):
+            jobs.enqueue('search_reindex')
+
+
+@click.command('init-db')
+@click.option('--no-sample-data', is_flag=True, help='Leave empty tables empty.')
+@with_appcontext
+def init_db_command(no_sample_data):
+    """Create the database tables and add the sample data."""
+    init_db(current_app, sample_data=not no_sample_data)
+    print('Database initialized.')
+
+
+@click.command('build-assets')
+@click.option('--offline', is_flag=True, help='Do not download missing vendor libraries.')
+@click.option('--prune', is_flag=True, help='Delete files left over from earlier builds.')
+@with_appcontext
+def build_assets_command(offline, prune):
+    """Vendor, bundle, fingerprint and compress the static assets."""
+    static_folder = current_app.static_folder
+    if not offline:
+        for path in assets.download_vendor(static_folder):
+            print(f'Downloaded {path}')
+    missing = assets.missing_vendor(static_folder)
+    if missing:
+        raise click.ClickException(f'Missing vendor files: {", ".join(missing)}')
+    manifest = assets.build(static_folder)
+    for bundle in assets.BUNDLES:
+        print(f'{bundle} -> {assets.DIST}/{manifest[bundle]}')
+    if prune:
+        print(f'Removed {len(assets.prune(static_folder, manifest))} old files.')
 
 
-# Create necessary folders
-if not os.path.exists('templates'):
-    os.makedirs('templates')
-if not os.path.exists('static/uploads'):
-    os.makedirs('static/uploads')
-
 if __name__ == '__main__':
-    init_db()
+    # The single-process dev server can keep its page cache in memory
+    app = create_app({'RESPONSE_CACHE': os.environ.get('RESPONSE_CACHE', 'memory')})
+    init_db(app)
     print("✅ Enhanced Faculty Management System starting...")
     print("🌐 Open: http://localhost:5000")
     app.run(debug=True)
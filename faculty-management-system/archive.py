@@ -0,0 +1,124 @@
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+# Bit-packed storage for attendance of closed terms. A term's rows for one
+# subject become a date index (the subject's lecture dates, stored once) and,
+# per student, two bitsets over that index: bit i of `present` is set when the
+# student attended lecture i, and bit i of `recorded` when attendance was
+# taken for them at all. `recorded` is stored empty when it covers every
+# lecture, which is the usual case. A term of 120 lectures then takes 30 bytes
+# per student and subject instead of 120 indexed rows.
+#
+# Bitsets are Python ints (bit i = lecture i, oldest first) stored as
+# little-endian bytes. Counting and masking run over the whole bitset at once
+# through popcount() and the bitwise operators.
+
+DATE_INDEX_VERSION = 1
+
+
+def encode_dates(dates):
+    # Version byte, first date as a 4-byte ordinal, then one varint day
+    # delta per later date
+    dates = sorted(dates)
+    if not dates:
+        return bytes([DATE_INDEX_VERSION])
+    out = bytearray([DATE_INDEX_VERSION])
+    out += dates[0].toordinal().to_bytes(4, 'big')
+    previous = dates[0].toordinal()
+    for day in dates[1:]:
+        delta = day.toordinal() - previous
+        previous += delta
+        while delta >= 0x80:
+            out.append(delta & 0x7f | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+
+def decode_dates(blob):
+    if blob[0] != DATE_INDEX_VERSION:
+        raise ValueError(f'Unknown date index version {blob[0]}')
+    if len(blob) == 1:
+        return []
+    ordinal = int.from_bytes(blob[1:5], 'big')
+    dates = [date.fromordinal(ordinal)]
+    delta = shift = 0
+    for byte in blob[5:]:
+        delta |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        ordinal += delta
+        dates.append(date.fromordinal(ordinal))
+        delta = shift = 0
+    return dates
+
+
+def pack(bits, length):
+    return bits.to_bytes((length + 7) // 8, 'little')
+
+
+def unpack(blob):
+    return int.from_bytes(blob, 'little')
+
+
+def full_mask(length):
+    return (1 << length) - 1
+
+
+def date_mask(dates, start=None, end=None):
+    # Bits of the lectures between start and end (inclusive) in a date index
+    low = bisect_left(dates, start) if start else 0
+    high = bisect_right(dates, end) if end else len(dates)
+    return full_mask(high) & ~full_mask(low) if high > low else 0
+
+
+def recorded_bits(blob, length):
+    return unpack(blob) if blob else full_mask(length)
+
+
+def popcount(bits):
+    # int.bit_count() needs Python 3.10; the README promises 3.8
+    return bin(bits).count('1')
+
+
+def counts(present, recorded, mask):
+    # (lectures attended, lectures recorded) within the mask
+    return popcount(present & recorded & mask), popcount(recorded & mask)
+
+
+def compress(bits, recorded, length):
+    # Drops the lectures that were not recorded, so runs are counted over
+    # the lectures the student actually had
+    if recorded == full_mask(length):
+        return bits, length
+    packed = position = 0
+    for i in range(length):
+        if recorded >> i & 1:
+            packed |= (bits >> i & 1) << position
+            position += 1
+    return packed, position
+
+
+def longest_run(bits):
+    # Each step shortens every run of ones by one, so the number of steps
+    # is the longest run
+    steps = 0
+    while bits:
+        bits &= bits >> 1
+        steps += 1
+    return steps
+
+
+def current_run(bits, length):
+    # Ones counted back from the most recent lecture
+    return length - (~bits & full_mask(length)).bit_length()
+
+
+def streaks(present, recorded, length):
+    bits, length = compress(present & recorded, recorded, length)
+    absent = ~bits & full_mask(length)
+    return {'longest_present': longest_run(bits),
+            'current_present': current_run(bits, length),
+            'longest_absent': longest_run(absent),
+            'current_absent': current_run(absent, length)}
@@ -0,0 +1,194 @@
+import asyncio
+import contextvars
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# ASGI adapter for serving the Flask app under an event loop (see serve.py).
+# A plain WSGI server ties a worker up for the whole of a transfer, so a few
+# slow clients uploading notes or downloading files exhaust it. Here the
+# event loop does the network I/O: a request body is first received in full
+# (kept in memory while small, then spooled to a temporary file), and only
+# then is the Flask app called on a small thread pool, reading the body from
+# local memory or disk. Response bodies go back one chunk per pool task, so no
+# thread waits on a slow reader; files from send_file() are read in
+# FILE_CHUNK_SIZE pieces. Hundreds of slow transfers then cost coroutines,
+# not threads.
+
+SPOOL_MEMORY_BYTES = 1024 * 1024  # larger bodies go to a temporary file
+FILE_CHUNK_SIZE = 256 * 1024
+
+
+class FileWrapper:
+    # wsgi.file_wrapper: send_file() hands the open file over so the adapter
+    # can read it in chunks instead of holding a thread for the transfer
+
+    def __init__(self, file, block_size=FILE_CHUNK_SIZE):
+        self.file = file
+        # send_file() asks for 8 KB blocks; each block is one pool task here
+        self.block_size = max(block_size, FILE_CHUNK_SIZE)
+
+    def __iter__(self):
+        return iter(lambda: self.file.read(self.block_size), b'')
+
+    def close(self):
+        self.file.close()
+
+
+class PayloadTooLarge(Exception):
+    pass
+
+
+class ClientDisconnected(Exception):
+    # The client went away before sending the whole body
+    pass
+
+
+class AsgiAdapter:
+
+    def __init__(self, wsgi_app, threads=4, max_body=None):
+        self.wsgi_app = wsgi_app
+        self.max_body = max_body
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def run(self, function, *args, context=None):
+        if context is not None:
+            function, args = context.run, (function,) + args
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def http(self, scope, receive, send):
+        try:
+            body, length = await self.read_body(scope, receive)
+        except PayloadTooLarge:
+            await send({'type': 'http.response.start', 'status': 413,
+                        'headers': [(b'content-type', b'text/plain')]})
+            await send({'type': 'http.response.body', 'body': b'Request body too large'})
+            return
+        except ClientDisconnected:
+            # Nobody to answer, and a partial body must never reach the app
+            return
+        try:
+            await self.respond(self.environ(scope, body, length), send)
+        finally:
+            await self.run(body.close)
+
+    async def read_body(self, scope, receive):
+        declared = dict(scope['headers']).get(b'content-length')
+        if self.max_body is not None and declared and int(declared) > self.max_body:
+            raise PayloadTooLarge()
+        body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+        length = 0
+        more = True
+        while more:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                await self.run(body.close)
+                raise ClientDisconnected()
+            chunk = message.get('body', b'')
+            more = message.get('more_body', False)
+            length += len(chunk)
+            if self.max_body is not None and length > self.max_body:
+                await self.run(body.close)
+                raise PayloadTooLarge()
+            if length > SPOOL_MEMORY_BYTES:
+                # Once spooled to disk the write may block
+                await self.run(body.write, chunk)
+            else:
+                body.write(chunk)
+        if declared and length < int(declared):
+            await self.run(body.close)
+            raise ClientDisconnected()
+        body.seek(0)
+        return body, length
+
+    def environ(self, scope, body, length):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'CONTENT_LENGTH': str(length),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.input_terminated': True,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            'wsgi.file_wrapper': FileWrapper,
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    async def respond(self, environ, send):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                  for name, value in headers]
+
+        # Flask keeps the request context in context variables, and a streamed
+        # response resumes on whichever pool thread is free, so every step of
+        # one request runs in the same copied context
+        context = contextvars.copy_context()
+        result = await self.run(self.wsgi_app, environ, start_response, context=context)
+        try:
+            chunks = iter(result)
+            # Apps may call start_response on their first chunk
+            first = await self.run(next, chunks, None, context=context) if not started else b''
+            await send({'type': 'http.response.start', 'status': started['status'],
+                        'headers': started['headers']})
+            if first:
+                await send({'type': 'http.response.body', 'body': first, 'more_body': True})
+            if environ['REQUEST_METHOD'] != 'HEAD':
+                while True:
+                    chunk = await self.run(next, chunks, None, context=context)
+                    if chunk is None:
+                        break
+                    if chunk:
+                        await send({'type': 'http.response.body', 'body': chunk,
+                                    'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                await self.run(result.close, context=context)
+
+
+def create_application():
+    from app import create_app
+    app = create_app()
+    return AsgiAdapter(app, threads=int(os.environ.get('ASGI_THREADS', 4)),
+                       max_body=app.config['MAX_CONTENT_LENGTH'])
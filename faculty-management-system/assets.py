@@ -0,0 +1,261 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+import urllib.request
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # .br variants are optional
+    brotli = None
+
+try:
+    import rcssmin
+    import rjsmin
+except ImportError:  # falls back to the conservative minifiers below
+    rcssmin = rjsmin = None
+
+# Static asset pipeline. `flask build-assets` downloads the pinned third-party
+# libraries into static/vendor (once; commit them), concatenates and minifies
+# the bundles below, and writes content-hashed copies plus gzip/brotli
+# variants to static/dist with a manifest mapping logical names to the hashed
+# files. Hashed files never change, so they are served with far-future
+# immutable cache headers.
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+DOWNLOAD_TIMEOUT = 30
+# Smaller text files are not worth a compressed variant
+COMPRESS_MIN_BYTES = 512
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ttf', '.json')
+
+# Static path -> pinned CDN URL
+VENDOR = {
+    'vendor/bootstrap/bootstrap.min.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js',
+    'vendor/chart.js/chart.umd.js':
+        'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.js',
+    'vendor/fontawesome/css/all.min.css':
+        'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
+}
+for _font in ('fa-brands-400', 'fa-regular-400', 'fa-solid-900', 'fa-v4compatibility'):
+    for _extension in ('woff2', 'ttf'):
+        VENDOR[f'vendor/fontawesome/webfonts/{_font}.{_extension}'] = (
+            f'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/webfonts/{_font}.{_extension}')
+
+# Logical bundle name -> static paths, in load order
+BUNDLES = {
+    'app.css': ['vendor/bootstrap/bootstrap.min.css',
+                'vendor/fontawesome/css/all.min.css',
+                'css/style.css'],
+    'app.js': ['vendor/bootstrap/bootstrap.bundle.min.js',
+               'vendor/chart.js/chart.umd.js',
+               'js/script.js'],
+}
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+SOURCE_MAP = re.compile(r'^\s*(//[#@] sourceMappingURL=.*|/\*# sourceMappingURL=.*\*/)\s*$', re.M)
+CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)|(\s+)', re.S)
+CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+URL_SUFFIX = re.compile(r'([^?#]*)(\?[^#]*)?(#.*)?')
+
+
+def download_vendor(static_folder, force=False):
+    # Fetches the pinned libraries that are not in static/vendor yet; returns
+    # the paths downloaded
+    fetched = []
+    for path, url in VENDOR.items():
+        target = os.path.join(static_folder, path)
+        if os.path.exists(target) and not force:
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+            write_file(target, response.read())
+        fetched.append(path)
+    return fetched
+
+
+def missing_vendor(static_folder):
+    return [path for path in VENDOR if not os.path.exists(os.path.join(static_folder, path))]
+
+
+def write_file(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def minify_css(text):
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+
+    # Drops comments and collapses whitespace in the code between strings;
+    # the strings themselves are copied through untouched
+    def squeeze(code):
+        return CSS_PUNCTUATION.sub(r'\1', code).replace(';}', '}')
+
+    pieces = []
+    code = ''
+    last = 0
+    for match in CSS_TOKENS.finditer(text):
+        string, comment, space = match.groups()
+        code += text[last:match.start()]
+        last = match.end()
+        if string:
+            pieces += [squeeze(code), string]
+            code = ''
+        elif space:
+            code += ' '
+    pieces.append(squeeze(code + text[last:]))
+    return ''.join(pieces).strip()
+
+
+def minify_js(text):
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    # Only strips indentation, blank lines and whole-line comments; enough
+    # for our own small scripts
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def fingerprint(name, data):
+    stem, extension = posixpath.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}'
+
+
+def build(static_folder):
+    # Writes the bundles and the files they reference to static/dist and
+    # returns the new manifest. Earlier builds are left in place, since pages
+    # already rendered (or cached) may still point at them.
+    dist = os.path.join(static_folder, DIST)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+
+    def emit(name, data):
+        hashed = fingerprint(posixpath.basename(name), data)
+        path = os.path.join(dist, hashed)
+        if not os.path.exists(path):
+            write_file(path, data)
+            compress(path, data)
+        manifest[name] = hashed
+        return hashed
+
+    def copy_referenced(source, match):
+        # Gives files referenced from CSS (fonts, images) a hashed name in dist
+        quote, url = match.groups()
+        if re.match(r'^(data:|[a-z]+://|//|#)', url):
+            return match.group(0)
+        path, fragment = URL_SUFFIX.match(url).group(1, 3)
+        static_path = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+        with open(os.path.join(static_folder, static_path), 'rb') as f:
+            hashed = emit(static_path, f.read())
+        # #fragments (SVG ids) are kept; ?v= cache busters are dropped since
+        # the hash replaces them
+        return f"url({quote}{hashed}{fragment or ''}{quote})"
+
+    for bundle, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+                text = SOURCE_MAP.sub('', f.read())
+            if bundle.endswith('.css'):
+                text = CSS_URL.sub(lambda match: copy_referenced(source, match), text)
+            # Vendored files ship minified
+            if not source.startswith('vendor/'):
+                text = minify_css(text) if bundle.endswith('.css') else minify_js(text)
+            parts.append(text)
+        # The separator keeps one script's missing semicolon from merging it
+        # into the next
+        emit(bundle, ('\n' if bundle.endswith('.css') else '\n;\n').join(parts).encode())
+
+    write_file(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def compress(path, data):
+    if not path.endswith(COMPRESSIBLE) or len(data) < COMPRESS_MIN_BYTES:
+        return
+    write_file(path + '.gz', gzip.compress(data, 9, mtime=0))
+    if brotli is not None:
+        write_file(path + '.br', brotli.compress(data))
+
+
+def prune(static_folder, manifest):
+    # Removes dist files that the current manifest does not reference
+    dist = os.path.join(static_folder, DIST)
+    keep = {MANIFEST} | set(manifest.values())
+    removed = []
+    for name in os.listdir(dist):
+        original = name[:-3] if name.endswith(('.gz', '.br')) else name
+        if original not in keep:
+            os.remove(os.path.join(dist, name))
+            removed.append(name)
+    return removed
+
+
+class Assets:
+    # Resolves logical asset names for templates. Without a build, a bundle
+    # resolves to its source files, and vendored libraries not downloaded yet
+    # to their CDN URLs, so a fresh checkout still renders.
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.path = os.path.join(static_folder, DIST, MANIFEST)
+        self.mtime = None
+        self.manifest = {}
+
+    def load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self.mtime:
+            self.mtime = mtime
+            if mtime is None:
+                self.manifest = {}
+            else:
+                with open(self.path) as f:
+                    self.manifest = json.load(f)
+        return self.manifest
+
+    def paths(self, bundle):
+        # Static paths (or CDN URLs) for a bundle
+        manifest = self.load()
+        if bundle in manifest:
+            return [f'{DIST}/{manifest[bundle]}']
+        return [source if source not in VENDOR
+                or os.path.exists(os.path.join(self.static_folder, source))
+                else VENDOR[source] for source in BUNDLES[bundle]]
+
+
+def send_asset(directory, filename):
+    # Serves a built file, or its .br/.gz variant when the client accepts it
+    if filename == MANIFEST:
+        return send_from_directory(directory, filename, max_age=0)
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in request.accept_encodings and os.path.isfile(
+                os.path.join(directory, filename + suffix)):
+            response = send_from_directory(directory, filename + suffix)
+            response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
@@ -0,0 +1,73 @@
+# Compares the old per-row ORM attendance path with the bulk upsert engine
+# at 10/100/1000 students per session, on a throwaway SQLite database.
+#
+#     python -m bench.bulk_attendance [--sessions 5]
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from app import create_app
+from models import db, Attendance, Student, PRESENT, ABSENT
+from views.attendance import get_or_create_subject, save_attendance_sessions
+
+SIZES = [10, 100, 1000]
+
+
+def make_students(year, count):
+    db.session.add_all(Student(name=f'Student {year}{i}', roll_number=f'{year}{i:05d}',
+                               year=year) for i in range(count))
+    db.session.commit()
+    return [s.id for s in Student.query.filter_by(year=year).all()]
+
+
+def orm_path(year, subject, session_date, statuses):
+    subject_id = get_or_create_subject(year, subject).id
+    for student_id, status in statuses.items():
+        db.session.add(Attendance(date=session_date, student_id=student_id,
+                                  subject_id=subject_id, status=status))
+    db.session.commit()
+
+
+def bulk_path(year, subject, session_date, statuses):
+    save_attendance_sessions([(year, subject, session_date, statuses)])
+
+
+def run(path, year, student_ids, sessions, first_day):
+    timings = []
+    for n in range(sessions):
+        statuses = {sid: PRESENT if (sid + n) % 5 else ABSENT for sid in student_ids}
+        start = time.perf_counter()
+        path(year, 'Benchmarking', first_day + timedelta(days=n), statuses)
+        timings.append(time.perf_counter() - start)
+    return sum(timings) / len(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare the ORM and bulk attendance write paths.')
+    parser.add_argument('--sessions', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(), 'bench.db'), 'JOB_WORKERS': 0})
+    with app.app_context():
+        db.create_all()
+        print(f"{'students':>10} {'orm ms':>10} {'bulk ms':>10} {'resubmit ms':>12} {'speedup':>8}")
+        for size in SIZES:
+            year = f'B{size}'
+            student_ids = make_students(year, size)
+            orm = run(orm_path, year, student_ids, args.sessions, date(2000, 1, 1))
+            bulk = run(bulk_path, year, student_ids, args.sessions, date(2001, 1, 1))
+            resubmit = run(bulk_path, year, student_ids, args.sessions, date(2001, 1, 1))
+            print(f'{size:>10} {orm:>10.2f} {bulk:>10.2f} {resubmit:>12.2f} {orm / bulk:>7.1f}x')
+
+        # Resubmissions must have upserted rather than duplicated
+        expected = sum(SIZES) * args.sessions * 2
+        actual = Attendance.query.count()
+        assert actual == expected, f'expected {expected} rows, found {actual}'
+
+
+if __name__ == '__main__':
+    main()
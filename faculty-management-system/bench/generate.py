@@ -0,0 +1,175 @@
+# Synthetic data generator for load testing. Builds a database with N
+# students, M subjects and a full term of daily attendance (one row per
+# student per subject per teaching day), plus marks, syllabus topics,
+# assignments, one-off events and a weekly recurring lecture timetable. The
+# defaults give about two million attendance rows.
+#
+#     python -m bench.generate [--database instance/bench.db] [--students 4000]
+#                              [--subjects 8] [--days 120] [--reset]
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+YEARS = ['SE', 'TE']
+EVENT_TYPES = ['lecture', 'meeting', 'exam', 'other']
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR']
+
+
+def teaching_days(start, count):
+    # Weekdays only, starting from the first teaching day of the term
+    day = start
+    while count:
+        if day.weekday() < 5:
+            yield day
+            count -= 1
+        day += timedelta(days=1)
+
+
+def create_schema(database):
+    # Let the app create its tables, indexes and sample data so the
+    # generated database matches what the app would build itself
+    from app import create_app, init_db
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(database)}',
+                      'JOB_WORKERS': 0})
+    init_db(app)
+    return app
+
+
+def insert_batches(conn, sql, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            conn.executemany(sql, batch)
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+
+
+def generate(database, students, subjects, days, start, batch_size, rng):
+    from stats import get_dashboard_stats, rebuild_stats
+    from views.files import reindex_search
+    from views.students import DEFAULT_ASSESSMENT
+    app = create_schema(database)
+    conn = sqlite3.connect(database, isolation_level=None)
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        subject_ids = {year: [] for year in YEARS}
+        for i in range(subjects):
+            year = YEARS[i % len(YEARS)]
+            cursor = conn.execute('INSERT INTO subject (name, year) VALUES (?, ?)',
+                                  (f'Subject {i + 1:03d}', year))
+            subject_ids[year].append(cursor.lastrowid)
+
+        insert_batches(conn, 'INSERT INTO student (name, roll_number, year, email, phone) '
+                             'VALUES (?, ?, ?, ?, ?)',
+                       ((f'Student {i:06d}', f'GEN{i:06d}', YEARS[i % len(YEARS)],
+                         f'student{i}@example.edu', f'9{i:09d}') for i in range(students)),
+                       batch_size)
+        student_ids = {year: [row[0] for row in conn.execute(
+            "SELECT id FROM student WHERE year = ? AND roll_number LIKE 'GEN%'", (year,))]
+            for year in YEARS}
+        # Each student gets a steady attendance rate so per-student stats vary
+        rates = {sid: rng.uniform(0.55, 0.98) for ids in student_ids.values() for sid in ids}
+
+        term = list(teaching_days(start, days))
+
+        def attendance_rows():
+            for day in term:
+                iso = day.isoformat()
+                for year in YEARS:
+                    for subject_id in subject_ids[year]:
+                        for sid in student_ids[year]:
+                            yield iso, sid, subject_id, int(rng.random() < rates[sid])
+
+        insert_batches(conn, 'INSERT INTO attendance (date, student_id, subject_id, status) '
+                             'VALUES (?, ?, ?, ?)', attendance_rows(), batch_size)
+
+        insert_batches(conn, 'INSERT INTO mark (student_id, subject_id, assessment, score) '
+                             'VALUES (?, ?, ?, ?)',
+                       ((sid, subject_id, DEFAULT_ASSESSMENT, round(rng.uniform(20, 100), 2))
+                        for year in YEARS for subject_id in subject_ids[year]
+                        for sid in student_ids[year]), batch_size)
+
+        names = dict(conn.execute('SELECT id, name FROM subject'))
+        conn.executemany('INSERT INTO syllabus (year, subject, topic, completed, completion_date) '
+                         'VALUES (?, ?, ?, ?, ?)',
+                         [(year, names[subject_id], f'Topic {n + 1}', done,
+                           term[n * len(term) // 12].isoformat() if done else None)
+                          for year in YEARS for subject_id in subject_ids[year]
+                          for n in range(12) for done in [int(rng.random() < 0.5)]])
+        conn.executemany('INSERT INTO assignment (title, year, subject, filename, upload_date, description) '
+                         'VALUES (?, ?, ?, ?, ?, ?)',
+                         [(f'Assignment {n + 1}', year, names[subject_id],
+                           f'assignment_{subject_id}_{n + 1}.pdf',
+                           term[n * len(term) // 10].isoformat(), 'Generated for load testing')
+                          for year in YEARS for subject_id in subject_ids[year] for n in range(10)])
+        conn.executemany('INSERT INTO event (title, date, time, type, description, notified) '
+                         'VALUES (?, ?, ?, ?, ?, 0)',
+                         [(f'Event {n + 1}', rng.choice(term).isoformat(),
+                           f'{rng.randint(8, 17):02d}:00:00.000000', rng.choice(EVENT_TYPES), None)
+                          for n in range(max(20, days))])
+        # A weekly timetable: two lectures a week per subject for the term
+        for year in YEARS:
+            for n, subject_id in enumerate(subject_ids[year]):
+                byday = [WEEKDAYS[n % 5], WEEKDAYS[(n + 2) % 5]]
+                event_id = conn.execute(
+                    'INSERT INTO event (title, date, time, type, description, notified) '
+                    "VALUES (?, ?, ?, 'lecture', NULL, 0)",
+                    (f'{year} Lecture - {names[subject_id]}', term[0].isoformat(),
+                     f'{9 + n % 6:02d}:00:00.000000')).lastrowid
+                conn.execute('INSERT INTO event_recurrence (event_id, freq, interval, byday, until) '
+                             "VALUES (?, 'WEEKLY', 1, ?, ?)",
+                             (event_id, ','.join(byday), term[-1].isoformat()))
+        # Counters are rebuilt from the real tables below
+        conn.execute('DELETE FROM dashboard_stats')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+    with app.app_context():
+        rebuild_stats()
+        # The generated assignments have no files, so only metadata is indexed
+        reindex_search(extract=False)
+        return get_dashboard_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Fill a database with synthetic data for load testing.')
+    parser.add_argument('--database', default=os.path.join('instance', 'bench.db'))
+    parser.add_argument('--students', type=int, default=4000)
+    parser.add_argument('--subjects', type=int, default=8)
+    parser.add_argument('--days', type=int, default=120, help='teaching days in the term')
+    parser.add_argument('--start', type=date.fromisoformat, default=date(2025, 1, 6))
+    parser.add_argument('--batch-size', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--reset', action='store_true',
+                        help='delete the database file first')
+    args = parser.parse_args()
+
+    if os.path.exists(args.database):
+        if not args.reset:
+            parser.error(f'{args.database} exists; pass --reset to replace it')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.database + suffix):
+                os.remove(args.database + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(args.database)), exist_ok=True)
+
+    started = time.perf_counter()
+    stats = generate(args.database, args.students, args.subjects, args.days,
+                     args.start, args.batch_size, random.Random(args.seed))
+    print(f'Generated {args.database} in {time.perf_counter() - started:.1f}s: '
+          f"{stats['student_total']} students, {stats['attendance_total']} attendance rows, "
+          f"{stats['syllabus_total']} syllabus topics, {stats['assignment_total']} assignments")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+# Load-test harness. Drives the Flask test client against the main pages and
+# JSON endpoints on a generated database (see bench.generate) and reports
+# throughput, p50/p95/p99 latency and SQL query counts per route. Results
+# are written as JSON; given a baseline from an earlier commit, the run fails
+# when a route's p95 slows down beyond the threshold or it runs more queries.
+#
+#     python -m bench.load --database instance/bench.db [--requests 50]
+#                          [--output results.json] [--baseline old.json]
+#                          [--threshold 0.25]
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from bench.sqlite_concurrency import percentile
+
+# {subject} and {subject_id} are filled in with the last subject generated
+ROUTES = [
+    '/',
+    '/attendance_records',
+    '/attendance_records?year=SE&subject={subject}',
+    '/calendar',
+    '/syllabus_tracker',
+    '/students',
+    '/get_attendance_chart_data',
+    '/syllabus_progress',
+    '/api/syllabus/progress',
+    '/api/students?year=SE',
+    '/api/attendance/stats',
+    '/api/attendance/stats/subject',
+    '/api/attendance/stats/month?year=SE',
+    '/api/marks/subjects/{subject_id}?top=20',
+    # The month grid of the generator's default term (March 2025)
+    '/api/events?start=2025-02-24&end=2025-04-06',
+    '/search?q=assignment+subject',
+]
+SERVER_TIMING = re.compile(r'db;dur=([0-9.]+);desc="(\d+) queries"')
+
+
+def load_app(database):
+    from app import create_app
+    # Cached pages would report no queries and time only the cache hit, so
+    # the baseline check could never see a regression; background jobs would
+    # compete with the measured requests
+    return create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(database)}',
+                       'PROPAGATE_EXCEPTIONS': True,
+                       'RESPONSE_CACHE': 'off',
+                       'READ_CACHES': False,
+                       'JOB_WORKERS': 0})
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(client, url, requests, warmup):
+    for _ in range(warmup):
+        client.get(url)
+    latencies, db_times, queries, errors = [], [], [], 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get(url)
+        response.get_data()
+        latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors += 1
+        timing = SERVER_TIMING.search(response.headers.get('Server-Timing', ''))
+        if timing:
+            db_times.append(float(timing.group(1)) / 1000)
+            queries.append(int(timing.group(2)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'db_p50_ms': round(percentile(db_times, 0.50), 2),
+        'queries': max(queries, default=0),
+    }
+
+
+def regressions(results, baseline, threshold, min_delta):
+    # A route regresses when its p95 grows by more than the threshold (and by
+    # at least min_delta ms, to ignore noise on fast routes) or when it runs
+    # more SQL statements than before
+    found = []
+    for url, row in results['routes'].items():
+        old = baseline['routes'].get(url)
+        if old is None:
+            continue
+        if (row['p95_ms'] > old['p95_ms'] * (1 + threshold)
+                and row['p95_ms'] - old['p95_ms'] >= min_delta):
+            found.append(f"{url}: p95 {old['p95_ms']} -> {row['p95_ms']} ms")
+        if row['queries'] > old['queries']:
+            found.append(f"{url}: queries {old['queries']} -> {row['queries']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure route latency on a generated database.')
+    parser.add_argument('--database', default=os.path.join('instance', 'bench.db'))
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--route', action='append', help='only run these routes')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against an earlier results file')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed p95 slowdown as a fraction (default 0.25)')
+    parser.add_argument('--min-delta', type=float, default=5.0,
+                        help='ignore p95 slowdowns smaller than this many ms')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.database):
+        parser.error(f'{args.database} does not exist; run python -m bench.generate first')
+    from models import Subject
+    from stats import get_dashboard_stats
+    app = load_app(args.database)
+    with app.app_context():
+        subject = Subject.query.order_by(Subject.id.desc()).first()
+        scale = get_dashboard_stats()
+    client = app.test_client()
+
+    results = {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'scale': {'students': scale['student_total'],
+                  'attendance': scale['attendance_total']},
+        'routes': {},
+    }
+    print(f"{'route':<48} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'db ms':>7} {'queries':>7}")
+    for template in args.route or ROUTES:
+        url = template.format(subject_id=subject.id, subject=subject.name.replace(' ', '+'))
+        row = measure(client, url, args.requests, args.warmup)
+        results['routes'][template] = row
+        print(f"{template:<48} {row['throughput']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+              f"{row['p99_ms']:>8} {row['db_p50_ms']:>7} {row['queries']:>7}"
+              + (f"  ({row['errors']} errors)" if row['errors'] else ''))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.threshold, args.min_delta)
+        for line in found:
+            print(f'REGRESSION {line}')
+        if found:
+            sys.exit(1)
+        print('No regressions against the baseline.')
+
+
+if __name__ == '__main__':
+    main()
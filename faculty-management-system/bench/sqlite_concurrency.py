@@ -0,0 +1,161 @@
+# Concurrency stress test for the SQLite configuration. Several worker
+# processes (standing in for gunicorn workers), each with a few threads,
+# hammer one database file with a mix of dashboard/record reads and bulk
+# attendance writes. The run is repeated with the default SQLite settings
+# and with the tuned profile, reporting lock errors and latency percentiles.
+#
+#     python -m bench.sqlite_concurrency [--workers 4] [--threads 4] [--seconds 10]
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+STUDENTS = 200
+SUBJECTS = ['Software Engineering', 'Data Structures', 'Database Systems',
+            'Computer Networks']
+READ_URLS = ['/', '/attendance_records', '/get_attendance_chart_data']
+WRITE_RATIO = 0.3
+
+
+def load_app(database, tuned):
+    from app import create_app
+    return create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}',
+                       'SQLITE_TUNING': tuned, 'PROPAGATE_EXCEPTIONS': True})
+
+
+def seed(database, tuned):
+    from app import init_db
+    from models import db, Student
+    app = load_app(database, tuned)
+    init_db(app)
+    with app.app_context():
+        db.session.add_all(
+            Student(name=f'Student {i}', roll_number=f'BENCH{i:04d}', year='SE')
+            for i in range(STUDENTS))
+        db.session.commit()
+
+
+def worker(database, tuned, threads, seconds, seed_value):
+    import threading
+    from sqlalchemy.exc import OperationalError
+    from models import Student
+
+    app = load_app(database, tuned)
+    with app.app_context():
+        student_ids = [s.id for s in Student.query.all()]
+    results = []
+    deadline = time.monotonic() + seconds
+
+    def run(thread_seed):
+        rng = random.Random(thread_seed)
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            write = rng.random() < WRITE_RATIO
+            start = time.perf_counter()
+            error = None
+            try:
+                if write:
+                    day = f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+                    response = client.post('/api/attendance/bulk', json={
+                        'year': 'SE', 'subject': rng.choice(SUBJECTS), 'date': day,
+                        'records': [{'student_id': sid, 'status': rng.choice(['Present', 'Absent'])}
+                                    for sid in rng.sample(student_ids, 50)]})
+                else:
+                    response = client.get(rng.choice(READ_URLS))
+                if response.status_code >= 500:
+                    error = 'error'
+            except OperationalError as e:
+                error = 'locked' if 'locked' in str(e) else 'error'
+            except Exception:
+                error = 'error'
+            results.append(('write' if write else 'read',
+                            time.perf_counter() - start, error))
+
+    pool = [threading.Thread(target=run, args=(seed_value * 100 + i,))
+            for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    json.dump(results, sys.stdout)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+def run_mode(tuned, args):
+    database = os.path.join(tempfile.mkdtemp(), 'stress.db')
+    command = [sys.executable, '-m', 'bench.sqlite_concurrency', '--database', database]
+    if tuned:
+        command.append('--tuned')
+    subprocess.run(command + ['--seed'], check=True)
+
+    workers = [subprocess.Popen(
+        command + ['--worker', str(i), '--threads', str(args.threads),
+                   '--seconds', str(args.seconds)],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for i in range(args.workers)]
+    results = []
+    for process in workers:
+        output, _ = process.communicate()
+        results.extend(json.loads(output))
+
+    report = {'mode': 'tuned' if tuned else 'default', 'requests': len(results),
+              'throughput': round(len(results) / args.seconds, 1)}
+    for kind in ('read', 'write'):
+        rows = [r for r in results if r[0] == kind]
+        latencies = [r[1] for r in rows if r[2] is None]
+        locked = sum(1 for r in rows if r[2] == 'locked')
+        report[kind] = {
+            'count': len(rows),
+            'lock_errors': locked,
+            'lock_error_rate': round(locked / len(rows) * 100, 2) if rows else 0.0,
+            'other_errors': sum(1 for r in rows if r[2] == 'error'),
+            'p50_ms': round(percentile(latencies, 0.50), 1),
+            'p99_ms': round(percentile(latencies, 0.99), 1),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Stress SQLite with concurrent readers and writers.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--json', help='also write the reports to this file')
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    parser.add_argument('--tuned', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--seed', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed:
+        return seed(args.database, args.tuned)
+    if args.worker is not None:
+        return worker(args.database, args.tuned, args.threads, args.seconds, args.worker)
+
+    reports = [run_mode(False, args), run_mode(True, args)]
+    print(f"{'mode':>8} {'req/s':>8} {'kind':>6} {'count':>6} {'locked':>7} "
+          f"{'lock %':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for report in reports:
+        for kind in ('read', 'write'):
+            row = report[kind]
+            print(f"{report['mode']:>8} {report['throughput']:>8} {kind:>6} {row['count']:>6} "
+                  f"{row['lock_errors']:>7} {row['lock_error_rate']:>7} "
+                  f"{row['p50_ms']:>8} {row['p99_ms']:>8}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
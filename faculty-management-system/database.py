@@ -0,0 +1,170 @@
+import contextlib
+import functools
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from shards import current_department
+
+# Database configuration for the app. SQLite connections run in WAL mode so
+# readers never block the writer, and requests that write take the write
+# lock up front (BEGIN IMMEDIATE) so concurrent writers queue on
+# busy_timeout instead of failing with "database is locked" when a read
+# transaction tries to upgrade. Within a process, writing requests also queue
+# on a lock (one per department database, see shards.py) so threads wait
+# their turn instead of polling SQLite's busy handler. The lock is taken when
+# the request's first transaction begins, so an upload is received and parsed
+# before the request queues. Setting DATABASE_URL
+# points the same app at PostgreSQL instead.
+
+DEFAULT_DATABASE_URI = 'sqlite:///faculty.db'
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Durable at every checkpoint; a power cut can lose only the last
+    # transactions, never corrupt the file
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # KiB, i.e. 64 MB per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 10000,  # ms
+    'temp_store': 'MEMORY',
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Any fixed key; every process running `flask init-db` takes the same lock
+INIT_LOCK_KEY = 7261
+
+_write_locks = {}  # department (None for the main database) -> lock
+_write_locks_guard = threading.Lock()
+_background = threading.local()
+
+
+def database_uri(url):
+    url = url or DEFAULT_DATABASE_URI
+    # Hosting providers still hand out the scheme SQLAlchemy dropped
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(uri, pool_size=10, max_overflow=20):
+    if uri.startswith('sqlite'):
+        if uri in ('sqlite://', 'sqlite:///:memory:'):
+            return {}
+        return {'pool_size': pool_size, 'max_overflow': max_overflow,
+                'pool_timeout': 30}
+    return {'pool_size': pool_size, 'max_overflow': max_overflow,
+            'pool_timeout': 30, 'pool_pre_ping': True, 'pool_recycle': 1800}
+
+
+def write_transaction(view):
+    # Marks a GET view that writes (the delete links) so its transaction
+    # starts with the write lock like a POST would.
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.write_transaction = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def write_lock():
+    # Each department's database has its own writer, so each gets its own lock
+    department = current_department()
+    with _write_locks_guard:
+        return _write_locks.setdefault(department, threading.Lock())
+
+
+def _acquire_write_lock():
+    # Held from the request's first write transaction until its teardown
+    if current_app.extensions.get('sqlite_tuning') and 'write_lock' not in g:
+        g.write_lock = write_lock()
+        g.write_lock.acquire()
+
+
+@contextlib.contextmanager
+def background_write():
+    # The same write-lock-first transactions and in-process queueing as a
+    # writing request, for work done outside a request (background jobs)
+    _background.writing = True
+    lock = write_lock() if current_app.extensions.get('sqlite_tuning') else None
+    if lock is not None:
+        lock.acquire()
+    try:
+        yield
+    finally:
+        _background.writing = False
+        if lock is not None:
+            lock.release()
+
+
+def is_write_request():
+    if getattr(_background, 'writing', False):
+        return True
+    return has_request_context() and (
+        request.method not in SAFE_METHODS or g.get('write_transaction', False))
+
+
+def init_database(app, db):
+    if not app.config['SQLITE_TUNING']:
+        return
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    app.extensions['sqlite_tuning'] = True
+
+    @app.teardown_request
+    def _release_write_lock(exc):
+        lock = g.pop('write_lock', None)
+        if lock is not None:
+            lock.release()
+
+    tune_engine(engine, app.config['SQLITE_PRAGMAS'])
+
+
+def tune_engine(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def _configure_connection(dbapi_connection, connection_record):
+        # Let the begin hook below issue BEGIN instead of pysqlite
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def _begin(connection):
+        if not is_write_request():
+            connection.exec_driver_sql('BEGIN')
+            return
+        # background_write() already holds the lock
+        if has_request_context() and not getattr(_background, 'writing', False):
+            _acquire_write_lock()
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+@contextlib.contextmanager
+def init_lock(app, engine):
+    # Serializes schema creation and seeding across processes, e.g. several
+    # gunicorn workers or containers running `flask init-db` at once
+    if engine.dialect.name == 'postgresql':
+        with engine.connect() as connection:
+            connection.exec_driver_sql(f'SELECT pg_advisory_lock({INIT_LOCK_KEY})')
+            try:
+                yield
+            finally:
+                connection.exec_driver_sql(f'SELECT pg_advisory_unlock({INIT_LOCK_KEY})')
+                connection.commit()
+        return
+    os.makedirs(app.instance_path, exist_ok=True)
+    with open(os.path.join(app.instance_path, 'init-db.lock'), 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
@@ -0,0 +1,9 @@
+from jobs import JobQueue
+from models import Job, db
+from response_cache import ResponseCache
+
+# Extension objects the blueprints decorate their views and jobs with.
+# create_app() binds them to each app with init_app().
+
+page_cache = ResponseCache()
+jobs = JobQueue(db, Job)
@@ -0,0 +1,249 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, select, update
+
+from database import background_write
+from shards import current_department, departments, use_department
+
+# Lightweight background jobs backed by the database. Requests enqueue a row
+# and return its id straight away; worker threads (in the web process, or in
+# a separate `flask worker` process) claim jobs with a single UPDATE, so any
+# number of workers can share the table without handing one job out twice.
+# Failed jobs are retried with exponential backoff.
+
+POLL_INTERVAL = 1.0  # seconds between queue checks when idle
+RETRY_DELAY = 5  # seconds before the first retry; doubles on each attempt
+MAX_RETRY_DELAY = 15 * 60
+# A running job not finished after this long is assumed to belong to a
+# worker that died, and is handed out again
+STALE_AFTER = timedelta(minutes=30)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    # The job kinds and their handlers, shared by every app; each app gets its
+    # own JobWorkers from init_app()
+
+    def __init__(self, db, model):
+        self.db = db
+        self.model = model
+        self.handlers = {}
+        self.periodic = {}  # kind -> interval in seconds
+
+    def init_app(self, app):
+        # With JOB_WORKERS set the app's pool starts with its first request,
+        # so processes that never serve requests (the CLI) start no threads.
+        workers = app.extensions['jobs'] = JobWorkers(self, app)
+        if app.config.get('JOB_WORKERS'):
+            @app.before_request
+            def _start_job_workers():
+                workers.start(app.config['JOB_WORKERS'])
+
+    def workers(self):
+        return current_app.extensions['jobs']
+
+    def handler(self, kind, writes=False):
+        # Registers a job function taking the payload dict and returning a
+        # JSON-serialisable result. Jobs that write run as write transactions
+        # so they queue behind the SQLite write lock like writing requests.
+        def register(function):
+            self.handlers[kind] = (function, writes)
+            return function
+        return register
+
+    def every(self, kind, seconds):
+        self.periodic[kind] = seconds
+
+    def enqueue(self, kind, payload=None, delay=0, max_attempts=3, commit=True):
+        # With commit=False the job is only added to the session, so it is
+        # queued by (and only if) the caller's own transaction commits. The
+        # job runs in the department it was queued from.
+        if kind not in self.handlers:
+            raise ValueError(f'Unknown job kind: {kind}')
+        job = self.model(kind=kind, payload=json.dumps(department_payload(payload)),
+                         status=QUEUED, attempts=0, max_attempts=max_attempts,
+                         run_at=datetime.now() + timedelta(seconds=delay),
+                         created_at=datetime.now())
+        self.db.session.add(job)
+        if commit:
+            self.db.session.commit()
+        self.workers().wakeup.set()
+        return job
+
+    def claim(self):
+        # One UPDATE picks and locks the next due job, so the claim needs no
+        # read-then-write upgrade and two workers can never win the same row.
+        # Returns a (id, kind, payload, attempts, max_attempts) row or None.
+        Job = self.model
+        session = self.db.session
+        now = datetime.now()
+        due = or_(
+            (Job.status == QUEUED) & (Job.run_at <= now),
+            (Job.status == RUNNING) & (Job.locked_at < now - STALE_AFTER))
+        # Idle polls only read, so they never take the write lock
+        pending = session.execute(select(Job.id).where(due).limit(1)).first()
+        session.commit()
+        if pending is None:
+            return None
+        token = uuid.uuid4().hex
+        next_id = select(Job.id).where(due).order_by(Job.run_at, Job.id).limit(1).scalar_subquery()
+        # Queues behind writing requests like every other background write
+        with background_write():
+            claimed = session.execute(
+                update(Job).where(Job.id == next_id, due).values(
+                    status=RUNNING, locked_by=token, locked_at=now,
+                    attempts=Job.attempts + 1).execution_options(synchronize_session=False))
+            session.commit()
+        if not claimed.rowcount:
+            return None
+        job = session.execute(
+            select(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts).where(
+                Job.locked_by == token, Job.status == RUNNING)).one_or_none()
+        session.commit()
+        return job
+
+    def finish(self, job, result=None, error=None):
+        now = datetime.now()
+        if error is None:
+            values = {'status': DONE, 'result': json.dumps(result), 'error': None,
+                      'finished_at': now}
+        elif job.attempts < job.max_attempts:
+            delay = min(RETRY_DELAY * 2 ** (job.attempts - 1), MAX_RETRY_DELAY)
+            values = {'status': QUEUED, 'error': error,
+                      'run_at': now + timedelta(seconds=delay)}
+        else:
+            values = {'status': FAILED, 'error': error, 'finished_at': now}
+        with background_write():
+            self.db.session.execute(update(self.model).where(
+                self.model.id == job.id).values(locked_by=None, **values))
+            self.db.session.commit()
+
+    # The current app's workers, for the CLI commands
+
+    def run_one(self):
+        return self.workers().run_one()
+
+    def schedule_periodic(self):
+        self.workers().schedule_periodic()
+
+    def start(self, threads=2):
+        self.workers().start(threads)
+
+    def stop(self):
+        self.workers().stop()
+
+
+class JobWorkers:
+    # One app's worker threads. Each runs its jobs in that app, so several
+    # apps in one process (tests, benchmarks) never run each other's jobs.
+
+    def __init__(self, queue, app):
+        self.queue = queue
+        self.app = app
+        self.next_run = {}  # periodic kind -> monotonic time it is next due
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.threads = []
+        # Concurrent first requests all try to start the pool
+        self.lock = threading.Lock()
+
+    def run_one(self):
+        # Claims and runs one due job; returns False when the queue is empty
+        queue = self.queue
+        with self.app.app_context():
+            job = queue.claim()
+            if job is None:
+                return False
+            function, writes = queue.handlers.get(job.kind, (None, False))
+            try:
+                if function is None:
+                    raise LookupError(f'No handler for job kind {job.kind}')
+                payload = json.loads(job.payload)
+                with use_department(payload.get('department')):
+                    if writes:
+                        with background_write():
+                            result = function(payload)
+                            queue.db.session.commit()
+                    else:
+                        result = function(payload)
+                        queue.db.session.commit()
+            except Exception as e:
+                queue.db.session.rollback()
+                logger.exception('Job %s (%s) failed on attempt %d',
+                                 job.id, job.kind, job.attempts)
+                queue.finish(job, error=f'{type(e).__name__}: {e}')
+            else:
+                queue.finish(job, result=result)
+            return True
+
+    def schedule_periodic(self):
+        # Periodic jobs are queued once per department
+        queue = self.queue
+        Job = queue.model
+        now = time.monotonic()
+        for kind, interval in list(queue.periodic.items()):
+            if now < self.next_run.get(kind, 0.0):
+                continue
+            self.next_run[kind] = now + interval
+            with self.app.app_context(), background_write():
+                for department in departments() or [None]:
+                    payload = {'department': department} if department else {}
+                    pending = Job.query.filter(
+                        Job.kind == kind, Job.payload == json.dumps(payload),
+                        Job.status.in_((QUEUED, RUNNING))).first()
+                    if pending is None:
+                        queue.enqueue(kind, payload, commit=False)
+                queue.db.session.commit()
+
+    def work(self, schedule=False):
+        while not self.stopping.is_set():
+            try:
+                if schedule:
+                    self.schedule_periodic()
+                if self.run_one():
+                    continue
+            except Exception:
+                logger.exception('Job worker error')
+            self.wakeup.wait(POLL_INTERVAL)
+            self.wakeup.clear()
+
+    def start(self, threads=2):
+        # Runs the pool in background threads of this process; only the first
+        # thread enqueues periodic jobs
+        with self.lock:
+            if self.threads:
+                return
+            self.stopping.clear()
+            self.threads = [threading.Thread(target=self.work, args=(i == 0,),
+                                             name=f'job-worker-{i}', daemon=True)
+                            for i in range(threads)]
+            for thread in self.threads:
+                thread.start()
+
+    def stop(self):
+        with self.lock:
+            self.stopping.set()
+            self.wakeup.set()
+            for thread in self.threads:
+                thread.join()
+            self.threads = []
+
+
+def department_payload(payload):
+    payload = dict(payload or {})
+    department = current_department()
+    if department is not None:
+        payload.setdefault('department', department)
+    return payload
@@ -0,0 +1,176 @@
+import cProfile
+import hmac
+import io
+import pstats
+import threading
+import time
+from collections import Counter
+
+from flask import Response, abort, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+# Per-request instrumentation: latency histograms per endpoint, SQL query
+# counts and database time per request (with N+1 detection), exposed in
+# Prometheus text format at /metrics. Figures are per process; scrape each
+# worker or run a single worker when comparing numbers.
+#
+# Admins can append ?profile=1 to any URL to get a cProfile breakdown of
+# that request instead of its normal response, when PROFILER_ENABLED is set.
+# Profiling and /metrics need ADMIN_TOKEN in an X-Admin-Token header. Without
+# an ADMIN_TOKEN only requests from the local machine get them; behind a
+# proxy every request looks local, so set a token there.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# The same statement run this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = 10
+PROFILE_LINES = 40
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+_lock = threading.Lock()
+_requests = Counter()  # (endpoint, method, status) -> requests
+_latency = {}  # endpoint -> [bucket counts..., +Inf count, sum]
+_queries = Counter()  # endpoint -> statements executed
+_query_time = Counter()  # endpoint -> seconds spent in the database
+_n_plus_one = Counter()  # endpoint -> requests flagged as N+1
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def _admin_request():
+    token = current_app.config['ADMIN_TOKEN']
+    if token:
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(),
+                                   token.encode())
+    return request.remote_addr in LOCAL_ADDRESSES
+
+
+def _profiling_allowed():
+    return (current_app.config['PROFILER_ENABLED'] and request.args.get('profile') == '1'
+            and _admin_request())
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0.0
+    g.sql_statements = Counter()
+    if _profiling_allowed():
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def _after_request(response):
+    if 'metrics_start' not in g:
+        return response
+    elapsed = time.perf_counter() - g.metrics_start
+    endpoint = _endpoint()
+
+    repeated = [(statement, count) for statement, count in g.sql_statements.items()
+                if count >= N_PLUS_ONE_THRESHOLD]
+    for statement, count in repeated:
+        current_app.logger.warning('Possible N+1 in %s: %d runs of %s',
+                                   endpoint, count, ' '.join(statement.split())[:200])
+
+    with _lock:
+        _requests[(endpoint, request.method, response.status_code)] += 1
+        histogram = _latency.setdefault(endpoint, [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += elapsed
+        _queries[endpoint] += g.sql_count
+        _query_time[endpoint] += g.sql_time
+        if repeated:
+            _n_plus_one[endpoint] += 1
+
+    response.headers['Server-Timing'] = (
+        f'app;dur={elapsed * 1000:.1f}, db;dur={g.sql_time * 1000:.1f};desc="{g.sql_count} queries"')
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(PROFILE_LINES)
+        summary = (f'{request.method} {request.full_path}\n'
+                   f'{elapsed * 1000:.1f} ms, {g.sql_count} queries, '
+                   f'{g.sql_time * 1000:.1f} ms in the database\n\n')
+        return Response(summary + output.getvalue(), mimetype='text/plain')
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # One statement runs at a time per connection; a failed one leaves its
+    # start behind, to be overwritten by the next
+    conn.info['query_start'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('query_start')
+    if has_request_context() and 'sql_statements' in g:
+        g.sql_count += 1
+        g.sql_time += elapsed
+        g.sql_statements[statement] += 1
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def render_metrics():
+    lines = []
+    with _lock:
+        lines += ['# HELP faculty_requests_total Requests handled, by endpoint, method and status.',
+                  '# TYPE faculty_requests_total counter']
+        for (endpoint, method, status), count in sorted(_requests.items()):
+            lines.append(f'faculty_requests_total{{endpoint="{_label(endpoint)}",'
+                         f'method="{method}",status="{status}"}} {count}')
+
+        lines += ['# HELP faculty_request_duration_seconds Request latency by endpoint.',
+                  '# TYPE faculty_request_duration_seconds histogram']
+        for endpoint, histogram in sorted(_latency.items()):
+            name = _label(endpoint)
+            for bound, count in zip(LATENCY_BUCKETS, histogram):
+                lines.append(f'faculty_request_duration_seconds_bucket{{endpoint="{name}",le="{bound}"}} {count}')
+            lines.append(f'faculty_request_duration_seconds_bucket{{endpoint="{name}",le="+Inf"}} {histogram[-2]}')
+            lines.append(f'faculty_request_duration_seconds_sum{{endpoint="{name}"}} {histogram[-1]:.6f}')
+            lines.append(f'faculty_request_duration_seconds_count{{endpoint="{name}"}} {histogram[-2]}')
+
+        lines += ['# HELP faculty_db_queries_total SQL statements executed, by endpoint.',
+                  '# TYPE faculty_db_queries_total counter']
+        for endpoint, count in sorted(_queries.items()):
+            lines.append(f'faculty_db_queries_total{{endpoint="{_label(endpoint)}"}} {count}')
+
+        lines += ['# HELP faculty_db_query_seconds_total Time spent executing SQL, by endpoint.',
+                  '# TYPE faculty_db_query_seconds_total counter']
+        for endpoint, seconds in sorted(_query_time.items()):
+            lines.append(f'faculty_db_query_seconds_total{{endpoint="{_label(endpoint)}"}} {seconds:.6f}')
+
+        lines += ['# HELP faculty_n_plus_one_requests_total Requests that repeated one statement '
+                  f'{N_PLUS_ONE_THRESHOLD}+ times.',
+                  '# TYPE faculty_n_plus_one_requests_total counter']
+        for endpoint, count in sorted(_n_plus_one.items()):
+            lines.append(f'faculty_n_plus_one_requests_total{{endpoint="{_label(endpoint)}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def instrument_engine(engine):
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def init_metrics(app, db):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    with app.app_context():
+        instrument_engine(db.engine)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+
+def metrics_view():
+    if not _admin_request():
+        abort(403)
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,38 @@
+import sqlite3
+
+from . import (attendance_schema, attendance_unique, attendance_date_index,
+               upload_blobs, marks_table, student_roll_unique, event_datetime,
+               event_reminders, syllabus_index)
+
+# Applied in order; each migration checks whether the database still needs it,
+# so re-running the upgrade is always safe.
+MIGRATIONS = [attendance_schema, attendance_unique, attendance_date_index,
+              upload_blobs, marks_table, student_roll_unique, event_datetime,
+              event_reminders, syllabus_index]
+
+
+def needed(path):
+    # The migrations an existing database still needs; a new, empty one
+    # gets the current schema from create_all and needs none
+    conn = sqlite3.connect(path)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                            "AND name = 'attendance'").fetchone():
+            return []
+        return [migration for migration in MIGRATIONS if migration.needed(conn)]
+    finally:
+        conn.close()
+
+
+def upgrade(path, batch_size=1000):
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        for migration in MIGRATIONS:
+            name = migration.__name__.rsplit('.', 1)[-1]
+            if migration.needed(conn):
+                print(f'Applying {name}...')
+                migration.upgrade(conn, batch_size)
+            else:
+                print(f'{name}: already applied')
+    finally:
+        conn.close()
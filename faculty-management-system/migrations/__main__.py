@@ -0,0 +1,10 @@
+import argparse
+
+from . import upgrade
+
+parser = argparse.ArgumentParser(
+    description='Upgrade a faculty.db file to the current schema.')
+parser.add_argument('database', nargs='?', default='instance/faculty.db')
+parser.add_argument('--batch-size', type=int, default=1000)
+args = parser.parse_args()
+upgrade(args.database, args.batch_size)
@@ -0,0 +1,11 @@
+# Adds the plain date index used by the keyset-paginated attendance records
+# view when no subject or student filter narrows the scan.
+
+
+def needed(conn):
+    indexes = {row[1] for row in conn.execute('PRAGMA index_list(attendance)')}
+    return 'ix_attendance_date' not in indexes
+
+
+def upgrade(conn, batch_size):
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_attendance_date ON attendance (date)')
@@ -0,0 +1,150 @@
+from datetime import date
+
+# Moves attendance from free-text rows (date, year, subject, student_name,
+# status) to integer foreign keys, a DATE column and a 0/1 status code.
+# Rows are copied in keyset-ordered batches so the old table is never loaded
+# into memory at once. Rows whose date cannot be read are kept, unchanged,
+# in attendance_rejected for someone to fix by hand.
+
+CREATE_STUDENT = """
+CREATE TABLE IF NOT EXISTS student (
+    id INTEGER NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    roll_number VARCHAR(20) NOT NULL,
+    year VARCHAR(10) NOT NULL,
+    email VARCHAR(100),
+    phone VARCHAR(15),
+    marks TEXT,
+    PRIMARY KEY (id)
+)"""
+
+CREATE_SUBJECT = """
+CREATE TABLE IF NOT EXISTS subject (
+    id INTEGER NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    year VARCHAR(10) NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (year, name)
+)"""
+
+CREATE_ATTENDANCE = """
+CREATE TABLE attendance_new (
+    id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    student_id INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    status SMALLINT NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(student_id) REFERENCES student (id),
+    FOREIGN KEY(subject_id) REFERENCES subject (id)
+)"""
+
+CREATE_REJECTED = """
+CREATE TABLE IF NOT EXISTS attendance_rejected (
+    id INTEGER NOT NULL,
+    date TEXT,
+    year TEXT,
+    subject TEXT,
+    student_name TEXT,
+    status TEXT,
+    PRIMARY KEY (id)
+)"""
+
+CREATE_INDEXES = [
+    'CREATE INDEX ix_attendance_subject_date ON attendance (subject_id, date)',
+    'CREATE INDEX ix_attendance_student_date ON attendance (student_id, date)',
+]
+
+
+def needed(conn):
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(attendance)')}
+    return 'student_name' in columns
+
+
+def _lookup(conn, cache, key, insert):
+    if key not in cache:
+        cache[key] = insert(conn, *key)
+    return cache[key]
+
+
+def _insert_subject(conn, year, name):
+    return conn.execute('INSERT INTO subject (year, name) VALUES (?, ?)',
+                        (year, name)).lastrowid
+
+
+def _insert_student(conn, year, name):
+    # Attendance for a name that is not on the roster keeps a placeholder
+    # student rather than being dropped.
+    student_id = conn.execute(
+        "INSERT INTO student (name, roll_number, year, marks) VALUES (?, '', ?, '{}')",
+        (name, year)).lastrowid
+    conn.execute('UPDATE student SET roll_number = ? WHERE id = ?',
+                 (f'LEGACY{student_id}', student_id))
+    return student_id
+
+
+def upgrade(conn, batch_size):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute(CREATE_STUDENT)
+        conn.execute(CREATE_SUBJECT)
+        conn.execute(CREATE_ATTENDANCE)
+        conn.execute(CREATE_REJECTED)
+
+        subjects = {(year, name): subject_id for subject_id, year, name in
+                    conn.execute('SELECT id, year, name FROM subject')}
+        students = {}
+        for student_id, year, name in conn.execute(
+                'SELECT id, year, name FROM student ORDER BY id DESC'):
+            students[(year, name)] = student_id
+
+        last_id = 0
+        migrated = skipped = 0
+        while True:
+            rows = conn.execute(
+                'SELECT id, date, year, subject, student_name, status '
+                'FROM attendance WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            batch = []
+            rejected = []
+            for row in rows:
+                row_id, day, year, subject, name, status = row
+                try:
+                    day = date.fromisoformat(day.strip()).isoformat()
+                except (AttributeError, ValueError):
+                    rejected.append(row)
+                    continue
+                batch.append((
+                    row_id, day,
+                    _lookup(conn, students, (year, name), _insert_student),
+                    _lookup(conn, subjects, (year, subject), _insert_subject),
+                    1 if status == 'Present' else 0,
+                ))
+            conn.executemany(
+                'INSERT INTO attendance_new (id, date, student_id, subject_id, status) '
+                'VALUES (?, ?, ?, ?, ?)', batch)
+            conn.executemany(
+                'INSERT OR REPLACE INTO attendance_rejected '
+                '(id, date, year, subject, student_name, status) '
+                'VALUES (?, ?, ?, ?, ?, ?)', rejected)
+            migrated += len(batch)
+            skipped += len(rejected)
+            last_id = rows[-1][0]
+
+        conn.execute('DROP TABLE attendance')
+        conn.execute('ALTER TABLE attendance_new RENAME TO attendance')
+        for statement in CREATE_INDEXES:
+            conn.execute(statement)
+        # The dashboard rebuilds its counters when this table is empty
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                        "AND name = 'dashboard_stats'").fetchone():
+            conn.execute('DELETE FROM dashboard_stats')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    print(f'  migrated {migrated} attendance rows')
+    if skipped:
+        print(f'  kept {skipped} rows with unreadable dates in attendance_rejected')
@@ -0,0 +1,31 @@
+# Makes (subject_id, date, student_id) unique so attendance submissions can
+# upsert. Earlier duplicate submissions are collapsed to their latest row.
+# The unique index replaces the plain (subject_id, date) index, which it
+# covers as a prefix.
+
+
+def needed(conn):
+    indexes = {row[1] for row in conn.execute('PRAGMA index_list(attendance)')}
+    return 'ux_attendance_subject_date_student' not in indexes
+
+
+def upgrade(conn, batch_size):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        removed = conn.execute(
+            'DELETE FROM attendance WHERE id NOT IN ('
+            'SELECT MAX(id) FROM attendance '
+            'GROUP BY subject_id, date, student_id)').rowcount
+        conn.execute('DROP INDEX IF EXISTS ix_attendance_subject_date')
+        conn.execute(
+            'CREATE UNIQUE INDEX ux_attendance_subject_date_student '
+            'ON attendance (subject_id, date, student_id)')
+        if removed and conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                "AND name = 'dashboard_stats'").fetchone():
+            conn.execute('DELETE FROM dashboard_stats')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    print(f'  removed {removed} duplicate attendance rows')
@@ -0,0 +1,99 @@
+from datetime import date, datetime
+
+# Converts event date/time from free-text VARCHAR columns to DATE and TIME
+# (stored the way SQLAlchemy writes them) and adds the (date, time) index the
+# calendar range queries use. Rows whose date or time cannot be read are
+# kept, unchanged, in event_rejected. Databases from before the notified
+# column get it, unset.
+
+CREATE_EVENT = """
+CREATE TABLE event_new (
+    id INTEGER NOT NULL,
+    title VARCHAR(200) NOT NULL,
+    date DATE NOT NULL,
+    time TIME NOT NULL,
+    type VARCHAR(20) NOT NULL,
+    description VARCHAR(300),
+    notified BOOLEAN,
+    PRIMARY KEY (id)
+)"""
+
+CREATE_REJECTED = """
+CREATE TABLE IF NOT EXISTS event_rejected (
+    id INTEGER NOT NULL,
+    title TEXT,
+    date TEXT,
+    time TEXT,
+    type TEXT,
+    description TEXT,
+    notified BOOLEAN,
+    PRIMARY KEY (id)
+)"""
+
+CREATE_INDEX = 'CREATE INDEX ix_event_date_time ON event (date, time)'
+
+TIME_FORMATS = ('%H:%M', '%H:%M:%S', '%H:%M:%S.%f', '%I:%M %p')
+
+
+def needed(conn):
+    columns = {row[1]: row[2] for row in conn.execute('PRAGMA table_info(event)')}
+    return bool(columns) and columns['date'].upper() != 'DATE'
+
+
+def _parse_time(value):
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).time()
+        except ValueError:
+            pass
+    raise ValueError(value)
+
+
+def upgrade(conn, batch_size):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute(CREATE_EVENT)
+        conn.execute(CREATE_REJECTED)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(event)')}
+        notified_column = 'notified' if 'notified' in columns else 'NULL'
+        last_id = 0
+        migrated = skipped = 0
+        while True:
+            rows = conn.execute(
+                f'SELECT id, title, date, time, type, description, {notified_column} '
+                'FROM event WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            batch = []
+            rejected = []
+            for row in rows:
+                row_id, title, day, clock, kind, description, notified = row
+                try:
+                    day = date.fromisoformat(day.strip()).isoformat()
+                    clock = _parse_time(clock).strftime('%H:%M:%S.%f')
+                except (AttributeError, ValueError):
+                    rejected.append(row)
+                    continue
+                batch.append((row_id, title, day, clock, kind, description, notified))
+            conn.executemany(
+                'INSERT INTO event_new (id, title, date, time, type, description, notified) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', batch)
+            conn.executemany(
+                'INSERT OR REPLACE INTO event_rejected '
+                '(id, title, date, time, type, description, notified) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', rejected)
+            migrated += len(batch)
+            skipped += len(rejected)
+            last_id = rows[-1][0]
+
+        conn.execute('DROP TABLE event')
+        conn.execute('ALTER TABLE event_new RENAME TO event')
+        conn.execute(CREATE_INDEX)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    print(f'  migrated {migrated} events')
+    if skipped:
+        print(f'  kept {skipped} events with unreadable dates or times in event_rejected')
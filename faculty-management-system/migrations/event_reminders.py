@@ -0,0 +1,11 @@
+# Adds event_recurrence.reminded_through, the last occurrence of a series
+# whose reminder has been sent.
+
+
+def needed(conn):
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(event_recurrence)')}
+    return bool(columns) and 'reminded_through' not in columns
+
+
+def upgrade(conn, batch_size):
+    conn.execute('ALTER TABLE event_recurrence ADD COLUMN reminded_through DATE')
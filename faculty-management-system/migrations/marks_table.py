@@ -0,0 +1,89 @@
+import json
+
+# Explodes the JSON-in-TEXT student.marks blobs ({subject: score}) into one
+# mark row per student, subject and assessment. Students are read in keyset
+# batches; each converted blob is cleared so the migration can resume.
+
+DEFAULT_ASSESSMENT = 'Final'
+
+CREATE_MARK = """
+CREATE TABLE IF NOT EXISTS mark (
+    id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    assessment VARCHAR(50) NOT NULL,
+    score NUMERIC(6, 2) NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (student_id, subject_id, assessment),
+    FOREIGN KEY(student_id) REFERENCES student (id),
+    FOREIGN KEY(subject_id) REFERENCES subject (id)
+)"""
+
+CREATE_INDEX = ('CREATE INDEX IF NOT EXISTS ix_mark_subject_assessment_score '
+                'ON mark (subject_id, assessment, score)')
+
+
+def needed(conn):
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                        "AND name = 'mark'").fetchone():
+        return True
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(student)')}
+    return 'marks' in columns and conn.execute(
+        "SELECT 1 FROM student WHERE marks IS NOT NULL AND marks NOT IN ('', '{}') "
+        "LIMIT 1").fetchone() is not None
+
+
+def upgrade(conn, batch_size):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute(CREATE_MARK)
+        conn.execute(CREATE_INDEX)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(student)')}
+        if 'marks' not in columns:
+            conn.execute('COMMIT')
+            return
+
+        subjects = {(year, name): subject_id for subject_id, year, name in
+                    conn.execute('SELECT id, year, name FROM subject')}
+        last_id = 0
+        migrated = skipped = 0
+        while True:
+            students = conn.execute(
+                "SELECT id, year, marks FROM student WHERE id > ? AND marks IS NOT NULL "
+                "AND marks NOT IN ('', '{}') ORDER BY id LIMIT ?",
+                (last_id, batch_size)).fetchall()
+            if not students:
+                break
+            rows = []
+            for student_id, year, blob in students:
+                try:
+                    marks = json.loads(blob)
+                except ValueError:
+                    marks = None
+                if not isinstance(marks, dict):
+                    marks = {}
+                    skipped += 1
+                for subject, score in marks.items():
+                    try:
+                        score = float(score)
+                    except (TypeError, ValueError):
+                        skipped += 1
+                        continue
+                    if (year, subject) not in subjects:
+                        subjects[(year, subject)] = conn.execute(
+                            'INSERT INTO subject (year, name) VALUES (?, ?)',
+                            (year, subject)).lastrowid
+                    rows.append((student_id, subjects[(year, subject)],
+                                 DEFAULT_ASSESSMENT, score))
+            conn.executemany(
+                'INSERT OR REPLACE INTO mark (student_id, subject_id, assessment, score) '
+                'VALUES (?, ?, ?, ?)', rows)
+            conn.executemany('UPDATE student SET marks = NULL WHERE id = ?',
+                             [(student[0],) for student in students])
+            migrated += len(rows)
+            last_id = students[-1][0]
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    print(f'  migrated {migrated} marks, skipped {skipped} unreadable values')
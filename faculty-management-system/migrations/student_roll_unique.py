@@ -0,0 +1,29 @@
+# Backs roll number uniqueness with a unique index. Any duplicates already
+# in the table keep their first row's roll number; later ones get a
+# "-DUP<id>" suffix so they can be found and fixed by hand.
+
+
+def needed(conn):
+    indexes = {row[1] for row in conn.execute('PRAGMA index_list(student)')}
+    return 'ix_student_roll_number' not in indexes
+
+
+def upgrade(conn, batch_size):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        duplicates = conn.execute(
+            'SELECT id, roll_number FROM student WHERE id NOT IN ('
+            'SELECT MIN(id) FROM student GROUP BY roll_number)').fetchall()
+        conn.executemany(
+            'UPDATE student SET roll_number = ? WHERE id = ?',
+            [(f'{roll}-DUP{student_id}', student_id)
+             for student_id, roll in duplicates])
+        conn.execute('CREATE UNIQUE INDEX ix_student_roll_number '
+                     'ON student (roll_number)')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    for student_id, roll in duplicates:
+        print(f'  student {student_id}: duplicate roll number {roll!r} '
+              f'renamed to {roll}-DUP{student_id}')
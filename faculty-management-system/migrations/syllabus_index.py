@@ -0,0 +1,11 @@
+# Adds the (year, subject) index behind the syllabus topic list and the
+# grouped per-subject progress query.
+
+
+def needed(conn):
+    indexes = {row[1] for row in conn.execute('PRAGMA index_list(syllabus)')}
+    return 'ix_syllabus_year_subject' not in indexes
+
+
+def upgrade(conn, batch_size):
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_syllabus_year_subject ON syllabus (year, subject)')
@@ -0,0 +1,29 @@
+# Adds the content-hash reference from assignments and notes to the blob
+# store. Existing uploads keep a NULL hash and are still served from
+# UPLOAD_FOLDER under their original filename.
+
+TABLES = ['assignment', 'note']
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def needed(conn):
+    return any('sha256' not in _columns(conn, table) for table in TABLES)
+
+
+def upgrade(conn, batch_size):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for table in TABLES:
+            columns = _columns(conn, table)
+            if 'description' not in columns:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN description TEXT')
+            if 'sha256' not in columns:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN sha256 VARCHAR(64) '
+                             'REFERENCES blob (sha256)')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
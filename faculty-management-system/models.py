@@ -1,19 +1,83 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
 
-db = SQLAlchemy()
+from shards import ShardSession
 
+# The app's models. `db` is bound to each app by create_app() (app.py); its
+# sessions route queries to the request's department (see shards.py).
 
-class Attendance(db.Model):
+db = SQLAlchemy(session_options={'class_': ShardSession})
+
+# Attendance status codes
+ABSENT = 0
+PRESENT = 1
+STATUS_LABELS = {ABSENT: 'Absent', PRESENT: 'Present'}
+STATUS_CODES = {label: code for code, label in STATUS_LABELS.items()}
+
+
+class Subject(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.String(20), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
     year = db.Column(db.String(10), nullable=False)
-    subject = db.Column(db.String(100), nullable=False)
-    student_name = db.Column(db.String(100), nullable=False)
-    status = db.Column(db.String(10), nullable=False)  # Present/Absent
 
-    def __repr__(self):
-        return f'<Attendance {self.student_name} - {self.status}>'
+    __table_args__ = (db.UniqueConstraint('year', 'name'),)
+
+
+class Attendance(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey(
+        'student.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey(
+        'subject.id'), nullable=False)
+    status = db.Column(db.SmallInteger, nullable=False)
+
+    student = db.relationship('Student')
+    subject = db.relationship('Subject')
+
+    __table_args__ = (
+        # Also serves (subject_id, date) lookups and is the upsert target
+        db.Index('ux_attendance_subject_date_student',
+                 'subject_id', 'date', 'student_id', unique=True),
+        db.Index('ix_attendance_student_date', 'student_id', 'date'),
+        # SQLite appends the rowid, so this also orders by (date, id)
+        db.Index('ix_attendance_date', 'date'),
+    )
+
+    @property
+    def status_label(self):
+        return STATUS_LABELS[self.status]
+
+
+class Term(db.Model):
+    # A teaching period whose attendance has been moved out of the attendance
+    # table into the bit-packed archive (see archive.py)
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+    start = db.Column(db.Date, nullable=False)
+    end = db.Column(db.Date, nullable=False)
+    # Set once every subject has been archived
+    closed_at = db.Column(db.DateTime)
+
+
+class TermLectures(db.Model):
+    # A subject's lecture dates in a term; lecture i is bit i of the bitsets
+    term_id = db.Column(db.Integer, db.ForeignKey('term.id'), primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), primary_key=True)
+    lectures = db.Column(db.Integer, nullable=False)
+    dates = db.Column(db.LargeBinary, nullable=False)
+
+
+class TermAttendance(db.Model):
+    term_id = db.Column(db.Integer, db.ForeignKey('term.id'), primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), primary_key=True)
+    present = db.Column(db.LargeBinary, nullable=False)
+    # Empty when attendance was taken for the student at every lecture
+    recorded = db.Column(db.LargeBinary, nullable=False, default=b'')
+
+    __table_args__ = (
+        db.Index('ix_term_attendance_student', 'student_id'),
+    )
 
 
 class Assignment(db.Model):
@@ -23,9 +87,10 @@ class Assignment(db.Model):
     subject = db.Column(db.String(100), nullable=False)
     filename = db.Column(db.String(200), nullable=False)
     upload_date = db.Column(db.String(20), nullable=False)
-
-    def __repr__(self):
-        return f'<Assignment {self.title}>'
+    description = db.Column(db.Text)
+    # Content hash of the stored blob; NULL for files uploaded before the
+    # blob store, which still live in UPLOAD_FOLDER under their filename.
+    sha256 = db.Column(db.String(64), db.ForeignKey('blob.sha256'))
 
 
 class Note(db.Model):
@@ -35,9 +100,16 @@ class Note(db.Model):
     subject = db.Column(db.String(100), nullable=False)
     filename = db.Column(db.String(200), nullable=False)
     upload_date = db.Column(db.String(20), nullable=False)
+    description = db.Column(db.Text)
+    # Content hash of the stored blob; NULL for files uploaded before the
+    # blob store, which still live in UPLOAD_FOLDER under their filename.
+    sha256 = db.Column(db.String(64), db.ForeignKey('blob.sha256'))
+
 
-    def __repr__(self):
-        return f'<Note {self.title}>'
+class Blob(db.Model):
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
 
 
 class Syllabus(db.Model):
@@ -46,18 +118,109 @@ class Syllabus(db.Model):
     subject = db.Column(db.String(100), nullable=False)
     topic = db.Column(db.String(300), nullable=False)
     completed = db.Column(db.Boolean, default=False)
+    completion_date = db.Column(db.String(20))
 
-    def __repr__(self):
-        return f'<Syllabus {self.topic}>'
+    __table_args__ = (
+        # Topic lists and the grouped progress rollup read subjects in order
+        db.Index('ix_syllabus_year_subject', 'year', 'subject'),
+    )
 
 
 class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    date = db.Column(db.String(20), nullable=False)
-    time = db.Column(db.String(10), nullable=False)
-    type = db.Column(db.String(20), nullable=False)  # lecture/meeting
+    # For a recurring event, the first occurrence
+    date = db.Column(db.Date, nullable=False)
+    time = db.Column(db.Time, nullable=False)
+    type = db.Column(db.String(20), nullable=False)
     description = db.Column(db.String(300))
+    notified = db.Column(db.Boolean, default=False)
+    recurrence = db.relationship('EventRecurrence', uselist=False,
+                                 cascade='all, delete-orphan')
 
-    def __repr__(self):
-        return f'<Event {self.title}>'
+    __table_args__ = (
+        # Calendar windows and "upcoming" lists are range scans on this
+        db.Index('ix_event_date_time', 'date', 'time'),
+    )
+
+
+RECURRENCE_FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+WEEKDAY_CODES = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+
+class EventRecurrence(db.Model):
+    # RRULE-style repeat rule (FREQ, INTERVAL, BYDAY, UNTIL) for an event.
+    # Occurrences are never stored; they are expanded for the requested
+    # window only. A COUNT is turned into UNTIL when the rule is saved.
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'),
+                         nullable=False, unique=True)
+    freq = db.Column(db.String(10), nullable=False)
+    interval = db.Column(db.Integer, nullable=False, default=1)
+    byday = db.Column(db.String(30))  # e.g. 'MO,WE,FR' for WEEKLY
+    until = db.Column(db.Date, index=True)
+    # Occurrences up to this date have had their reminder sent
+    reminded_through = db.Column(db.Date)
+
+    @property
+    def weekdays(self):
+        if not self.byday:
+            return []
+        return sorted(WEEKDAY_CODES.index(code) for code in self.byday.split(','))
+
+
+class Student(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    roll_number = db.Column(db.String(20), nullable=False,
+                            unique=True, index=True)
+    year = db.Column(db.String(10), nullable=False)
+    email = db.Column(db.String(100))
+    phone = db.Column(db.String(15))
+
+
+class Mark(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey(
+        'student.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey(
+        'subject.id'), nullable=False)
+    assessment = db.Column(db.String(50), nullable=False)
+    score = db.Column(db.Numeric(6, 2, asdecimal=False), nullable=False)
+
+    subject = db.relationship('Subject')
+
+    __table_args__ = (
+        # Also serves the per-student mark sheet
+        db.UniqueConstraint('student_id', 'subject_id', 'assessment'),
+        db.Index('ix_mark_subject_assessment_score',
+                 'subject_id', 'assessment', 'score'),
+    )
+
+
+class DashboardStats(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Job(db.Model):
+    # Background work queued by requests and run by the job workers. Always
+    # in the main database; a department's jobs carry it in their payload.
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(10), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_by = db.Column(db.String(32))
+    locked_at = db.Column(db.DateTime)
+    result = db.Column(db.Text)  # JSON
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Workers look for the next due job in this order
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
@@ -0,0 +1,288 @@
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from flask import Response, current_app, has_app_context, request, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from shards import current_department
+
+# Rendered-response cache for read-heavy pages. A cached view declares the
+# tables it reads; its responses are stored per path and query string together
+# with a token for each of those tables. Committing a write to a table (through
+# the ORM or a Core statement on the session) gives the table a new token, so
+# exactly the pages that read it miss on their next hit. Hits are served
+# without touching the database, and with an ETag so browsers revalidate to
+# a 304.
+#
+# The disk backend (the default) keeps entries and table tokens in a shared
+# directory, so every worker sees every invalidation. The memory backend is a
+# per-process LRU; writes made by other processes are only seen once entries
+# expire, so it suits a single process only. The view's headers are stored
+# with the body and replayed on a hit; responses that set cookies are never
+# stored.
+# Keys and table tokens are per department (see shards.py).
+
+DEFAULT_TTL = 3600
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# Headers the cache sets itself on every response it serves
+OWN_HEADERS = ('content-length', 'etag', 'x-cache')
+
+
+class MemoryBackend:
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()  # key -> (header, body), oldest first
+        self.tokens = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, header, body):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self.entries[key] = (header, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def token(self, tag):
+        with self.lock:
+            return self.tokens.setdefault(tag, uuid.uuid4().hex)
+
+    def bump(self, tag):
+        with self.lock:
+            self.tokens[tag] = uuid.uuid4().hex
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tokens.clear()
+            self.size = 0
+
+
+class DiskBackend:
+    # One file per entry (a JSON header line, then the body) and one per
+    # table token. Files are replaced atomically, reads refresh the mtime,
+    # and the least recently used entries are removed once the directory
+    # grows past max_bytes.
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.written = 0
+        for name in ('entries', 'tags'):
+            os.makedirs(os.path.join(directory, name), exist_ok=True)
+
+    def _path(self, kind, name):
+        return os.path.join(self.directory, kind, hashlib.sha256(name.encode()).hexdigest())
+
+    def _write(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def get(self, key):
+        path = self._path('entries', key)
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                body = f.read()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return header, body
+
+    def set(self, key, header, body):
+        if len(body) > self.max_bytes:
+            return
+        self._write(self._path('entries', key),
+                    json.dumps(header).encode() + b'\n' + body)
+        self.written += len(body)
+        if self.written > self.max_bytes // 10:
+            self.written = 0
+            self.prune()
+
+    def prune(self):
+        directory = os.path.join(self.directory, 'entries')
+        files = []
+        for entry in os.scandir(directory):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, path in sorted(files):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= file_size
+
+    def token(self, tag):
+        path = self._path('tags', tag)
+        try:
+            with open(path) as f:
+                return f.read()
+        except OSError:
+            return self.bump(tag)
+
+    def bump(self, tag):
+        token = uuid.uuid4().hex
+        self._write(self._path('tags', tag), token.encode())
+        return token
+
+    def clear(self):
+        for name in ('entries', 'tags'):
+            for entry in os.scandir(os.path.join(self.directory, name)):
+                os.remove(entry.path)
+
+
+class ResponseCache:
+
+    def __init__(self, default_ttl=DEFAULT_TTL):
+        self.default_ttl = default_ttl
+        self.tags = set()  # tables some cached view reads
+        event.listen(Session, 'after_flush', self._flushed)
+        event.listen(Session, 'do_orm_execute', self._executed)
+        event.listen(Session, 'after_commit', self._committed)
+        event.listen(Session, 'after_rollback', self._rolled_back)
+
+    def init_app(self, app):
+        # Each app gets its own backend from its RESPONSE_CACHE settings
+        app.extensions['response_cache'] = make_backend(
+            app.config['RESPONSE_CACHE'], app.config['RESPONSE_CACHE_DIR'],
+            app.config['RESPONSE_CACHE_MAX_BYTES'])
+
+    @property
+    def backend(self):
+        # None turns caching off; the decorated views run as usual
+        return current_app.extensions.get('response_cache')
+
+    def _mark(self, session, tables):
+        stale = {table for table in tables if table in self.tags}
+        if stale:
+            session.info.setdefault('stale_pages', set()).update(stale)
+
+    def _flushed(self, session, flush_context):
+        # The new/dirty/deleted collections still hold the flushed objects here
+        self._mark(session, {obj.__table__.name
+                             for objects in (session.new, session.dirty, session.deleted)
+                             for obj in objects})
+
+    def _executed(self, state):
+        # Core and bulk statements run through the session skip the flush
+        if state.is_insert or state.is_update or state.is_delete:
+            table = getattr(state.statement, 'table', None)
+            if table is not None:
+                self._mark(state.session, {table.name})
+
+    def _committed(self, session):
+        for tag in session.info.pop('stale_pages', ()):
+            self.invalidate(scoped(tag))
+
+    def _rolled_back(self, session):
+        session.info.pop('stale_pages', None)
+
+    def invalidate(self, tag):
+        backend = self.backend if has_app_context() else None
+        if backend is not None:
+            backend.bump(tag)
+
+    def key(self):
+        args = sorted(request.args.items(multi=True))
+        return scoped(request.path + ('?' + urlencode(args) if args else ''))
+
+    def cacheable(self):
+        # Flashed messages are rendered into (and consumed by) the page, so
+        # a request carrying them always renders fresh
+        return (self.backend is not None and request.method in ('GET', 'HEAD')
+                and 'profile' not in request.args and not session.get('_flashes'))
+
+    def cached(self, *models, ttl=None):
+        # Caches a view's GET responses until one of the models' tables is
+        # written, or for ttl seconds at most
+        tables = [model.__table__.name for model in models]
+        self.tags.update(tables)
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.cacheable():
+                    return view(*args, **kwargs)
+                backend = self.backend
+                key = self.key()
+                tokens = {table: backend.token(scoped(table)) for table in tables}
+                entry = backend.get(key)
+                if entry is not None:
+                    header, body = entry
+                    if (header['tokens'] == tokens and header['expires'] > time.time()
+                            and 'headers' in header):
+                        return self.respond(header, body, 'HIT')
+
+                response = current_app.make_response(view(*args, **kwargs))
+                if (response.status_code != 200 or response.direct_passthrough
+                        or 'Set-Cookie' in response.headers):
+                    return response
+                body = response.get_data()
+                header = {'tokens': tokens, 'expires': time.time() + (ttl or self.default_ttl),
+                          'headers': [[name, value] for name, value in response.headers
+                                      if name.lower() not in OWN_HEADERS],
+                          'etag': hashlib.sha256(body).hexdigest()}
+                backend.set(key, header, body)
+                return self.respond(header, body, 'MISS')
+            return wrapper
+        return decorator
+
+    def respond(self, header, body, status):
+        response = Response(body, headers=header['headers'])
+        response.set_etag(header['etag'])
+        # Browsers keep the page but check back each time, unless the view
+        # asked for something else
+        response.headers.setdefault('Cache-Control', 'no-cache')
+        response.headers['X-Cache'] = status
+        return response.make_conditional(request)
+
+
+def scoped(name):
+    department = current_department()
+    return name if department is None else f'{department}:{name}'
+
+
+def make_backend(kind, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+    # 'memory', 'disk' (entries under directory) or 'off'
+    if kind == 'memory':
+        return MemoryBackend(max_bytes)
+    if kind == 'disk':
+        return DiskBackend(directory, max_bytes)
+    if kind == 'off':
+        return None
+    raise ValueError(f'Unknown response cache backend: {kind}')
@@ -0,0 +1,77 @@
+from datetime import date, datetime
+
+from models import db, Event, Student, Subject
+
+# Sample rows for a fresh database, added by `flask init-db`
+
+SE_STUDENTS = [
+    {"name": "Alice Johnson", "roll": "SE001",
+        "email": "alice@college.edu", "phone": "1234567890"},
+    {"name": "Bob Smith", "roll": "SE002",
+        "email": "bob@college.edu", "phone": "1234567891"},
+    {"name": "Carol Davis", "roll": "SE003",
+        "email": "carol@college.edu", "phone": "1234567892"},
+    {"name": "David Wilson", "roll": "SE004",
+        "email": "david@college.edu", "phone": "1234567893"},
+    {"name": "Eva Brown", "roll": "SE005",
+        "email": "eva@college.edu", "phone": "1234567894"}
+]
+
+TE_STUDENTS = [
+    {"name": "Ivy Chen", "roll": "TE001",
+        "email": "ivy@college.edu", "phone": "1234567895"},
+    {"name": "Jack Anderson", "roll": "TE002",
+        "email": "jack@college.edu", "phone": "1234567896"},
+    {"name": "Karen White", "roll": "TE003",
+        "email": "karen@college.edu", "phone": "1234567897"},
+    {"name": "Leo Martin", "roll": "TE004",
+        "email": "leo@college.edu", "phone": "1234567898"},
+    {"name": "Mia Garcia", "roll": "TE005",
+        "email": "mia@college.edu", "phone": "1234567899"}
+]
+
+SAMPLE_SYLLABUS = {
+    'SE': {
+        'Software Engineering': ['Introduction to SE', 'SDLC', 'Requirements'],
+        'Data Structures': ['Arrays', 'Linked Lists', 'Stacks']
+    },
+    'TE': {
+        'Database Systems': ['DB Concepts', 'SQL', 'Normalization'],
+        'Computer Networks': ['Network Basics', 'TCP/IP', 'Security']
+    }
+}
+
+
+def add_sample_data():
+    # Fills the events, students and subjects tables while they are empty
+    if Event.query.first() is None:
+        sample_events = [
+            Event(title='SE Lecture - Software Engineering',
+                  date=date.today(), time=datetime.strptime('09:00', '%H:%M').time(),
+                  type='lecture'),
+            Event(title='TE Lecture - Database Systems',
+                  date=date.today(), time=datetime.strptime('11:00', '%H:%M').time(),
+                  type='lecture'),
+            Event(title='Department Meeting', date=date.today(),
+                  time=datetime.strptime('14:00', '%H:%M').time(), type='meeting')
+        ]
+        for event in sample_events:
+            db.session.add(event)
+
+    if Student.query.first() is None:
+        for year, students in (('SE', SE_STUDENTS), ('TE', TE_STUDENTS)):
+            for student_data in students:
+                db.session.add(Student(
+                    name=student_data['name'],
+                    roll_number=student_data['roll'],
+                    year=year,
+                    email=student_data['email'],
+                    phone=student_data['phone']
+                ))
+
+    if Subject.query.first() is None:
+        for year, subjects in SAMPLE_SYLLABUS.items():
+            for subject in subjects:
+                db.session.add(Subject(year=year, name=subject))
+
+    db.session.commit()
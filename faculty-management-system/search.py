@@ -0,0 +1,138 @@
+import os
+import re
+import zipfile
+from xml.etree import ElementTree
+
+from markupsafe import Markup, escape
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF text extraction is optional
+    PdfReader = None
+
+# Full-text search over notes and assignments with SQLite FTS5. Each document
+# is one row of the search_index virtual table: its title, subject and
+# description, plus the text extracted from its uploaded file. Rowids encode
+# the document kind so a row can be replaced or removed without a lookup.
+
+KINDS = ('note', 'assignment')
+# bm25 weights for title, subject, description and body
+COLUMN_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+MAX_BODY_CHARS = 200000
+MAX_TERMS = 10
+# Shorter prefixes match most of the index and make ranking slow
+MIN_PREFIX_CHARS = 3
+SNIPPET_TOKENS = 16
+# Private-use markers around matches, turned into <mark> after escaping
+MATCH_START, MATCH_END = '\ue000', '\ue001'
+
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    title, subject, description, body,
+    tokenize = 'porter unicode61 remove_diacritics 2',
+    prefix = '3'
+)"""
+
+TERM = re.compile(r'\w+')
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def rowid(kind, item_id):
+    return item_id * len(KINDS) + KINDS.index(kind)
+
+
+def document(rowid):
+    return KINDS[rowid % len(KINDS)], rowid // len(KINDS)
+
+
+def enabled(engine):
+    # The index is an FTS5 table; other databases fall back to LIKE
+    return engine.dialect.name == 'sqlite'
+
+
+def create_index(conn):
+    conn.exec_driver_sql(CREATE_INDEX)
+
+
+def drop_index(conn):
+    conn.exec_driver_sql('DROP TABLE IF EXISTS search_index')
+
+
+def index_document(conn, kind, item_id, title, subject, description, body=''):
+    conn.exec_driver_sql(
+        'INSERT OR REPLACE INTO search_index (rowid, title, subject, description, body) '
+        'VALUES (?, ?, ?, ?, ?)',
+        (rowid(kind, item_id), title, subject, description or '', body))
+
+
+def set_body(conn, kind, item_id, body):
+    conn.exec_driver_sql('UPDATE search_index SET body = ? WHERE rowid = ?',
+                         (body, rowid(kind, item_id)))
+
+
+def remove_document(conn, kind, item_id):
+    conn.exec_driver_sql('DELETE FROM search_index WHERE rowid = ?', (rowid(kind, item_id),))
+
+
+def fts_query(text):
+    # Every word must match; the last one also as a prefix so results show
+    # up while typing. Words are quoted, so FTS5 syntax in user input is inert.
+    terms = [f'"{term}"' for term in TERM.findall(text.lower())[:MAX_TERMS]]
+    if not terms:
+        return None
+    if len(terms[-1]) - 2 >= MIN_PREFIX_CHARS:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(text):
+    return Markup(str(escape(text)).replace(MATCH_START, Markup('<mark>'))
+                  .replace(MATCH_END, Markup('</mark>')))
+
+
+def search(conn, text, limit=20, offset=0):
+    # Returns [(kind, item_id, title_html, snippet_html)] best match first
+    query = fts_query(text)
+    if query is None:
+        return []
+    rows = conn.exec_driver_sql(
+        'SELECT rowid, highlight(search_index, 0, ?, ?), '
+        "snippet(search_index, -1, ?, ?, '…', ?) "
+        'FROM search_index WHERE search_index MATCH ? '
+        f"ORDER BY bm25(search_index, {', '.join(map(str, COLUMN_WEIGHTS))}) "
+        'LIMIT ? OFFSET ?',
+        (MATCH_START, MATCH_END, MATCH_START, MATCH_END, SNIPPET_TOKENS,
+         query, limit, offset)).all()
+    return [document(row[0]) + (highlight(row[1]), highlight(row[2])) for row in rows]
+
+
+def extract_text(path, filename):
+    # Plain text of a .txt, .docx or .pdf upload ('' for anything else, or
+    # for PDFs when pypdf is not installed)
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.txt':
+        with open(path, encoding='utf-8', errors='replace') as f:
+            return f.read(MAX_BODY_CHARS)
+    if extension == '.docx':
+        with zipfile.ZipFile(path) as archive, archive.open('word/document.xml') as xml:
+            paragraphs, words, size = [], [], 0
+            for _, element in ElementTree.iterparse(xml):
+                if element.tag == WORD_NAMESPACE + 't' and element.text:
+                    words.append(element.text)
+                elif element.tag == WORD_NAMESPACE + 'p':
+                    paragraphs.append(''.join(words))
+                    size += len(paragraphs[-1])
+                    words = []
+                    if size >= MAX_BODY_CHARS:
+                        break
+                element.clear()
+        return '\n'.join(paragraphs)[:MAX_BODY_CHARS]
+    if extension == '.pdf' and PdfReader is not None:
+        pages, size = [], 0
+        for page in PdfReader(path).pages:
+            pages.append(page.extract_text() or '')
+            size += len(pages[-1])
+            if size >= MAX_BODY_CHARS:
+                break
+        return '\n'.join(pages)[:MAX_BODY_CHARS]
+    return ''
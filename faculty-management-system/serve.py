@@ -0,0 +1,46 @@
+# Production launcher: runs the app under uvicorn through the ASGI adapter in
+# asgi.py, with one worker process per available core by default.
+#
+#     pip install uvicorn
+#     python serve.py [--host 0.0.0.0] [--port 8000] [--workers N] [--threads 4]
+import argparse
+import os
+
+
+def available_cores():
+    # Cores this process may run on (respects CPU affinity and containers)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the app with uvicorn.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=available_cores(),
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='threads per worker running Flask code (default 4)')
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        parser.error('uvicorn is not installed; run pip install uvicorn')
+
+    os.environ['ASGI_THREADS'] = str(args.threads)
+
+    # Once, before the workers start; they only build the app
+    from app import create_app, init_db
+    init_db(create_app({'JOB_WORKERS': 0}))
+    print(f'Serving on http://{args.host}:{args.port} with {args.workers} workers '
+          f'x {args.threads} threads')
+    uvicorn.run('asgi:create_application', factory=True, host=args.host, port=args.port,
+                workers=args.workers, log_level=args.log_level)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+import contextlib
+import functools
+import re
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+import click
+import sqlalchemy as sa
+from flask import abort, current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+
+# Department partitioning. With DEPARTMENTS set, each department's data lives
+# in its own database: a SQLite file per department by default, or a schema
+# per department when SHARD_DATABASE_URI has no {department} placeholder
+# (PostgreSQL). Every request is routed to one department, picked from the
+# X-Department header (set by a proxy per faculty host), else
+# DEFAULT_DEPARTMENT. Clients cannot pick a department themselves. The session's
+# get_bind() sends all of the request's queries to that department's engine,
+# so the views need no department filters and departments never wait on each
+# other's write locks.
+#
+# The job queue stays in the main database (SQLALCHEMY_DATABASE_URI), shared
+# by every department; jobs carry the department they were queued from.
+# Engines are created on first use and the least recently used idle ones are
+# disposed of past SHARD_MAX_ENGINES. fan_out() runs a query in every department in
+# parallel, for institution-wide reports.
+
+# Tables kept in the main database
+MAIN_TABLES = ('job',)
+DEPARTMENT_PATTERN = re.compile(r'^[a-z0-9_-]{1,32}$')
+
+# (department, engine) set by use_department() outside requests
+_shard = ContextVar('shard', default=None)
+
+
+class ShardRouter:
+
+    def __init__(self, app):
+        self.app = app
+        self.departments = tuple(app.config['DEPARTMENTS'])
+        for department in self.departments:
+            if not DEPARTMENT_PATTERN.match(department):
+                raise ValueError(f'Invalid department key: {department!r}')
+        self.default = app.config['DEFAULT_DEPARTMENT'] or (
+            self.departments[0] if self.departments else None)
+        self.uri = app.config['SHARD_DATABASE_URI']
+        self.max_engines = app.config['SHARD_MAX_ENGINES']
+        self.engines = OrderedDict()  # department -> engine, least recently used first
+        self.in_use = Counter()  # department -> requests and jobs using its engine
+        self.lock = threading.Lock()
+        self.pool = None
+        # Without a placeholder every department shares one engine (and its
+        # pool), each seeing its own schema
+        self.base = None
+        if self.departments and '{department}' not in self.uri:
+            if self.uri.startswith('sqlite'):
+                raise ValueError('SHARD_DATABASE_URI needs a {department} placeholder for SQLite')
+            self.base = self.create_engine(self.uri)
+
+    def create_engine(self, uri):
+        # Shards get the main engine's tuning and query metrics
+        from database import engine_options, tune_engine
+        from metrics import instrument_engine
+        engine = sa.create_engine(uri, **engine_options(
+            uri, pool_size=self.app.config['SHARD_POOL_SIZE'],
+            max_overflow=self.app.config['DB_MAX_OVERFLOW']))
+        if self.app.config['SQLITE_TUNING'] and engine.dialect.name == 'sqlite':
+            tune_engine(engine, self.app.config['SQLITE_PRAGMAS'])
+        instrument_engine(engine)
+        return engine
+
+    def checkout(self, department):
+        # Returns the department's engine, kept open until release()
+        with self.lock:
+            engine = self.engines.pop(department, None)
+            if engine is None:
+                if self.base is not None:
+                    engine = self.base.execution_options(
+                        schema_translate_map={None: department})
+                else:
+                    engine = self.create_engine(self.uri.format(department=department))
+            self.engines[department] = engine
+            self.in_use[department] += 1
+            self.evict()
+        return engine
+
+    def release(self, department):
+        with self.lock:
+            self.in_use[department] -= 1
+            if not self.in_use[department]:
+                del self.in_use[department]
+            self.evict()
+
+    def evict(self):
+        # Disposes of the least recently used engines past max_engines. Engines
+        # in use are skipped, so the count may stay above the limit until
+        # their requests finish.
+        for department in list(self.engines):
+            if len(self.engines) <= self.max_engines:
+                break
+            if self.in_use[department]:
+                continue
+            idle = self.engines.pop(department)
+            if self.base is None:
+                idle.dispose()
+
+    def create_schema(self, engine, department):
+        from models import db
+        with engine.begin() as connection:
+            if self.base is not None:
+                connection.exec_driver_sql(f'CREATE SCHEMA IF NOT EXISTS "{department}"')
+            db.metadata.create_all(connection, tables=[
+                table for table in db.metadata.sorted_tables if table.name not in MAIN_TABLES])
+
+    def fan_out(self, query, departments=None):
+        # Runs query() once in each department, in parallel on a thread
+        # pool; returns {department: result}
+        departments = list(departments or self.departments or [None])
+        if self.pool is None:
+            with self.lock:
+                if self.pool is None:
+                    self.pool = ThreadPoolExecutor(self.app.config['SHARD_FANOUT_THREADS'],
+                                                   thread_name_prefix='shard-fan-out')
+
+        def run(department):
+            with self.app.app_context(), use_department(department):
+                return query()
+        return dict(zip(departments, self.pool.map(run, departments)))
+
+    def route_request(self):
+        # before_request: picks the request's department. Only the proxy
+        # sets X-Department; it must strip the header from client requests.
+        department = request.headers.get('X-Department') or self.default
+        if department not in self.departments:
+            abort(404, f'Unknown department: {department}')
+        g.shard = (department, self.checkout(department))
+
+    def release_request(self, error=None):
+        # teardown_request: the request no longer needs its engine
+        shard = g.pop('shard', None)
+        if shard is not None:
+            self.release(shard[0])
+
+
+class ShardSession(Session):
+    # Sends queries to the current department's engine, and the MAIN_TABLES
+    # (and everything when no department is active) to the main database
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        shard = current_shard()
+        if bind is None and shard is not None and not _main_table(mapper, clause):
+            return shard[1]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _main_table(mapper, clause):
+    if mapper is not None:
+        table = sa.inspect(mapper).local_table
+    elif isinstance(clause, sa.Table):
+        table = clause
+    else:
+        table = getattr(clause, 'table', None)
+    return table is not None and table.name in MAIN_TABLES
+
+
+def init_shards(app):
+    router = app.extensions['shards'] = ShardRouter(app)
+    if router.departments:
+        app.before_request(router.route_request)
+        app.teardown_request(router.release_request)
+
+
+def current_shard():
+    shard = _shard.get()
+    if shard is None and has_app_context():
+        shard = g.get('shard')
+    return shard
+
+
+def current_department():
+    shard = current_shard()
+    return shard[0] if shard else None
+
+
+def departments():
+    return current_app.extensions['shards'].departments
+
+
+@contextlib.contextmanager
+def use_department(department):
+    # Routes the session to a department outside a request (jobs, commands).
+    # A fresh app context gives the department its own session, so rows of
+    # different departments never share an identity map.
+    if department is None:
+        yield
+        return
+    router = current_app.extensions['shards']
+    if department not in router.departments:
+        raise ValueError(f'Unknown department: {department}')
+    with current_app.app_context():
+        token = _shard.set((department, router.checkout(department)))
+        try:
+            yield
+        finally:
+            _shard.reset(token)
+            router.release(department)
+
+
+def fan_out(query, departments=None):
+    return current_app.extensions['shards'].fan_out(query, departments)
+
+
+def department_option(command):
+    # Adds --department to a CLI command, which then runs in that department
+    @click.option('--department', help='Department to work on (with DEPARTMENTS set).')
+    @functools.wraps(command)
+    def wrapper(*args, department=None, **kwargs):
+        if department is not None and department not in departments():
+            raise click.BadParameter(f'unknown department {department!r}', param_hint='--department')
+        with use_department(department):
+            return command(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,13 @@
+// Shared behaviour for every page; page-specific scripts live in each
+// template's scripts block.
+
+// Flash messages close themselves after a few seconds
+const FLASH_TIMEOUT_MS = 5000;
+
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('main > .alert-dismissible').forEach(function (alert) {
+        setTimeout(function () {
+            bootstrap.Alert.getOrCreateInstance(alert).close();
+        }, FLASH_TIMEOUT_MS);
+    });
+});
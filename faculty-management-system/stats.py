@@ -0,0 +1,204 @@
+import time
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import get_history
+
+from models import (db, ABSENT, PRESENT, Assignment, Attendance, DashboardStats,
+                    Student, Syllabus)
+from shards import current_department
+
+# Dashboard counters and read caches shared by the blueprints.
+#
+# The counters are materialized in the dashboard_stats table and read by the
+# dashboard and its JSON endpoints. They are kept current by the mapper
+# listeners below; bulk statements that bypass the ORM must call bump_stats()
+# themselves. `flask rebuild-stats` recomputes them.
+#
+# The read caches are small per-app caches for hot read paths, each entry
+# living for a short TTL. A session that writes the underlying rows registers
+# the cache with invalidate_on_commit() and the cache is dropped once that
+# session commits; the TTL bounds staleness in other worker processes.
+
+STAT_QUERIES = {
+    'attendance_total': lambda: Attendance.query.count(),
+    'attendance_present': lambda: Attendance.query.filter_by(status=PRESENT).count(),
+    'attendance_absent': lambda: Attendance.query.filter_by(status=ABSENT).count(),
+    'assignment_total': lambda: Assignment.query.count(),
+    'syllabus_total': lambda: Syllabus.query.count(),
+    'syllabus_completed': lambda: Syllabus.query.filter_by(completed=True).count(),
+    'student_total': lambda: Student.query.count(),
+}
+
+READ_CACHE_SIZE = 256
+# Grouped attendance aggregates, keyed by breakdown and filter tuple
+ATTENDANCE_STATS_TTL = 60
+# Attendance form rosters, keyed by year
+ROSTER_TTL = 60
+# Syllabus completion per (year, subject)
+SYLLABUS_PROGRESS_TTL = 60
+
+
+def bump_stats(connection, deltas):
+    table = DashboardStats.__table__
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        result = connection.execute(
+            table.update().where(table.c.name == name)
+            .values(value=table.c.value + delta))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(name=name, value=delta))
+
+
+def get_dashboard_stats():
+    stats = dict.fromkeys(STAT_QUERIES, 0)
+    stats.update(db.session.query(
+        DashboardStats.name, DashboardStats.value).all())
+    return stats
+
+
+def rebuild_stats(names=None):
+    # Recompute counters from the source tables; returns {name: (old, new)}
+    # for every counter that had drifted.
+    stored = get_dashboard_stats()
+    drift = {}
+    for name in names or STAT_QUERIES:
+        actual = STAT_QUERIES[name]()
+        if stored[name] != actual:
+            drift[name] = (stored[name], actual)
+        row = db.session.get(DashboardStats, name)
+        if row is None:
+            db.session.add(DashboardStats(name=name, value=actual))
+        else:
+            row.value = actual
+    db.session.commit()
+    return drift
+
+
+def status_deltas(status, sign):
+    deltas = {'attendance_total': sign}
+    if status == PRESENT:
+        deltas['attendance_present'] = sign
+    elif status == ABSENT:
+        deltas['attendance_absent'] = sign
+    return deltas
+
+
+def init_read_caches(app):
+    # Each app gets its own caches, so instances on different databases in
+    # one process never see each other's rows
+    app.extensions['read_caches'] = {}
+
+
+def read_cache(name):
+    # One cache per name and department
+    caches = current_app.extensions['read_caches']
+    return caches.setdefault((name, current_department()), {})
+
+
+def cached(cache, key, compute, ttl):
+    if not current_app.config['READ_CACHES']:
+        return compute()
+    now = time.monotonic()
+    hit = cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+    value = compute()
+    if len(cache) >= READ_CACHE_SIZE:
+        cache.clear()
+    cache[key] = (now + ttl, value)
+    return value
+
+
+def invalidate_on_commit(session, cache):
+    session.info.setdefault('stale_caches', []).append(cache)
+
+
+@event.listens_for(Session, 'after_commit')
+def _clear_stale_caches(session):
+    for cache in session.info.pop('stale_caches', []):
+        cache.clear()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_stale_caches(session):
+    session.info.pop('stale_caches', None)
+
+
+# Load the old value when these are set on an expired row, otherwise the
+# update listeners below see no history and the counters drift
+@event.listens_for(Attendance.status, 'set', active_history=True)
+@event.listens_for(Syllabus.completed, 'set', active_history=True)
+def _keep_previous_value(target, value, oldvalue, initiator):
+    pass
+
+
+@event.listens_for(Attendance, 'after_insert')
+def _attendance_inserted(mapper, connection, target):
+    bump_stats(connection, status_deltas(target.status, 1))
+    invalidate_on_commit(object_session(target), read_cache('attendance_stats'))
+
+
+@event.listens_for(Attendance, 'after_delete')
+def _attendance_deleted(mapper, connection, target):
+    bump_stats(connection, status_deltas(target.status, -1))
+    invalidate_on_commit(object_session(target), read_cache('attendance_stats'))
+
+
+@event.listens_for(Attendance, 'after_update')
+def _attendance_updated(mapper, connection, target):
+    invalidate_on_commit(object_session(target), read_cache('attendance_stats'))
+    history = get_history(target, 'status')
+    if history.deleted:
+        deltas = status_deltas(history.deleted[0], -1)
+        for name, delta in status_deltas(target.status, 1).items():
+            deltas[name] = deltas.get(name, 0) + delta
+        bump_stats(connection, deltas)
+
+
+@event.listens_for(Syllabus, 'after_insert')
+def _syllabus_inserted(mapper, connection, target):
+    bump_stats(connection, {'syllabus_total': 1,
+                            'syllabus_completed': 1 if target.completed else 0})
+    invalidate_on_commit(object_session(target), read_cache('syllabus_progress'))
+
+
+@event.listens_for(Syllabus, 'after_delete')
+def _syllabus_deleted(mapper, connection, target):
+    bump_stats(connection, {'syllabus_total': -1,
+                            'syllabus_completed': -1 if target.completed else 0})
+    invalidate_on_commit(object_session(target), read_cache('syllabus_progress'))
+
+
+@event.listens_for(Syllabus, 'after_update')
+def _syllabus_updated(mapper, connection, target):
+    invalidate_on_commit(object_session(target), read_cache('syllabus_progress'))
+    history = get_history(target, 'completed')
+    if history.deleted:
+        was_completed = bool(history.deleted[0])
+        if was_completed != bool(target.completed):
+            bump_stats(connection, {
+                'syllabus_completed': 1 if target.completed else -1})
+
+
+def _register_count_listeners(model, name):
+    @event.listens_for(model, 'after_insert')
+    def _inserted(mapper, connection, target):
+        bump_stats(connection, {name: 1})
+
+    @event.listens_for(model, 'after_delete')
+    def _deleted(mapper, connection, target):
+        bump_stats(connection, {name: -1})
+
+
+_register_count_listeners(Assignment, 'assignment_total')
+_register_count_listeners(Student, 'student_total')
+
+
+@event.listens_for(Student, 'after_insert')
+@event.listens_for(Student, 'after_update')
+@event.listens_for(Student, 'after_delete')
+def _student_changed(mapper, connection, target):
+    invalidate_on_commit(object_session(target), read_cache('roster'))
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+# Content-addressed blob store for uploaded files. Each distinct file is kept
+# once under its SHA-256 digest; the database reference-counts the blobs.
+
+CHUNK_SIZE = 64 * 1024
+
+
+class HashingFile:
+    # Temporary upload file that hashes bytes as they are streamed in, so
+    # storing an upload needs neither a second read nor a copy. Unclaimed
+    # files are removed when closed.
+
+    def __init__(self, root):
+        directory = os.path.join(root, 'tmp')
+        os.makedirs(directory, exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile(dir=directory, prefix='upload-')
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+def blob_path(root, digest):
+    return os.path.join(root, digest[:2], digest)
+
+
+def is_digest(value):
+    return len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+
+def hash_stream(root, stream):
+    # Copies any readable stream into a HashingFile chunk by chunk
+    hashed = HashingFile(root)
+    shutil.copyfileobj(stream, hashed, CHUNK_SIZE)
+    return hashed
+
+
+def store(root, stream):
+    # Links a hashed upload into place under its digest, unless an identical
+    # blob is already stored. Returns (digest, size).
+    if not isinstance(stream, HashingFile):
+        stream = hash_stream(root, stream)
+    stream.flush()
+    digest = stream.sha256.hexdigest()
+    path = blob_path(root, digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.link(stream.name, path)
+        except FileExistsError:
+            pass
+    return digest, stream.size
+
+
+def remove(root, digest):
+    try:
+        os.remove(blob_path(root, digest))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_db  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    # An isolated app on a fresh SQLite file, with the sample data
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+        'JOB_WORKERS': 0,
+        'RESPONSE_CACHE': 'off',
+        'BLOB_FOLDER': str(tmp_path / 'blobs'),
+        'EXPORT_FOLDER': str(tmp_path / 'exports'),
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+    })
+    init_db(app)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,8 @@
+import archive
+
+
+def test_counts_within_mask():
+    present, recorded = 0b1011, 0b1111
+    assert archive.counts(present, recorded, archive.full_mask(4)) == (3, 4)
+    assert archive.counts(present, recorded, 0b0011) == (2, 2)
+    assert archive.counts(present, 0b0110, 0b1111) == (1, 2)
@@ -0,0 +1,53 @@
+import asyncio
+
+from asgi import AsgiAdapter
+
+
+def call(messages, headers=()):
+    # Runs one request through the adapter; returns the sent messages and
+    # whether the WSGI app was called
+    called = []
+
+    def wsgi_app(environ, start_response):
+        called.append(environ['wsgi.input'].read())
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'ok']
+
+    incoming = list(messages)
+    sent = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'http_version': '1.1', 'method': 'POST', 'path': '/',
+             'query_string': b'', 'headers': list(headers)}
+    adapter = AsgiAdapter(wsgi_app, threads=1)
+    asyncio.run(adapter(scope, receive, send))
+    adapter.executor.shutdown()
+    return sent, called
+
+
+def test_full_body_reaches_app():
+    sent, called = call([{'type': 'http.request', 'body': b'abc', 'more_body': True},
+                         {'type': 'http.request', 'body': b'def'}],
+                        headers=[(b'content-length', b'6')])
+    assert called == [b'abcdef']
+    assert sent[0]['status'] == 200
+
+
+def test_disconnect_skips_app():
+    sent, called = call([{'type': 'http.request', 'body': b'abc', 'more_body': True},
+                         {'type': 'http.disconnect'}],
+                        headers=[(b'content-length', b'6')])
+    assert called == []
+    assert sent == []
+
+
+def test_short_body_skips_app():
+    sent, called = call([{'type': 'http.request', 'body': b'abc'}],
+                        headers=[(b'content-length', b'6')])
+    assert called == []
+    assert sent == []
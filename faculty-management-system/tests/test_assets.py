@@ -0,0 +1,19 @@
+import pytest
+
+import assets
+
+
+@pytest.fixture
+def fallback(monkeypatch):
+    # The built-in minifier, even where rcssmin is installed
+    monkeypatch.setattr(assets, 'rcssmin', None)
+
+
+def test_minify_css_collapses_code(fallback):
+    css = 'a > b ,  c {\n  color : red ;\n  /* note */\n}\n'
+    assert assets.minify_css(css) == 'a>b,c{color : red}'
+
+
+def test_minify_css_keeps_strings(fallback):
+    css = '.a::after { content: "x , y ; }" ; }\n.b { content: \' > \' }'
+    assert assets.minify_css(css) == '.a::after{content: "x , y ; }"}.b{content: \' > \'}'
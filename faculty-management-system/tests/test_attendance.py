@@ -0,0 +1,107 @@
+import io
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import literal, select
+
+from models import Attendance, Student, db
+from views.attendance import attendance_period
+
+
+def session(**changes):
+    data = {'year': 'SE', 'subject': 'DBMS', 'date': '2025-03-03', 'records': []}
+    data.update(changes)
+    return data
+
+
+@pytest.mark.parametrize('payload', [
+    session(records={'student_id': 1, 'status': 'Present'}),
+    session(records='Present'),
+    session(records=7),
+    session(records=[[1, 'Present']]),
+    session(records=[{'student_id': 1, 'status': 1}]),
+    session(records=[{'student_id': 1, 'status': ['Present']}]),
+    session(records=[{'student_id': 1, 'status': 'Late'}]),
+    session(subject=['DBMS']),
+    session(date=20250303),
+    [session(), 'not a session'],
+])
+def test_bulk_attendance_rejects_malformed_sessions(client, payload):
+    response = client.post('/api/attendance/bulk', json=payload)
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+def test_bulk_attendance_saves_session(app, client):
+    with app.app_context():
+        student_id = Student.query.first().id
+        before = Attendance.query.count()
+    response = client.post('/api/attendance/bulk', json=session(
+        records=[{'student_id': student_id, 'status': 'present'}]))
+    assert response.status_code == 200, response.get_json()
+    with app.app_context():
+        assert Attendance.query.count() == before + 1
+
+
+def test_week_breakdown_uses_iso_weeks(app):
+    with app.app_context():
+        day = date(2019, 12, 20)
+        while day < date(2027, 1, 10):
+            label = db.session.scalar(select(attendance_period('week', literal(day))))
+            year, week, _ = day.isocalendar()
+            assert label == f'{year}-W{week:02d}', day
+            day += timedelta(days=1)
+
+
+@pytest.mark.parametrize('limit', ['0', '-5', '100000'])
+def test_attendance_records_clamps_limit(client, limit):
+    assert client.get(f'/attendance_records?limit={limit}').status_code == 200
+
+
+def test_attendance_form_rejects_malformed_date(client):
+    response = client.post('/attendance', data={'year': 'SE', 'subject': 'DBMS',
+                                                'date': '03/03/2025'})
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert session['_flashes'][0][0] == 'error'
+
+
+def roster_rolls(client, year='SE'):
+    return [row['roll_number'] for row in client.get(f'/api/students?year={year}').get_json()['students']]
+
+
+def test_roster_follows_student_changes(app, client):
+    before = roster_rolls(client)
+    client.post('/add_student', data={'name': 'Roster Test', 'roll_number': 'ZZZ001',
+                                      'year': 'SE', 'email': '', 'phone': ''})
+    assert roster_rolls(client) == before + ['ZZZ001']
+    with app.app_context():
+        student_id = Student.query.filter_by(roll_number='ZZZ001').one().id
+    client.post(f'/edit_student/{student_id}', data={'name': 'Roster Test', 'roll_number': 'ZZZ001',
+                                                     'year': 'TE', 'email': '', 'phone': ''})
+    assert roster_rolls(client) == before
+    assert 'ZZZ001' in roster_rolls(client, 'TE')
+    client.get(f'/delete_student/{student_id}')
+    assert 'ZZZ001' not in roster_rolls(client, 'TE')
+
+
+def test_roster_follows_import(app, client):
+    before = roster_rolls(client)
+    client.post('/students/import?format=json', data={
+        'file': (io.BytesIO(b'name,roll_number,year\r\nImported,ZZZ002,SE\r\n'), 'roster.csv')},
+        content_type='multipart/form-data')
+    assert roster_rolls(client) == before + ['ZZZ002']
+
+
+def test_roster_is_cached_between_changes(app, client):
+    roster_rolls(client)
+    with app.app_context():
+        # A raw write skips the listeners, so only the TTL would pick it up
+        db.session.execute(Student.__table__.insert().values(
+            name='Raw', roll_number='ZZZ003', year='SE'))
+        db.session.commit()
+    assert 'ZZZ003' not in roster_rolls(client)
+
+
+def test_roster_requires_year(client):
+    assert client.get('/api/students').status_code == 400
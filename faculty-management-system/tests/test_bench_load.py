@@ -0,0 +1,11 @@
+from app import init_db
+from bench.load import load_app, measure
+
+
+def test_load_harness_measures_uncached_work(tmp_path):
+    app = load_app(tmp_path / 'bench.db')
+    init_db(app)
+    client = app.test_client()
+    for url in ('/calendar', '/api/attendance/stats'):
+        # Past the warmup, every request still runs its queries
+        assert measure(client, url, requests=2, warmup=2)['queries'] > 0, url
@@ -0,0 +1,67 @@
+from datetime import date
+
+from models import Event, EventRecurrence, db
+
+
+def event_form(**changes):
+    form = {'title': 'Staff meeting', 'date': '2030-01-07', 'time': '10:00',
+            'type': 'meeting', 'description': '', 'repeat': 'weekly', 'interval': '1'}
+    form.update(changes)
+    return form
+
+
+def add_event(app, client, **changes):
+    client.post('/add_event', data=event_form(**changes))
+    with app.app_context():
+        return Event.query.filter_by(title='Staff meeting').one().id
+
+
+def test_edit_recurring_event_updates_rule(app, client):
+    event_id = add_event(app, client)
+    with app.app_context():
+        rule = db.session.get(Event, event_id).recurrence
+        rule.reminded_through = date(2030, 1, 14)
+        db.session.commit()
+
+    response = client.post(f'/edit_event/{event_id}',
+                           data=event_form(title='Staff meeting', interval='2', time='11:00'))
+    assert response.status_code == 302
+    with app.app_context():
+        assert EventRecurrence.query.count() == 1
+        rule = db.session.get(Event, event_id).recurrence
+        assert rule.interval == 2
+        # Same first occurrence, so sent reminders stay sent
+        assert rule.reminded_through == date(2030, 1, 14)
+
+
+def test_moving_a_recurring_event_restarts_its_reminders(app, client):
+    event_id = add_event(app, client)
+    with app.app_context():
+        db.session.get(Event, event_id).recurrence.reminded_through = date(2030, 1, 14)
+        db.session.commit()
+    client.post(f'/edit_event/{event_id}', data=event_form(date='2030-01-08'))
+    with app.app_context():
+        assert db.session.get(Event, event_id).recurrence.reminded_through is None
+
+
+def test_edit_can_stop_and_start_recurrence(app, client):
+    event_id = add_event(app, client)
+    client.post(f'/edit_event/{event_id}', data=event_form(repeat=''))
+    with app.app_context():
+        assert db.session.get(Event, event_id).recurrence is None
+    client.post(f'/edit_event/{event_id}', data=event_form(repeat='daily'))
+    with app.app_context():
+        assert db.session.get(Event, event_id).recurrence.freq == 'DAILY'
+
+
+def test_moving_an_event_resets_notified(app, client):
+    event_id = add_event(app, client, repeat='')
+    with app.app_context():
+        db.session.get(Event, event_id).notified = True
+        db.session.commit()
+    client.post(f'/edit_event/{event_id}', data=event_form(repeat='', title='Renamed'))
+    with app.app_context():
+        assert db.session.get(Event, event_id).notified
+    client.post(f'/edit_event/{event_id}', data=event_form(repeat='', date='2030-02-01'))
+    with app.app_context():
+        assert not db.session.get(Event, event_id).notified
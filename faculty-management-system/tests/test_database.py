@@ -0,0 +1,26 @@
+from flask import g
+from sqlalchemy import text
+
+from database import write_lock
+from models import db
+
+
+def test_write_lock_waits_for_first_transaction(app):
+    with app.test_request_context('/upload_notes', method='POST'):
+        app.preprocess_request()
+        # Nothing queues while the request body is still being parsed
+        assert 'write_lock' not in g
+        db.session.execute(text('SELECT 1'))
+        assert g.write_lock is write_lock()
+        assert g.write_lock.locked()
+        db.session.rollback()
+        app.do_teardown_request()
+        assert not write_lock().locked()
+
+
+def test_reads_take_no_write_lock(app):
+    with app.test_request_context('/notes'):
+        app.preprocess_request()
+        db.session.execute(text('SELECT 1'))
+        assert 'write_lock' not in g
+        db.session.rollback()
@@ -0,0 +1,104 @@
+import io
+import os
+
+import storage
+from models import Note, db
+from views.files import release_blob, remove_released_blob
+
+
+def upload_note(client, data=b'lecture notes'):
+    return client.post('/notes', data={
+        'title': 'Week 1', 'year': 'SE', 'subject': 'DBMS', 'description': '',
+        'file': (io.BytesIO(data), 'week1.txt')}, content_type='multipart/form-data')
+
+
+def test_delete_note_removes_blob_after_commit(app, client):
+    assert upload_note(client).status_code == 200
+    with app.app_context():
+        note = Note.query.filter_by(title='Week 1').one()
+        path = storage.blob_path(app.config['BLOB_FOLDER'], note.sha256)
+    assert os.path.exists(path)
+    client.get(f'/delete_note/{note.id}')
+    assert not os.path.exists(path)
+
+
+def test_rolled_back_release_keeps_blob(app, client):
+    upload_note(client)
+    with app.app_context():
+        note = Note.query.filter_by(title='Week 1').one()
+        path = storage.blob_path(app.config['BLOB_FOLDER'], note.sha256)
+        release_blob(note.sha256)
+        assert os.path.exists(path)
+        db.session.rollback()
+        db.session.commit()
+    assert os.path.exists(path)
+
+
+def test_blob_taken_again_before_unlink_is_kept(app, client):
+    upload_note(client)
+    with app.app_context():
+        note = Note.query.filter_by(title='Week 1').one()
+        path = storage.blob_path(app.config['BLOB_FOLDER'], note.sha256)
+        release_blob(note.sha256)
+        db.session.delete(note)
+        # Holds back the unlink the commit would run
+        released = db.session.info.pop('released_blobs')
+        db.session.commit()
+    # Another upload of the same file finds it still on disk and links it
+    upload_note(client)
+    with app.app_context():
+        remove_released_blob(*released[0])
+    assert os.path.exists(path)
+
+
+def blob_download_url(app, client):
+    upload_note(client, b'0123456789')
+    with app.app_context():
+        return f"/download/{Note.query.filter_by(title='Week 1').one().sha256}/week1.txt"
+
+
+def test_blob_download_is_cacheable(app, client):
+    url = blob_download_url(app, client)
+    response = client.get(url)
+    assert response.data == b'0123456789'
+    assert response.headers['ETag'] == f'"{url.split("/")[2]}"'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.cache_control.immutable and response.cache_control.private
+
+
+def test_blob_revalidation_is_not_modified(app, client):
+    url = blob_download_url(app, client)
+    etag = client.get(url).headers['ETag']
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_blob_range_request(app, client):
+    url = blob_download_url(app, client)
+    response = client.get(url, headers={'Range': 'bytes=2-5'})
+    assert response.status_code == 206
+    assert response.data == b'2345'
+    assert response.headers['Content-Range'] == 'bytes 2-5/10'
+    # A stale If-Range gets the whole file
+    response = client.get(url, headers={'Range': 'bytes=2-5', 'If-Range': '"other"'})
+    assert response.status_code == 200
+    assert response.data == b'0123456789'
+
+
+def test_blob_offload_to_proxy(app, client):
+    url = blob_download_url(app, client)
+    app.config['DOWNLOAD_OFFLOAD'] = 'x-accel'
+    response = client.get(url)
+    assert response.headers['X-Accel-Redirect'].endswith(url.split('/')[2])
+    assert response.data == b''
+    app.config['DOWNLOAD_OFFLOAD'] = None
+    app.config['USE_X_SENDFILE'] = True
+    response = client.get(url, headers={'If-None-Match': 'W/"stale"'})
+    assert 'X-Sendfile' in response.headers
+
+
+def test_unknown_blob_is_not_found(client):
+    assert client.get('/download/not-a-digest/week1.txt').status_code == 404
+    assert client.get(f'/download/{"0" * 64}/week1.txt').status_code == 404
@@ -0,0 +1,25 @@
+import os
+import shutil
+
+from app import create_app, init_db
+from models import Attendance
+from stats import get_dashboard_stats
+
+COMMITTED_DATABASE = os.path.join(os.path.dirname(__file__), '..', 'instance', 'faculty.db')
+
+
+def test_init_db_upgrades_the_committed_database(tmp_path):
+    path = tmp_path / 'faculty.db'
+    shutil.copy(COMMITTED_DATABASE, path)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'JOB_WORKERS': 0,
+                      'BLOB_FOLDER': str(tmp_path / 'blobs'),
+                      'EXPORT_FOLDER': str(tmp_path / 'exports'),
+                      'UPLOAD_FOLDER': str(tmp_path / 'uploads')})
+
+    init_db(app)
+
+    with app.app_context():
+        assert get_dashboard_stats()['attendance_total'] == Attendance.query.count()
+    client = app.test_client()
+    for url in ('/attendance_records', '/notes', '/assignments', '/search?q=a'):
+        assert client.get(url).status_code == 200, url
@@ -0,0 +1,175 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app, init_db
+from database import write_lock
+from extensions import jobs
+from jobs import RETRY_DELAY, STALE_AFTER
+from models import Job, db
+
+
+def second_app(tmp_path):
+    other = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "other.db"}',
+        'JOB_WORKERS': 0,
+        'RESPONSE_CACHE': 'off',
+        'BLOB_FOLDER': str(tmp_path / 'other-blobs'),
+        'EXPORT_FOLDER': str(tmp_path / 'other-exports'),
+        'UPLOAD_FOLDER': str(tmp_path / 'other-uploads'),
+    })
+    init_db(other, sample_data=False)
+    return other
+
+
+def job_status(app, job_id):
+    with app.app_context():
+        return db.session.get(Job, job_id).status
+
+
+def test_each_app_runs_its_own_jobs(app, tmp_path):
+    other = second_app(tmp_path)
+    with app.app_context():
+        job_id = jobs.enqueue('rebuild_stats').id
+    with other.app_context():
+        assert not jobs.run_one()
+    with app.app_context():
+        assert jobs.run_one()
+    assert job_status(app, job_id) == 'done'
+
+
+def test_worker_threads_stay_with_their_app(app, tmp_path):
+    second_app(tmp_path)
+    workers = app.extensions['jobs']
+    workers.start(1)
+    try:
+        with app.app_context():
+            job_id = jobs.enqueue('rebuild_stats').id
+        deadline = time.monotonic() + 10
+        while job_status(app, job_id) != 'done' and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        workers.stop()
+    assert job_status(app, job_id) == 'done'
+
+
+def test_concurrent_starts_make_one_pool(app):
+    workers = app.extensions['jobs']
+    barrier = threading.Barrier(8)
+
+    def start():
+        barrier.wait()
+        workers.start(2)
+    starters = [threading.Thread(target=start) for _ in range(8)]
+    for thread in starters:
+        thread.start()
+    for thread in starters:
+        thread.join()
+    try:
+        running = [thread for thread in threading.enumerate()
+                   if thread.name.startswith('job-worker-')]
+        assert len(workers.threads) == 2
+        assert len(running) == 2
+    finally:
+        workers.stop()
+
+
+def test_claim_waits_for_the_write_lock(app):
+    with app.app_context():
+        job_id = jobs.enqueue('rebuild_stats').id
+        lock = write_lock()
+    worker = threading.Thread(target=app.extensions['jobs'].run_one)
+    with lock:
+        worker.start()
+        worker.join(0.5)
+        # Queued behind the writer holding the lock
+        assert worker.is_alive()
+        assert job_status(app, job_id) == 'queued'
+    worker.join(10)
+    assert job_status(app, job_id) == 'done'
+
+
+@pytest.fixture
+def flaky_job():
+    # A job kind that fails while failures remain
+    failures = []
+
+    @jobs.handler('test_flaky')
+    def flaky(payload):
+        if failures:
+            failures.pop()
+            raise RuntimeError('still broken')
+        return {'ok': True}
+    yield failures
+    del jobs.handlers['test_flaky']
+
+
+def make_due(app, job_id):
+    with app.app_context():
+        db.session.get(Job, job_id).run_at = datetime.now()
+        db.session.commit()
+
+
+def get_job(app, job_id):
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        db.session.expunge(job)
+        return job
+
+
+def run_one(app):
+    with app.app_context():
+        return jobs.run_one()
+
+
+def test_failed_job_is_retried_with_backoff(app, flaky_job):
+    flaky_job.extend([1, 1])
+    with app.app_context():
+        job_id = jobs.enqueue('test_flaky').id
+    started = datetime.now()
+    assert run_one(app)
+    job = get_job(app, job_id)
+    assert (job.status, job.attempts, job.error) == ('queued', 1, 'RuntimeError: still broken')
+    assert job.run_at >= started + timedelta(seconds=RETRY_DELAY)
+    # Not due again until the delay has passed
+    assert not run_one(app)
+    make_due(app, job_id)
+    started = datetime.now()
+    assert run_one(app)
+    assert get_job(app, job_id).run_at >= started + timedelta(seconds=2 * RETRY_DELAY)
+    make_due(app, job_id)
+    assert run_one(app)
+    job = get_job(app, job_id)
+    assert (job.status, job.attempts, job.error) == ('done', 3, None)
+
+
+def test_job_fails_after_max_attempts(app, flaky_job):
+    flaky_job.extend([1, 1])
+    with app.app_context():
+        job_id = jobs.enqueue('test_flaky', max_attempts=2).id
+    run_one(app)
+    make_due(app, job_id)
+    run_one(app)
+    job = get_job(app, job_id)
+    assert (job.status, job.attempts) == ('failed', 2)
+    assert job.finished_at is not None
+    assert not run_one(app)
+
+
+def test_stale_running_job_is_handed_out_again(app, flaky_job):
+    with app.app_context():
+        job = jobs.enqueue('test_flaky')
+        job.status, job.locked_by = 'running', 'dead-worker'
+        job.locked_at = datetime.now() - STALE_AFTER - timedelta(minutes=1)
+        db.session.commit()
+        job_id = job.id
+    assert run_one(app)
+    assert job_status(app, job_id) == 'done'
+
+
+def test_enqueue_rejects_unknown_kinds(app):
+    with app.app_context(), pytest.raises(ValueError):
+        jobs.enqueue('no_such_job')
@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from models import db
+
+
+def profiled(client, **headers):
+    response = client.get('/notes?profile=1', headers=headers,
+                          environ_base={'REMOTE_ADDR': '127.0.0.1'})
+    return response.mimetype == 'text/plain'
+
+
+@pytest.fixture
+def profiling(app):
+    app.config['PROFILER_ENABLED'] = True
+    return app
+
+
+def test_local_requests_profile_without_a_token(profiling, client):
+    assert profiled(client)
+
+
+def test_token_is_required_once_configured(profiling, client):
+    profiling.config['ADMIN_TOKEN'] = 'secret'
+    assert not profiled(client)
+    assert not profiled(client, **{'X-Admin-Token': 'wrong'})
+    assert not profiled(client, **{'X-Admin-Token': 'sécret'})
+    assert profiled(client, **{'X-Admin-Token': 'secret'})
+
+
+def scrape(client, address='127.0.0.1', **headers):
+    return client.get('/metrics', headers=headers, environ_base={'REMOTE_ADDR': address})
+
+
+def test_metrics_are_local_without_a_token(client):
+    assert scrape(client).status_code == 200
+    assert scrape(client, address='203.0.113.7').status_code == 403
+
+
+def test_metrics_need_the_token_once_configured(app, client):
+    app.config['ADMIN_TOKEN'] = 'secret'
+    assert scrape(client).status_code == 403
+    response = scrape(client, address='203.0.113.7', **{'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    assert 'faculty_requests_total' in response.text
+
+
+def test_failed_statements_leave_no_timing_behind(app):
+    with app.app_context():
+        with db.engine.connect() as connection:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    connection.exec_driver_sql('SELECT * FROM no_such_table')
+            connection.exec_driver_sql('SELECT 1')
+            assert 'query_start' not in connection.info
@@ -0,0 +1,68 @@
+import os
+import shutil
+import sqlite3
+
+import migrations
+
+COMMITTED_DATABASE = os.path.join(os.path.dirname(__file__), '..', 'instance', 'faculty.db')
+# The schema from before the notified column
+OLDEST_DATABASE = os.path.join(os.path.dirname(__file__), '..', 'database', 'faculty.db')
+
+
+def committed_database(tmp_path):
+    path = tmp_path / 'faculty.db'
+    shutil.copy(COMMITTED_DATABASE, path)
+    return path
+
+
+def test_attendance_with_unreadable_dates_is_kept(tmp_path):
+    path = committed_database(tmp_path)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO attendance (id, date, year, subject, student_name, status) "
+                 "VALUES (100000, '31/02/2024', 'SE', 'DBMS', 'Legacy Student', 'Present')")
+    conn.commit()
+    conn.close()
+
+    migrations.upgrade(str(path))
+
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT date, student_name FROM attendance_rejected').fetchall() == [
+        ('31/02/2024', 'Legacy Student')]
+    assert conn.execute('SELECT 1 FROM attendance WHERE id = 100000').fetchone() is None
+    conn.close()
+
+
+def test_marks_that_are_not_objects_are_skipped(tmp_path, capsys):
+    path = committed_database(tmp_path)
+    conn = sqlite3.connect(path)
+    conn.executemany('UPDATE student SET marks = ? WHERE id = ?',
+                     [('{"DBMS": 71}', 1), ('[71, 80]', 2), ('"71"', 3), ('not json', 4)])
+    conn.commit()
+    conn.close()
+
+    migrations.upgrade(str(path))
+
+    assert 'migrated 1 marks, skipped 3 unreadable values' in capsys.readouterr().out
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT student_id, score FROM mark').fetchall() == [(1, 71)]
+    conn.close()
+
+
+def test_events_from_before_notified_are_migrated(tmp_path, capsys):
+    path = tmp_path / 'old.db'
+    shutil.copy(OLDEST_DATABASE, path)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO event (id, title, date, time, type, description) "
+                 "VALUES (1000, 'Lost', 'someday', '25:00', 'meeting', NULL)")
+    conn.commit()
+    conn.close()
+
+    migrations.upgrade(str(path))
+
+    assert 'kept 1 events' in capsys.readouterr().out
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT COUNT(*) FROM event WHERE notified IS NULL').fetchone()[0] > 0
+    assert conn.execute('SELECT title, date, time FROM event_rejected').fetchall() == [
+        ('Lost', 'someday', '25:00')]
+    conn.close()
+    assert migrations.needed(str(path)) == []
@@ -0,0 +1,65 @@
+import shutil
+
+from flask import make_response
+
+from app import create_app
+from extensions import page_cache
+from models import Note, db
+
+
+def cached_app(tmp_path, kind='disk'):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "cache.db"}',
+        'JOB_WORKERS': 0,
+        'RESPONSE_CACHE': kind,
+        'RESPONSE_CACHE_DIR': str(tmp_path / 'response_cache'),
+    })
+
+    @page_cache.cached(Note)
+    def report():
+        response = make_response('a,b\n')
+        response.mimetype = 'text/csv'
+        response.headers['Content-Disposition'] = 'attachment; filename=report.csv'
+        response.headers['Cache-Control'] = 'private, max-age=60'
+        return response
+
+    @page_cache.cached(Note)
+    def greeting():
+        response = make_response('hello')
+        response.set_cookie('seen', '1')
+        return response
+
+    app.add_url_rule('/test/report', 'report', report)
+    app.add_url_rule('/test/greeting', 'greeting', greeting)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_hit_replays_the_view_headers(tmp_path):
+    client = cached_app(tmp_path).test_client()
+    miss = client.get('/test/report')
+    hit = client.get('/test/report')
+    assert (miss.headers['X-Cache'], hit.headers['X-Cache']) == ('MISS', 'HIT')
+    for name in ('Content-Type', 'Content-Disposition', 'Cache-Control'):
+        assert hit.headers[name] == miss.headers[name], name
+    assert hit.headers['Cache-Control'] == 'private, max-age=60'
+    assert hit.data == b'a,b\n'
+
+
+def test_responses_setting_cookies_are_not_cached(tmp_path):
+    client = cached_app(tmp_path, 'memory').test_client()
+    for _ in range(2):
+        response = client.get('/test/greeting')
+        assert 'X-Cache' not in response.headers
+        assert 'seen=1' in response.headers['Set-Cookie']
+
+
+def test_disk_cache_is_the_default_and_per_database(tmp_path):
+    first = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "a.db"}'})
+    second = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "b.db"}'})
+    assert first.config['RESPONSE_CACHE'] == 'disk'
+    assert first.config['RESPONSE_CACHE_DIR'] != second.config['RESPONSE_CACHE_DIR']
+    for app in (first, second):
+        shutil.rmtree(app.config['RESPONSE_CACHE_DIR'])
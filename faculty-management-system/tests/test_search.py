@@ -0,0 +1,82 @@
+import io
+
+import pytest
+
+from extensions import jobs
+from models import Assignment, Note, db
+from search import fts_query
+from views.files import reindex_search
+
+
+def upload(client, kind, title, description='', data=b'', subject='DBMS'):
+    return client.post(f'/{kind}s', data={
+        'title': title, 'year': 'SE', 'subject': subject, 'description': description,
+        'file': (io.BytesIO(data), f'{kind}.txt')}, content_type='multipart/form-data')
+
+
+def run_jobs(app):
+    with app.app_context():
+        while jobs.run_one():
+            pass
+
+
+def search_titles(client, text):
+    results = client.get('/search', query_string={'q': text, 'format': 'json'}).get_json()['results']
+    return [result['title'] for result in results]
+
+
+def test_title_matches_rank_above_body_matches(app, client):
+    upload(client, 'note', 'Week 2', data=b'normalization of relations')
+    upload(client, 'assignment', 'Normalization exercises')
+    run_jobs(app)
+    assert search_titles(client, 'normalization') == [
+        '<mark>Normalization</mark> exercises', 'Week 2']
+
+
+def test_body_is_searchable_after_extraction(app, client):
+    upload(client, 'note', 'Week 3', data=b'transactions and isolation levels')
+    assert search_titles(client, 'isolation') == []
+    run_jobs(app)
+    assert search_titles(client, 'isolation') == ['Week 3']
+    # The last word also matches as a prefix; stemming covers the rest
+    assert search_titles(client, 'transaction isol') == ['Week 3']
+
+
+def test_deleted_uploads_leave_the_index(app, client):
+    upload(client, 'note', 'Indexing basics')
+    with app.app_context():
+        note_id = Note.query.filter_by(title='Indexing basics').one().id
+    assert search_titles(client, 'indexing') == ['<mark>Indexing</mark> basics']
+    client.get(f'/delete_note/{note_id}')
+    assert search_titles(client, 'indexing') == []
+
+
+def test_reindex_rebuilds_from_the_tables(app, client):
+    upload(client, 'note', 'Week 4', data=b'query optimization')
+    run_jobs(app)
+    with app.app_context():
+        db.session.execute(db.text('DELETE FROM search_index'))
+        db.session.commit()
+        assert search_titles(client, 'optimization') == []
+        assert reindex_search() == Note.query.count() + Assignment.query.count()
+    assert search_titles(client, 'optimization') == ['Week 4']
+    with app.app_context():
+        reindex_search(extract=False)
+    assert search_titles(client, 'optimization') == []
+
+
+def test_reindex_command(app, client):
+    upload(client, 'note', 'Week 5')
+    result = app.test_cli_runner().invoke(args=['reindex-search', '--no-text'])
+    assert 'Indexed' in result.output
+    assert search_titles(client, 'week') != []
+
+
+@pytest.mark.parametrize('text, query', [
+    ('Normal Forms', '"normal" "forms"*'),
+    ('no', '"no"'),
+    ('title:x OR "y"', '"title" "x" "or" "y"'),
+    ('!!!', None),
+])
+def test_fts_query_quotes_user_input(text, query):
+    assert fts_query(text) == query
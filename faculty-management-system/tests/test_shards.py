@@ -0,0 +1,93 @@
+import pytest
+
+from app import create_app, init_db
+from models import Student, db
+from shards import use_department
+
+
+@pytest.fixture
+def shard_app(tmp_path):
+    # Three departments, each on its own SQLite file, with at most two
+    # engines kept open
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "main.db"}',
+        'SHARD_DATABASE_URI': f'sqlite:///{tmp_path}/{{department}}.db',
+        'DEPARTMENTS': ['cs', 'it', 'mech'],
+        'SHARD_MAX_ENGINES': 2,
+        'JOB_WORKERS': 0,
+        'RESPONSE_CACHE': 'off',
+        'BLOB_FOLDER': str(tmp_path / 'blobs'),
+        'EXPORT_FOLDER': str(tmp_path / 'exports'),
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+    })
+    init_db(app, sample_data=False)
+    return app
+
+
+def add_student(client, roll_number, department=None):
+    headers = {'X-Department': department} if department else {}
+    return client.post('/add_student', headers=headers, data={
+        'name': 'Shard Test', 'roll_number': roll_number, 'year': 'SE', 'email': '', 'phone': ''})
+
+
+def roll_numbers(app, department):
+    with app.app_context(), use_department(department):
+        return [student.roll_number for student in Student.query.order_by(Student.roll_number)]
+
+
+def test_requests_are_routed_by_header(shard_app):
+    client = shard_app.test_client()
+    add_student(client, 'CS001', 'cs')
+    add_student(client, 'IT001', 'it')
+    # Without the header requests go to the default department
+    add_student(client, 'CS002')
+    assert roll_numbers(shard_app, 'cs') == ['CS001', 'CS002']
+    assert roll_numbers(shard_app, 'it') == ['IT001']
+    assert client.get('/students', headers={'X-Department': 'law'}).status_code == 404
+
+
+def test_clients_cannot_switch_department_by_query(shard_app):
+    client = shard_app.test_client()
+    client.get('/students?department=it')
+    add_student(client, 'CS001')
+    assert roll_numbers(shard_app, 'cs') == ['CS001']
+    assert roll_numbers(shard_app, 'it') == []
+
+
+def test_least_recently_used_idle_engine_is_evicted(shard_app):
+    router = shard_app.extensions['shards']
+    client = shard_app.test_client()
+    for department in ('cs', 'it', 'mech'):
+        client.get('/students', headers={'X-Department': department})
+    assert list(router.engines) == ['it', 'mech']
+    assert not router.in_use
+
+
+def test_engines_in_use_are_not_evicted(shard_app):
+    router = shard_app.extensions['shards']
+    with shard_app.app_context(), use_department('cs'):
+        engine = router.engines['cs']
+        for department in ('it', 'mech', 'it'):
+            router.checkout(department)
+            router.release(department)
+        assert router.engines['cs'] is engine
+        assert Student.query.count() == 0
+    # Evicted once its last user is done
+    router.checkout('mech')
+    router.release('mech')
+    assert list(router.engines) == ['it', 'mech']
+
+
+def test_department_stats_fan_out(shard_app):
+    client = shard_app.test_client()
+    add_student(client, 'CS001', 'cs')
+    add_student(client, 'CS002', 'cs')
+    add_student(client, 'IT001', 'it')
+    stats = client.get('/api/departments/stats').get_json()
+    assert [(counters['department'], counters['student_total'])
+            for counters in stats['departments']] == [('cs', 2), ('it', 1), ('mech', 0)]
+    assert stats['total']['student_total'] == 3
+    with shard_app.app_context():
+        # The job queue's database holds no department rows
+        assert db.session.query(Student).count() == 0
@@ -0,0 +1,87 @@
+from datetime import date
+
+from models import (ABSENT, PRESENT, Assignment, Attendance, DashboardStats, Student, Subject,
+                    Syllabus, db)
+from stats import STAT_QUERIES, get_dashboard_stats, rebuild_stats
+
+
+def actual_stats():
+    return {name: query() for name, query in STAT_QUERIES.items()}
+
+
+def assert_counters_current(app):
+    with app.app_context():
+        assert get_dashboard_stats() == actual_stats()
+
+
+def test_init_db_fills_the_counters(app):
+    assert_counters_current(app)
+
+
+def test_orm_writes_keep_the_counters_current(app):
+    with app.app_context():
+        student = Student(name='Counter Test', roll_number='CNT001', year='SE')
+        subject = Subject.query.first()
+        db.session.add(student)
+        db.session.flush()
+        record = Attendance(date=date(2030, 1, 1), student_id=student.id,
+                            subject_id=subject.id, status=PRESENT)
+        topic = Syllabus(year='SE', subject='DBMS', topic='Counted')
+        db.session.add_all([record, topic, Assignment(title='Counted', year='SE', subject='DBMS',
+                                               filename='a.txt', upload_date='2030-01-01')])
+        db.session.commit()
+        # Both rows are expired by the commit above
+        record.status = ABSENT
+        topic.completed = True
+        db.session.commit()
+    assert_counters_current(app)
+    with app.app_context():
+        db.session.delete(Attendance.query.filter_by(date=date(2030, 1, 1)).one())
+        db.session.commit()
+    assert_counters_current(app)
+
+
+def test_bulk_paths_keep_the_counters_current(app, client):
+    with app.app_context():
+        student_ids = [student.id for student in Student.query.filter_by(year='SE')]
+    session = {'year': 'SE', 'subject': 'DBMS', 'date': '2030-01-02',
+               'records': [{'student_id': student_id, 'status': 'Present'}
+                           for student_id in student_ids]}
+    client.post('/api/attendance/bulk', json=session)
+    # Resubmitting overwrites instead of counting twice
+    for record in session['records']:
+        record['status'] = 'Absent'
+    client.post('/api/attendance/bulk', json=session)
+    assert_counters_current(app)
+    client.get(f'/delete_student/{student_ids[0]}')
+    client.get('/init_syllabus')
+    assert_counters_current(app)
+
+
+def test_dashboard_reads_the_counters(app, client):
+    with app.app_context():
+        db.session.add_all([DashboardStats(name='syllabus_total', value=4),
+                            DashboardStats(name='syllabus_completed', value=1)])
+        db.session.commit()
+    assert client.get('/syllabus_progress').get_json() == {
+        'completed': 1, 'total': 4, 'percentage': 25.0}
+
+
+def test_rebuild_stats_reports_and_fixes_drift(app):
+    with app.app_context():
+        actual = actual_stats()['student_total']
+        db.session.get(DashboardStats, 'student_total').value = actual + 5
+        db.session.commit()
+        assert rebuild_stats() == {'student_total': (actual + 5, actual)}
+        assert rebuild_stats() == {}
+    assert_counters_current(app)
+
+
+def test_rebuild_stats_command(app):
+    runner = app.test_cli_runner()
+    assert 'up to date' in runner.invoke(args=['rebuild-stats']).output
+    with app.app_context():
+        db.session.get(DashboardStats, 'assignment_total').value += 1
+        db.session.commit()
+    assert 'assignment_total: stored' in runner.invoke(args=['rebuild-stats']).output
+    assert_counters_current(app)
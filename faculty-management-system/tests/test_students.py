@@ -0,0 +1,82 @@
+import io
+
+import pytest
+
+import views.students as students_view
+from models import Mark, Student, db
+from stats import get_dashboard_stats
+
+
+def import_roster(client, data):
+    return client.post('/students/import?format=json', data={
+        'file': (io.BytesIO(data), 'roster.csv')}, content_type='multipart/form-data')
+
+
+def test_import_students(app, client):
+    roster = '\ufeffname,roll_number,year\r\nZoë Example,IMP001,SE\r\n"Multi\r\nLine",IMP002,SE\r\n'
+    response = import_roster(client, roster.encode('utf-8'))
+    assert response.get_json() == {'status': 'success', 'inserted': 2, 'errors': []}
+    with app.app_context():
+        assert Student.query.filter_by(roll_number='IMP001').one().name == 'Zoë Example'
+
+
+def test_import_students_rejects_other_encodings(app, client):
+    roster = 'name,roll_number,year\r\nZoë Example,IMP001,SE\r\n'
+    response = import_roster(client, roster.encode('latin-1'))
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'error'
+    with app.app_context():
+        assert Student.query.filter_by(roll_number='IMP001').first() is None
+
+
+def post_marks(app, client, marks):
+    with app.app_context():
+        student_id = Student.query.first().id
+    client.post(f'/update_marks/{student_id}', data={
+        'subject': 'DBMS', 'assessment': 'Unit test', 'marks': marks})
+    with app.app_context():
+        mark = Mark.query.filter_by(student_id=student_id, assessment='Unit test').first()
+        return mark and mark.score
+
+
+def test_update_marks_saves_score(app, client):
+    assert post_marks(app, client, '87.5') == 87.5
+    assert post_marks(app, client, '0') == 0
+
+
+@pytest.mark.parametrize('marks', ['nan', 'inf', '-inf', 'abc', '-1', '100.01', '1e6'])
+def test_update_marks_rejects_invalid_scores(app, client, marks):
+    assert post_marks(app, client, marks) is None
+
+
+def roster_csv(roll_numbers):
+    lines = ['name,roll_number,year'] + [f'Student {roll},{roll},SE' for roll in roll_numbers]
+    return '\r\n'.join(lines).encode('utf-8')
+
+
+def test_import_students_in_batches(app, client, monkeypatch):
+    monkeypatch.setattr(students_view, 'IMPORT_BATCH_SIZE', 7)
+    import_roster(client, roster_csv(['BAT005', 'BAT020']))
+    response = import_roster(client, roster_csv([f'BAT{i:03}' for i in range(30)]))
+    result = response.get_json()
+    assert result['inserted'] == 28
+    assert [error['roll_number'] for error in result['errors']] == ['BAT005', 'BAT020']
+    with app.app_context():
+        assert Student.query.filter(Student.roll_number.like('BAT%')).count() == 30
+        assert get_dashboard_stats()['student_total'] == Student.query.count()
+
+
+def test_import_skips_roll_numbers_taken_since_the_check(app, client, monkeypatch):
+    original = students_view.student_insert
+
+    def racing_insert():
+        # Another request adds IMP002 between the check and the insert
+        db.session.execute(Student.__table__.insert().values(
+            name='Racer', roll_number='IMP002', year='SE'))
+        return original()
+    monkeypatch.setattr(students_view, 'student_insert', racing_insert)
+    response = import_roster(client, roster_csv(['IMP001', 'IMP002']))
+    assert response.get_json() == {'status': 'success', 'inserted': 1, 'errors': [
+        {'line': 3, 'roll_number': 'IMP002', 'errors': ['roll number already exists']}]}
+    with app.app_context():
+        assert Student.query.filter_by(roll_number='IMP002').one().name == 'Racer'
@@ -0,0 +1,82 @@
+import pytest
+
+from models import db, Syllabus
+from stats import get_dashboard_stats
+from views.syllabus import MAX_SYLLABUS_UPDATES
+
+
+def test_update_syllabus_marks_topic_completed(app, client):
+    client.get('/init_syllabus')
+    with app.app_context():
+        topic_id = Syllabus.query.first().id
+
+    response = client.post('/update_syllabus', data={'topic_id': topic_id, 'completed': 'true'})
+
+    assert response.status_code == 200
+    assert response.get_json() == {'status': 'success'}
+    with app.app_context():
+        assert db.session.get(Syllabus, topic_id).completed is True
+        assert get_dashboard_stats()['syllabus_completed'] == 1
+
+
+def test_update_syllabus_requires_topic_id(client):
+    response = client.post('/update_syllabus', data={})
+    assert response.status_code == 400
+
+
+def topic_ids(app):
+    with app.app_context():
+        return [topic.id for topic in Syllabus.query.order_by(Syllabus.id)]
+
+
+def completed_ids(app):
+    with app.app_context():
+        return {topic.id for topic in Syllabus.query.filter_by(completed=True)}
+
+
+def test_bulk_update_applies_all_updates(app, client):
+    client.get('/init_syllabus')
+    first, second, third = topic_ids(app)[:3]
+    client.post('/api/syllabus/bulk_update', json={'updates': [
+        {'id': first, 'completed': True}, {'id': second, 'completed': True}]})
+    response = client.post('/api/syllabus/bulk_update', json=[
+        {'id': first, 'completed': True}, {'id': second, 'completed': False},
+        {'id': third, 'completed': False}, {'id': third, 'completed': True}])
+    # Later entries win; topics already in the requested state do not count
+    assert response.get_json() == {'status': 'success', 'updates': 3, 'changed': 2}
+    assert completed_ids(app) == {first, third}
+    with app.app_context():
+        assert get_dashboard_stats()['syllabus_completed'] == 2
+
+
+@pytest.mark.parametrize('updates', [
+    [],
+    {'id': 1, 'completed': True},
+    [{'id': '1', 'completed': True}],
+    [{'id': True, 'completed': True}],
+    [{'id': 1.0, 'completed': True}],
+    [{'id': 1, 'completed': 'true'}],
+    [{'id': 1}],
+    ['1'],
+])
+def test_bulk_update_rejects_malformed_updates(app, client, updates):
+    client.get('/init_syllabus')
+    response = client.post('/api/syllabus/bulk_update', json={'updates': updates})
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+    assert completed_ids(app) == set()
+
+
+def test_bulk_update_with_unknown_topic_changes_nothing(app, client):
+    client.get('/init_syllabus')
+    known = topic_ids(app)[0]
+    response = client.post('/api/syllabus/bulk_update', json=[
+        {'id': known, 'completed': True}, {'id': 999999, 'completed': True}])
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'unknown topic ids: [999999]'
+    assert completed_ids(app) == set()
+
+
+def test_bulk_update_limits_batch_size(client):
+    updates = [{'id': topic_id, 'completed': True} for topic_id in range(MAX_SYLLABUS_UPDATES + 1)]
+    assert client.post('/api/syllabus/bulk_update', json=updates).status_code == 400
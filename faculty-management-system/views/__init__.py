@@ -0,0 +1 @@
+# Blueprints registered by create_app() (app.py), one module per area
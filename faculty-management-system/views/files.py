@@ -0,0 +1,407 @@
+import mimetypes
+import os
+import time
+from datetime import date
+
+import click
+from flask import (Blueprint, Response, current_app, flash, jsonify, redirect, render_template,
+                   request, send_file, send_from_directory, url_for)
+from markupsafe import escape
+from sqlalchemy import event, or_, text
+from sqlalchemy.orm import Session
+from werkzeug.utils import secure_filename
+
+import search
+import storage
+from database import background_write, write_transaction
+from extensions import jobs, page_cache
+from models import db, Assignment, Blob, Note
+from shards import department_option
+
+bp = Blueprint('files', __name__, cli_group=None)
+
+ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'ppt', 'pptx'}
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def acquire_blob(file):
+    # Stores an uploaded file (once per distinct content) and takes a
+    # reference on it. The refcount update runs first so the file is linked
+    # while this session holds the database write lock.
+    hashed = file.stream
+    if not isinstance(hashed, storage.HashingFile):
+        hashed = storage.hash_stream(current_app.config['BLOB_FOLDER'], hashed)
+    digest = hashed.sha256.hexdigest()
+    blob_lock(db.session.connection(), digest)
+    table = Blob.__table__
+    result = db.session.execute(table.update().where(table.c.sha256 == digest)
+                                .values(refcount=table.c.refcount + 1))
+    if result.rowcount == 0:
+        db.session.execute(table.insert().values(
+            sha256=digest, size=hashed.size, refcount=1))
+    storage.store(current_app.config['BLOB_FOLDER'], hashed)
+    return digest
+
+
+def release_blob(digest):
+    # Drops a reference and unlinks the blob once nothing points at it
+    table = Blob.__table__
+    db.session.execute(table.update().where(table.c.sha256 == digest)
+                       .values(refcount=table.c.refcount - 1))
+    result = db.session.execute(table.delete().where(
+        table.c.sha256 == digest, table.c.refcount <= 0))
+    if result.rowcount:
+        db.session.info.setdefault('released_blobs', []).append(
+            (db.session.get_bind(Blob), current_app.config['BLOB_FOLDER'], digest))
+
+
+def blob_lock(connection, digest):
+    # Held until the transaction ends, so storing and removing one blob never
+    # interleave. SQLite's write lock already serializes them.
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('SELECT pg_advisory_xact_lock(:key)'),
+                           {'key': int(digest[:15], 16)})
+
+
+def remove_released_blob(engine, root, digest):
+    # Another upload may have taken the blob again since the release
+    # committed; only a blob still without a row goes. The no-op UPDATE takes
+    # the write lock, so no upload can link the file in between.
+    table = Blob.__table__
+    with engine.begin() as connection:
+        blob_lock(connection, digest)
+        taken = connection.execute(table.update().where(table.c.sha256 == digest)
+                                   .values(refcount=table.c.refcount)).rowcount
+        if not taken:
+            storage.remove(root, digest)
+
+
+def remove_upload(item):
+    if item.sha256:
+        release_blob(item.sha256)
+    else:
+        remove_on_commit(db.session,
+                         os.path.join(current_app.config['UPLOAD_FOLDER'], item.filename))
+
+
+def remove_on_commit(session, path):
+    # The file goes once the rows pointing at it are gone for good; a
+    # rollback keeps it
+    session.info.setdefault('removed_files', []).append(path)
+
+
+@event.listens_for(Session, 'after_commit')
+def _remove_files(session):
+    for path in session.info.pop('removed_files', []):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    for released in session.info.pop('released_blobs', []):
+        remove_released_blob(*released)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _keep_files(session):
+    session.info.pop('removed_files', None)
+    session.info.pop('released_blobs', None)
+
+
+def upload_path(item):
+    if item.sha256:
+        return storage.blob_path(current_app.config['BLOB_FOLDER'], item.sha256)
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], item.filename)
+
+
+@bp.app_template_global()
+def file_url(item):
+    if item.sha256:
+        return url_for('files.download_blob', digest=item.sha256, filename=item.filename)
+    return url_for('files.download_file', filename=item.filename)
+
+# ========== ASSIGNMENT ROUTES ==========
+
+
+@bp.route('/assignments', methods=['GET', 'POST'])
+@page_cache.cached(Assignment)
+def assignments():
+    if request.method == 'POST':
+        title = request.form['title']
+        year = request.form['year']
+        subject = request.form['subject']
+        description = request.form['description']
+        file = request.files['file']
+
+        if file and file.filename != '':
+            filename = secure_filename(file.filename)
+
+            new_assignment = Assignment(
+                title=title, year=year, subject=subject,
+                filename=filename, upload_date=date.today().strftime('%Y-%m-%d'),
+                description=description, sha256=acquire_blob(file)
+            )
+            db.session.add(new_assignment)
+            db.session.flush()
+            index_upload('assignment', new_assignment)
+            db.session.commit()
+            flash('Assignment uploaded successfully!', 'success')
+        else:
+            flash('Please select a file to upload', 'error')
+
+    assignments = Assignment.query.order_by(
+        Assignment.upload_date.desc()).all()
+    return render_template('assignments.html', assignments=assignments)
+
+
+@bp.route('/delete_assignment/<int:assignment_id>')
+@write_transaction
+def delete_assignment(assignment_id):
+    assignment = Assignment.query.get_or_404(assignment_id)
+    remove_upload(assignment)
+    unindex_upload('assignment', assignment)
+    db.session.delete(assignment)
+    db.session.commit()
+    flash('Assignment deleted successfully!', 'success')
+    return redirect(url_for('.assignments'))
+
+# ========== NOTES ROUTES ==========
+
+
+@bp.route('/notes', methods=['GET', 'POST'])
+@page_cache.cached(Note)
+def notes():
+    if request.method == 'POST':
+        title = request.form['title']
+        year = request.form['year']
+        subject = request.form['subject']
+        description = request.form['description']
+        file = request.files['file']
+
+        if file and file.filename != '':
+            filename = secure_filename(file.filename)
+
+            new_note = Note(
+                title=title, year=year, subject=subject,
+                filename=filename, upload_date=date.today().strftime('%Y-%m-%d'),
+                description=description, sha256=acquire_blob(file)
+            )
+            db.session.add(new_note)
+            db.session.flush()
+            index_upload('note', new_note)
+            db.session.commit()
+            flash('Notes uploaded successfully!', 'success')
+        else:
+            flash('Please select a file to upload', 'error')
+
+    notes = Note.query.order_by(Note.upload_date.desc()).all()
+    return render_template('notes.html', notes=notes)
+
+
+@bp.route('/delete_note/<int:note_id>')
+@write_transaction
+def delete_note(note_id):
+    note = Note.query.get_or_404(note_id)
+    remove_upload(note)
+    unindex_upload('note', note)
+    db.session.delete(note)
+    db.session.commit()
+    flash('Note deleted successfully!', 'success')
+    return redirect(url_for('.notes'))
+
+# ========== FILE DOWNLOAD ==========
+
+
+@bp.route('/download/<filename>')
+def download_file(filename):
+    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+
+
+BLOB_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def blob_cache_headers(response, digest):
+    # Blobs never change under their digest, so it is a strong validator
+    # and clients may keep their copy indefinitely.
+    response.set_etag(digest)
+    response.cache_control.no_cache = None
+    response.cache_control.public = None
+    response.cache_control.private = True
+    response.cache_control.max_age = BLOB_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+@bp.route('/download/<digest>/<filename>')
+def download_blob(digest, filename):
+    if not storage.is_digest(digest):
+        return 'File not found', 404
+    # Revalidations are answered from the URL alone, without touching disk
+    if request.if_none_match.contains(digest):
+        return blob_cache_headers(Response(status=304), digest)
+
+    path = storage.blob_path(current_app.config['BLOB_FOLDER'], digest)
+    if not os.path.isfile(path):
+        return 'File not found', 404
+    download_name = secure_filename(filename)
+
+    if current_app.config['DOWNLOAD_OFFLOAD'] == 'x-accel':
+        response = Response(mimetype=mimetypes.guess_type(download_name)[0]
+                            or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = (
+            current_app.config['X_ACCEL_PREFIX'] + f'{digest[:2]}/{digest}')
+        response.headers.set('Content-Disposition', 'inline',
+                             filename=download_name)
+        response.last_modified = os.path.getmtime(path)
+        return blob_cache_headers(response, digest).make_conditional(request)
+
+    # With USE_X_SENDFILE on, send_file emits an X-Sendfile header instead
+    # of the body and the proxy handles Range itself.
+    response = send_file(path, download_name=download_name, etag=False,
+                         conditional=False)
+    blob_cache_headers(response, digest)
+    if current_app.config['USE_X_SENDFILE']:
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            response.headers.pop('X-Sendfile', None)
+        return response
+    # Advertised up front so download managers know they can resume
+    response.accept_ranges = 'bytes'
+    return response.make_conditional(
+        request, accept_ranges=True, complete_length=os.path.getsize(path))
+
+# ========== SEARCH ==========
+
+SEARCH_PAGE_SIZE = 20
+REINDEX_BATCH_SIZE = 200
+SEARCH_MODELS = {'note': Note, 'assignment': Assignment}
+
+
+def search_enabled():
+    return search.enabled(db.engine)
+
+
+def index_upload(kind, item):
+    # Metadata is searchable as soon as the upload commits; the file's text
+    # is extracted by a job queued in the same transaction
+    if search_enabled():
+        search.index_document(db.session.connection(), kind, item.id, item.title,
+                              item.subject, item.description)
+        jobs.enqueue('extract_text', {'kind': kind, 'id': item.id}, commit=False)
+
+
+def unindex_upload(kind, item):
+    if search_enabled():
+        search.remove_document(db.session.connection(), kind, item.id)
+
+
+def extract_upload_text(item):
+    try:
+        return search.extract_text(upload_path(item), item.filename)
+    except Exception as e:  # Unreadable or corrupt uploads just have no body
+        current_app.logger.warning('No text extracted from %s: %s', item.filename, e)
+        return ''
+
+
+@jobs.handler('extract_text')
+def extract_text_job(payload):
+    item = db.session.get(SEARCH_MODELS[payload['kind']], payload['id'])
+    if item is None:
+        return {'chars': 0}
+    body = extract_upload_text(item)
+    db.session.commit()
+    # Only the index update takes the write lock, not the extraction
+    with background_write():
+        search.set_body(db.session.connection(), payload['kind'], payload['id'], body)
+        db.session.commit()
+    return {'chars': len(body)}
+
+
+def reindex_search(extract=True):
+    # Rebuilds the index from the notes and assignments tables, a batch at a
+    # time; returns the number of documents indexed
+    with background_write():
+        search.drop_index(db.session.connection())
+        search.create_index(db.session.connection())
+        db.session.commit()
+    count = 0
+    for kind, model in SEARCH_MODELS.items():
+        last_id = 0
+        while True:
+            items = model.query.filter(model.id > last_id).order_by(model.id).limit(
+                REINDEX_BATCH_SIZE).all()
+            if not items:
+                break
+            rows = [(kind, item.id, item.title, item.subject, item.description,
+                     extract_upload_text(item) if extract else '') for item in items]
+            db.session.commit()
+            with background_write():
+                for row in rows:
+                    search.index_document(db.session.connection(), *row)
+                db.session.commit()
+            count += len(rows)
+            last_id = items[-1].id
+    return count
+
+
+@jobs.handler('search_reindex')
+def search_reindex_job(payload):
+    return {'documents': reindex_search()}
+
+
+def find_documents(text, page=1):
+    # Ranked, highlighted matches as dicts for the template and the JSON API
+    offset = (page - 1) * SEARCH_PAGE_SIZE
+    if search_enabled():
+        matches = search.search(db.session.connection(), text, SEARCH_PAGE_SIZE, offset)
+    else:
+        pattern = f'%{text}%'
+        matches = []
+        for kind, model in SEARCH_MODELS.items():
+            matches += [(kind, item.id, escape(item.title), escape(item.description or ''))
+                        for item in model.query.filter(or_(
+                            model.title.ilike(pattern), model.subject.ilike(pattern),
+                            model.description.ilike(pattern))).order_by(
+                            model.upload_date.desc()).limit(offset + SEARCH_PAGE_SIZE)]
+        matches = matches[offset:offset + SEARCH_PAGE_SIZE]
+
+    items = {}
+    for kind, model in SEARCH_MODELS.items():
+        ids = [item_id for match_kind, item_id, _, _ in matches if match_kind == kind]
+        if ids:
+            items.update(((kind, item.id), item) for item in model.query.filter(model.id.in_(ids)))
+    results = []
+    for kind, item_id, title, snippet in matches:
+        item = items.get((kind, item_id))
+        if item is None:
+            continue
+        results.append({'kind': kind, 'id': item.id, 'title': title, 'snippet': snippet,
+                        'year': item.year, 'subject': item.subject,
+                        'upload_date': item.upload_date, 'filename': item.filename,
+                        'url': file_url(item)})
+    return results
+
+
+@bp.route('/search')
+def search_documents():
+    text = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    results = find_documents(text, page) if text else []
+    if request.args.get('format') == 'json':
+        return jsonify({'query': text, 'page': page, 'results': [
+            dict(result, title=str(result['title']), snippet=str(result['snippet']))
+            for result in results]})
+    return render_template('search.html', query=text, page=page, results=results,
+                           has_more=len(results) == SEARCH_PAGE_SIZE)
+
+
+@bp.cli.command('reindex-search')
+@department_option
+@click.option('--no-text', is_flag=True, help='Index titles and descriptions only.')
+def reindex_search_command(no_text):
+    """Rebuild the full-text search index."""
+    started = time.perf_counter()
+    count = reindex_search(extract=not no_text)
+    print(f'Indexed {count} documents in {time.perf_counter() - started:.1f}s.')
@@ -0,0 +1,130 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import Blueprint, current_app, jsonify, request, send_from_directory, url_for
+
+from extensions import jobs
+from models import db, Job
+from shards import current_department, department_option
+from stats import rebuild_stats
+from views.attendance import EXPORT_FORMATS
+
+bp = Blueprint('jobs', __name__, cli_group=None)
+
+JOB_RETENTION_DAYS = 7
+# Jobs that clients may queue through /api/jobs/<kind>
+PUBLIC_JOBS = ('attendance_export', 'marks_export', 'rebuild_stats')
+EXPORT_FILTERS = ('year', 'subject', 'student', 'start', 'end')
+
+
+@jobs.handler('rebuild_stats', writes=True)
+def rebuild_stats_job(payload):
+    return {name: list(values) for name, values in rebuild_stats().items()}
+
+
+@jobs.handler('purge_jobs', writes=True)
+def purge_jobs(payload):
+    # Forgets finished jobs after JOB_RETENTION_DAYS, with their export files
+    cutoff = datetime.now() - timedelta(days=JOB_RETENTION_DAYS)
+    old = Job.query.filter(Job.status.in_(('done', 'failed')), Job.finished_at < cutoff).all()
+    for job in old:
+        result = json.loads(job.result or 'null')
+        if isinstance(result, dict) and 'file' in result:
+            path = os.path.join(current_app.config['EXPORT_FOLDER'], result['file'])
+            if os.path.exists(path):
+                os.remove(path)
+        db.session.delete(job)
+    db.session.commit()
+    return {'purged': len(old)}
+
+
+jobs.every('purge_jobs', 24 * 60 * 60)
+
+
+def job_json(job):
+    data = {'id': job.id, 'kind': job.kind, 'status': job.status,
+            'attempts': job.attempts, 'error': job.error,
+            'result': json.loads(job.result) if job.result else None,
+            'created_at': job.created_at.isoformat(timespec='seconds'),
+            'finished_at': job.finished_at.isoformat(timespec='seconds') if job.finished_at else None}
+    if job.status == 'done' and job.kind.endswith('_export'):
+        data['download'] = url_for('.download_job_file', job_id=job.id)
+    return data
+
+
+@bp.route('/api/jobs/<kind>', methods=['POST'])
+def enqueue_job(kind):
+    # A job's handler is registered by its blueprint's module
+    if kind not in PUBLIC_JOBS or kind not in jobs.handlers:
+        return jsonify({'status': 'error', 'message': f'Unknown job: {kind}'}), 404
+    data = request.get_json(silent=True) or request.form
+    payload = {}
+    if kind.endswith('_export'):
+        payload['format'] = data.get('format', 'csv')
+        if payload['format'] not in EXPORT_FORMATS:
+            return jsonify({'status': 'error', 'message': 'format must be csv or ndjson'}), 400
+        payload['filters'] = {key: str(data[key]) for key in EXPORT_FILTERS if data.get(key)}
+    job = jobs.enqueue(kind, payload)
+    return jsonify({'status': 'queued', 'job_id': job.id,
+                    'url': url_for('.job_status', job_id=job.id)}), 202
+
+
+def department_job(job_id):
+    # Each department sees only the jobs it queued
+    job = db.session.get(Job, job_id)
+    if job is None or json.loads(job.payload).get('department') != current_department():
+        return None
+    return job
+
+
+@bp.route('/api/jobs/<int:job_id>')
+def job_status(job_id):
+    job = department_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify(job_json(job))
+
+
+@bp.route('/api/jobs/<int:job_id>/download')
+def download_job_file(job_id):
+    job = department_job(job_id)
+    if job is None or job.status != 'done' or not job.kind.endswith('_export'):
+        return jsonify({'status': 'error', 'message': 'Export not ready'}), 404
+    result = json.loads(job.result)
+    return send_from_directory(current_app.config['EXPORT_FOLDER'], result['file'],
+                               as_attachment=True, download_name=result['name'])
+
+
+@bp.cli.command('rebuild-stats')
+@department_option
+def rebuild_stats_command():
+    """Recompute the dashboard counters and report any drift."""
+    drift = rebuild_stats()
+    if not drift:
+        print('Dashboard counters are up to date.')
+    for name, (stored, actual) in sorted(drift.items()):
+        print(f'{name}: stored {stored}, actual {actual}')
+
+
+@bp.cli.command('worker')
+@click.option('--threads', default=2, show_default=True, help='Worker threads.')
+@click.option('--once', is_flag=True, help='Run the jobs that are due, then exit (for cron).')
+def worker_command(threads, once):
+    """Run background jobs in this process."""
+    if once:
+        jobs.schedule_periodic()
+        count = 0
+        while jobs.run_one():
+            count += 1
+        print(f'Ran {count} jobs.')
+        return
+    jobs.start(threads)
+    print(f'Job worker running with {threads} threads; Ctrl+C to stop.')
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        jobs.stop()
@@ -0,0 +1,331 @@
+import csv
+import io
+import math
+import re
+
+import click
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from database import write_transaction
+from extensions import jobs, page_cache
+from models import db, Attendance, Mark, Student, Subject, TermAttendance
+from shards import department_option
+from stats import bump_stats, invalidate_on_commit, read_cache, status_deltas
+from views.attendance import EXPORT_BATCH_SIZE, get_or_create_subject, write_export
+
+bp = Blueprint('students', __name__, cli_group=None)
+
+
+@bp.route('/students')
+@page_cache.cached(Student)
+def students():
+    students = Student.query.all()
+    return render_template('students.html', students=students)
+
+
+@bp.route('/add_student', methods=['POST'])
+def add_student():
+    name = request.form['name']
+    roll_number = request.form['roll_number']
+    year = request.form['year']
+    email = request.form['email']
+    phone = request.form['phone']
+
+    existing = Student.query.filter_by(roll_number=roll_number).first()
+    if existing:
+        flash('Student with this roll number already exists!', 'error')
+        return redirect(url_for('.students'))
+
+    new_student = Student(name=name, roll_number=roll_number,
+                          year=year, email=email, phone=phone)
+    db.session.add(new_student)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Added by a concurrent request since the check above
+        db.session.rollback()
+        flash('Student with this roll number already exists!', 'error')
+        return redirect(url_for('.students'))
+    flash('Student added successfully!', 'success')
+    return redirect(url_for('.students'))
+
+
+ROSTER_COLUMNS = ['name', 'roll_number', 'year', 'email', 'phone']
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+PHONE_PATTERN = re.compile(r'^\+?[0-9]{7,15}$')
+# Roll numbers per lookup, well under SQLite's bound parameter limit
+IMPORT_BATCH_SIZE = 500
+
+
+def student_insert():
+    # Skips roll numbers inserted by a concurrent import or add_student
+    # since they were checked, and returns the ones it inserted
+    if db.session.connection().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(Student.__table__).on_conflict_do_nothing(
+        index_elements=['roll_number']).returning(Student.__table__.c.roll_number)
+
+
+def import_roster(lines):
+    # Validates a CSV roster read line by line, then inserts every valid
+    # row in one transaction. Roll numbers are checked against the file and
+    # the database with set-based queries. Returns (inserted, errors)
+    # where errors is a per-row report of skipped lines.
+    reader = csv.DictReader(lines)
+    missing = [c for c in ('name', 'roll_number', 'year')
+               if c not in (reader.fieldnames or [])]
+    if missing:
+        return 0, [{'line': 1, 'errors': [f'missing column: {c}' for c in missing]}]
+
+    rows = []
+    errors = []
+    seen = {}
+    for record in reader:
+        row = {column: (record.get(column) or '').strip()
+               for column in ROSTER_COLUMNS}
+        problems = [f'{column} is required' for column in ('name', 'roll_number', 'year')
+                    if not row[column]]
+        if row['email'] and not EMAIL_PATTERN.match(row['email']):
+            problems.append('invalid email')
+        phone = re.sub(r'[\s-]', '', row['phone'])
+        if phone and not PHONE_PATTERN.match(phone):
+            problems.append('invalid phone')
+        row['phone'] = phone
+        if row['roll_number'] in seen:
+            problems.append(
+                f"duplicate roll number (first on line {seen[row['roll_number']]})")
+        elif row['roll_number']:
+            seen[row['roll_number']] = reader.line_num
+        if problems:
+            errors.append({'line': reader.line_num,
+                           'roll_number': row['roll_number'], 'errors': problems})
+        else:
+            rows.append((reader.line_num, row))
+
+    roll_numbers = [row['roll_number'] for _, row in rows]
+    existing = set()
+    for start in range(0, len(roll_numbers), IMPORT_BATCH_SIZE):
+        existing.update(db.session.scalars(select(Student.roll_number).where(
+            Student.roll_number.in_(roll_numbers[start:start + IMPORT_BATCH_SIZE]))))
+    valid = [(line, row) for line, row in rows if row['roll_number'] not in existing]
+
+    inserted = set()
+    if valid:
+        insert = student_insert()
+        for start in range(0, len(valid), IMPORT_BATCH_SIZE):
+            inserted.update(db.session.scalars(insert, [
+                {column: row[column] or None for column in ROSTER_COLUMNS}
+                for _, row in valid[start:start + IMPORT_BATCH_SIZE]]))
+        bump_stats(db.session.connection(), {'student_total': len(inserted)})
+        invalidate_on_commit(db.session, read_cache('roster'))
+        db.session.commit()
+    for line, row in rows:
+        if row['roll_number'] not in inserted:
+            errors.append({'line': line, 'roll_number': row['roll_number'],
+                           'errors': ['roll number already exists']})
+    errors.sort(key=lambda error: error['line'])
+    return len(inserted), errors
+
+
+@bp.route('/students/import', methods=['POST'])
+def import_students():
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        inserted, errors = 0, [{'line': 0, 'errors': ['no file uploaded']}]
+    else:
+        text = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
+        try:
+            inserted, errors = import_roster(text)
+        except UnicodeDecodeError:
+            inserted, errors = 0, [{'line': 0, 'errors': ['the file is not UTF-8 text']}]
+        finally:
+            # Leaves closing the upload to the request
+            text.detach()
+
+    if request.args.get('format') == 'json':
+        return jsonify({'status': 'success' if inserted or not errors else 'error',
+                        'inserted': inserted, 'errors': errors})
+    if inserted:
+        flash(f'Imported {inserted} students.', 'success')
+    for error in errors[:10]:
+        flash(f"Line {error['line']}: {', '.join(error['errors'])}", 'error')
+    if len(errors) > 10:
+        flash(f'...and {len(errors) - 10} more rows with errors.', 'error')
+    return redirect(url_for('.students'))
+
+
+@bp.route('/edit_student/<int:student_id>', methods=['POST'])
+def edit_student(student_id):
+    student = Student.query.get_or_404(student_id)
+    student.name = request.form['name']
+    student.roll_number = request.form['roll_number']
+    student.year = request.form['year']
+    student.email = request.form['email']
+    student.phone = request.form['phone']
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        flash('Student with this roll number already exists!', 'error')
+        return redirect(url_for('.students'))
+    flash('Student updated successfully!', 'success')
+    return redirect(url_for('.students'))
+
+
+@bp.route('/delete_student/<int:student_id>')
+@write_transaction
+def delete_student(student_id):
+    student = Student.query.get_or_404(student_id)
+    # Drop the student's attendance in one statement; the counters are
+    # adjusted here because bulk deletes skip the mapper listeners.
+    deltas = {}
+    for status, count in db.session.query(Attendance.status, func.count()).filter(
+            Attendance.student_id == student.id).group_by(Attendance.status):
+        for name, delta in status_deltas(status, -count).items():
+            deltas[name] = deltas.get(name, 0) + delta
+    Attendance.query.filter_by(student_id=student.id).delete()
+    TermAttendance.query.filter_by(student_id=student.id).delete()
+    Mark.query.filter_by(student_id=student.id).delete()
+    bump_stats(db.session.connection(), deltas)
+    invalidate_on_commit(db.session, read_cache('attendance_stats'))
+    db.session.delete(student)
+    db.session.commit()
+    flash('Student deleted successfully!', 'success')
+    return redirect(url_for('.students'))
+
+
+DEFAULT_ASSESSMENT = 'Final'
+# Scores are out of 100, which also keeps them inside Mark.score's Numeric(6, 2)
+MAX_MARKS = 100
+
+
+@bp.route('/student_marks/<int:student_id>')
+def student_marks(student_id):
+    student = Student.query.get_or_404(student_id)
+    marks = Mark.query.options(db.joinedload(Mark.subject)).filter_by(
+        student_id=student.id).join(Subject).order_by(
+        Subject.name, Mark.assessment).all()
+    subjects = Subject.query.filter_by(
+        year=student.year).order_by(Subject.name).all()
+    return render_template('student_marks.html', student=student, marks=marks,
+                           subjects=subjects, default_assessment=DEFAULT_ASSESSMENT,
+                           max_marks=MAX_MARKS)
+
+
+@bp.route('/update_marks/<int:student_id>', methods=['POST'])
+def update_marks(student_id):
+    student = Student.query.get_or_404(student_id)
+    subject = get_or_create_subject(student.year, request.form['subject'])
+    assessment = request.form.get('assessment', '').strip() or DEFAULT_ASSESSMENT
+    try:
+        score = float(request.form['marks'])
+    except ValueError:
+        score = math.nan
+    # float() also accepts nan and inf
+    if not math.isfinite(score):
+        flash('Marks must be a number!', 'error')
+        return redirect(url_for('.student_marks', student_id=student_id))
+    if not 0 <= score <= MAX_MARKS:
+        flash(f'Marks must be between 0 and {MAX_MARKS}!', 'error')
+        return redirect(url_for('.student_marks', student_id=student_id))
+
+    mark = Mark.query.filter_by(student_id=student.id, subject_id=subject.id,
+                                assessment=assessment).first()
+    if mark is None:
+        mark = Mark(student_id=student.id, subject_id=subject.id,
+                    assessment=assessment)
+        db.session.add(mark)
+    mark.score = score
+    db.session.commit()
+    flash('Marks updated successfully!', 'success')
+    return redirect(url_for('.student_marks', student_id=student_id))
+
+
+def subject_ranking_query(subject_id, assessment=None):
+    # Ranked mark sheet for one subject, computed in a single indexed query.
+    # Without an assessment each student's scores are summed first.
+    if assessment:
+        scores = select(Mark.student_id, Mark.score).where(
+            Mark.subject_id == subject_id, Mark.assessment == assessment)
+    else:
+        scores = select(Mark.student_id, func.sum(Mark.score).label('score')).where(
+            Mark.subject_id == subject_id).group_by(Mark.student_id)
+    scores = scores.subquery()
+
+    return select(
+        scores.c.student_id, Student.name, Student.roll_number, scores.c.score,
+        func.rank().over(order_by=scores.c.score.desc()).label('rank'),
+        (func.percent_rank(type_=db.Float).over(
+            order_by=scores.c.score) * 100).label('percentile'),
+        func.avg(scores.c.score).over().label('average'),
+        func.max(scores.c.score).over().label('highest'),
+        func.min(scores.c.score).over().label('lowest'),
+        func.count().over().label('count'),
+    ).join(Student, Student.id == scores.c.student_id).subquery()
+
+
+@bp.route('/api/marks/subjects/<int:subject_id>')
+def subject_marks(subject_id):
+    subject = db.get_or_404(Subject, subject_id)
+    assessment = request.args.get('assessment') or None
+    top = request.args.get('top', type=int)
+
+    ranked = subject_ranking_query(subject.id, assessment)
+    query = select(ranked).order_by(ranked.c.rank, ranked.c.name)
+    if top:
+        query = query.where(ranked.c.rank <= top)
+    rows = db.session.execute(query).mappings().all()
+
+    summary = rows[0] if rows else {}
+    return jsonify({
+        'subject': subject.name,
+        'year': subject.year,
+        'assessment': assessment,
+        'count': summary.get('count', 0),
+        'average': round(summary['average'], 2) if rows else None,
+        'highest': summary.get('highest'),
+        'lowest': summary.get('lowest'),
+        'ranking': [{
+            'student_id': row['student_id'],
+            'name': row['name'],
+            'roll_number': row['roll_number'],
+            'score': row['score'],
+            'rank': row['rank'],
+            'percentile': round(row['percentile'], 1),
+        } for row in rows],
+    })
+
+
+MARK_EXPORT_COLUMNS = ['roll_number', 'student_name', 'year', 'subject',
+                       'assessment', 'score']
+
+
+@jobs.handler('marks_export')
+def marks_export_job(payload):
+    filters = payload['filters']
+    query = select(Student.roll_number, Student.name, Student.year, Subject.name,
+                   Mark.assessment, Mark.score).join(Student, Mark.student_id == Student.id).join(
+        Subject, Mark.subject_id == Subject.id).order_by(Subject.year, Subject.name, Student.roll_number)
+    if filters.get('year'):
+        query = query.where(Subject.year == filters['year'])
+    if filters.get('subject'):
+        query = query.where(Subject.name == filters['subject'])
+    rows = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    return write_export('marks', (tuple(row) for row in rows), MARK_EXPORT_COLUMNS,
+                        payload['format'])
+
+
+@bp.cli.command('import-roster')
+@department_option
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_roster_command(path):
+    """Import students from a CSV roster."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        inserted, errors = import_roster(f)
+    print(f'Imported {inserted} students.')
+    for error in errors:
+        print(f"line {error['line']}: {', '.join(error['errors'])}")
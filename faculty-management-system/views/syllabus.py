@@ -0,0 +1,138 @@
+from datetime import date
+
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
+from sqlalchemy import case, func, select
+
+from database import write_transaction
+from extensions import page_cache
+from models import db, Syllabus
+from sample_data import SAMPLE_SYLLABUS
+from stats import (SYLLABUS_PROGRESS_TTL, bump_stats, cached, invalidate_on_commit,
+                   read_cache, rebuild_stats)
+
+bp = Blueprint('syllabus', __name__)
+
+MAX_SYLLABUS_UPDATES = 1000
+
+
+def syllabus_progress_rows():
+    # Completion per (year, subject) from one grouped query over the
+    # (year, subject) index
+    def load():
+        return [{'year': row.year, 'subject': row.subject, 'total': row.total,
+                 'completed': row.completed or 0,
+                 'percentage': round((row.completed or 0) / row.total * 100, 1)}
+                for row in db.session.execute(
+                    select(Syllabus.year, Syllabus.subject,
+                           func.count().label('total'),
+                           func.sum(case((Syllabus.completed, 1), else_=0)).label('completed'))
+                    .group_by(Syllabus.year, Syllabus.subject)
+                    .order_by(Syllabus.year, Syllabus.subject))]
+    return cached(read_cache('syllabus_progress'), 'subjects', load, SYLLABUS_PROGRESS_TTL)
+
+
+def syllabus_progress_by_year(rows):
+    years = {}
+    for row in rows:
+        totals = years.setdefault(row['year'], {'year': row['year'], 'total': 0, 'completed': 0})
+        totals['total'] += row['total']
+        totals['completed'] += row['completed']
+    for totals in years.values():
+        totals['percentage'] = round(totals['completed'] / totals['total'] * 100, 1)
+    return list(years.values())
+
+
+def apply_syllabus_updates(updates):
+    # Sets completion for {topic_id: completed} in one transaction: one UPDATE
+    # per direction. Topics already in the requested state keep their
+    # completion date. Returns the number of topics that changed.
+    today = date.today().strftime('%Y-%m-%d')
+    changed = {}
+    for completed in (True, False):
+        ids = [topic_id for topic_id, value in updates.items() if value is completed]
+        if not ids:
+            continue
+        # Older rows may hold NULL, which counts as not completed
+        pending = Syllabus.completed.isnot(True) if completed else Syllabus.completed.is_(True)
+        result = db.session.execute(
+            Syllabus.__table__.update().where(Syllabus.id.in_(ids), pending)
+            .values(completed=completed, completion_date=today if completed else None))
+        changed[completed] = result.rowcount
+    # Core updates bypass the mapper listeners
+    bump_stats(db.session.connection(),
+               {'syllabus_completed': changed.get(True, 0) - changed.get(False, 0)})
+    invalidate_on_commit(db.session, read_cache('syllabus_progress'))
+    db.session.commit()
+    return sum(changed.values())
+
+
+@bp.route('/syllabus_tracker')
+@page_cache.cached(Syllabus)
+def syllabus_tracker():
+    syllabus_data = Syllabus.query.order_by(Syllabus.year, Syllabus.subject, Syllabus.id).all()
+    progress_data = syllabus_progress_rows()
+    return render_template('syllabus_tracker.html', syllabus_data=syllabus_data, progress_data=progress_data)
+
+
+@bp.route('/update_syllabus', methods=['POST'])
+def update_syllabus():
+    try:
+        topic_id = int(request.form['topic_id'])
+    except (KeyError, ValueError):
+        return jsonify({'status': 'error', 'message': 'topic_id is required'}), 400
+    apply_syllabus_updates({topic_id: request.form.get('completed') == 'true'})
+    return jsonify({'status': 'success'})
+
+
+@bp.route('/api/syllabus/bulk_update', methods=['POST'])
+def bulk_update_syllabus():
+    # Body: {"updates": [{"id": 3, "completed": true}, ...]}; later entries
+    # for the same topic win
+    payload = request.get_json(silent=True)
+    items = payload.get('updates') if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return jsonify({'status': 'error', 'message': 'expected a JSON list of updates'}), 400
+    if len(items) > MAX_SYLLABUS_UPDATES:
+        return jsonify({'status': 'error',
+                        'message': f'at most {MAX_SYLLABUS_UPDATES} updates per request'}), 400
+
+    updates = {}
+    for item in items:
+        # bool is an int subclass, so true would otherwise update topic 1
+        if (not isinstance(item, dict) or not isinstance(item.get('id'), int)
+                or isinstance(item.get('id'), bool)
+                or not isinstance(item.get('completed'), bool)):
+            return jsonify({'status': 'error',
+                            'message': 'each update needs an integer id and a boolean completed'}), 400
+        updates[item['id']] = item['completed']
+
+    known = {topic_id for (topic_id,) in db.session.query(
+        Syllabus.id).filter(Syllabus.id.in_(updates))}
+    unknown = sorted(set(updates) - known)
+    if unknown:
+        return jsonify({'status': 'error', 'message': f'unknown topic ids: {unknown}'}), 400
+
+    changed = apply_syllabus_updates(updates)
+    return jsonify({'status': 'success', 'updates': len(updates), 'changed': changed})
+
+
+@bp.route('/api/syllabus/progress')
+def syllabus_progress_api():
+    rows = syllabus_progress_rows()
+    return jsonify({'years': syllabus_progress_by_year(rows), 'subjects': rows})
+
+
+@bp.route('/init_syllabus')
+@write_transaction
+def init_syllabus():
+    db.session.execute(Syllabus.__table__.delete())
+    db.session.execute(Syllabus.__table__.insert(), [
+        {'year': year, 'subject': subject, 'topic': topic, 'completed': False}
+        for year, subjects in SAMPLE_SYLLABUS.items()
+        for subject, topics in subjects.items()
+        for topic in topics])
+    # Core statements bypass the mapper listeners; rebuild_stats() commits
+    invalidate_on_commit(db.session, read_cache('syllabus_progress'))
+    rebuild_stats(['syllabus_total', 'syllabus_completed'])
+    flash('Syllabus initialized with sample data!', 'success')
+    return redirect(url_for('.syllabus_tracker'))